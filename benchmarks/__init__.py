@@ -0,0 +1 @@
+"""Benchmarks of the CLI against a local stub of the RCTab API."""
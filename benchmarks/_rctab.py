@@ -0,0 +1,56 @@
+"""Run the rctab command line against the stub API, without signing in.
+
+The benchmarks run this in a new process for each command, as a user would
+run rctab. It reports the process's peak memory use to the file named by
+RCTAB_BENCH_RSS_FILE, if that is set.
+"""
+
+import atexit
+import os
+import resource
+import sys
+from typing import Dict
+
+# Importing auth first doesn't change the start up time, as the CLI imports
+# it anyway, and MSAL is only imported when a token is acquired
+from rctab_cli.auth import TokenProvider
+from rctab_cli.forward import main
+
+
+def _acquire(self: TokenProvider) -> Dict:
+    """Return a token that the stub API accepts."""
+    return {"access_token": "benchmark", "expires_in": 3600}
+
+
+def peak_rss() -> int:
+    """Get the peak resident set size of this process.
+
+    Returns:
+        The size in bytes.
+    """
+    try:
+        # ru_maxrss on Linux includes the benchmark process's memory, from
+        # before this process was started, so read the high water mark
+        with open("/proc/self/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS counts bytes and others kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _write_peak_rss(rss_f: str) -> None:
+    """Write the peak resident set size of this process, in bytes."""
+    with open(rss_f, "w", encoding="utf-8") as rss_file:
+        rss_file.write(str(peak_rss()))
+
+
+if __name__ == "__main__":
+    TokenProvider._acquire = _acquire  # type: ignore
+    if os.environ.get("RCTAB_BENCH_RSS_FILE"):
+        atexit.register(_write_peak_rss, os.environ["RCTAB_BENCH_RSS_FILE"])
+    sys.argv[0] = "rctab"
+    main()
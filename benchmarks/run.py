@@ -0,0 +1,367 @@
+"""Benchmark the CLI against the stub API and compare the results.
+
+Each command is run in a new process, as a user would run it, against the
+stub API in benchmarks/stub_api.py. The benchmarks measure
+
+- cold start: how long ``rctab --help`` takes,
+- per-command latency: how long each command takes, from start to exit,
+- batch throughput: commands per second through ``rctab batch``,
+- summary: the time and peak memory of ``rctab sub summary`` for
+  different numbers of subscriptions, as json and as jsonl.
+
+Run them from the root of the repository with
+
+    python -m benchmarks.run
+
+which saves the results to benchmarks/results/<commit>.json, and compare
+two sets of results with
+
+    python -m benchmarks.run --compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+
+which exits with 1 if any metric got worse by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from benchmarks.stub_api import StubConfig, StubServer, encoded_response
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+SUBSCRIPTION_ID = str(UUID(int=1))
+
+# Each command is run with --no-cache so that every run reaches the stub
+COMMANDS: Dict[str, List[str]] = {
+    "summary": ["--no-cache", "sub", "summary", "--subscription-id", SUBSCRIPTION_ID],
+    "approvals": [
+        "--no-cache",
+        "sub",
+        "approvals",
+        "--subscription-id",
+        SUBSCRIPTION_ID,
+    ],
+    "allocations": [
+        "--no-cache",
+        "sub",
+        "allocations",
+        "--subscription-id",
+        SUBSCRIPTION_ID,
+    ],
+    "finance_get": ["--no-cache", "sub", "finance", "get", "--finance-id", "1"],
+    "finance_list": [
+        "--no-cache",
+        "sub",
+        "finance",
+        "list",
+        "--subscription-id",
+        SUBSCRIPTION_ID,
+    ],
+    "cost_recovery": ["sub", "cost-recovery", "--month", "2024-01"],
+    "approve": [
+        "sub",
+        "approve",
+        "--subscription-id",
+        SUBSCRIPTION_ID,
+        "--ticket",
+        "T-1",
+        "--amount",
+        "1",
+        "--date-to",
+        "2030-01-01",
+        "--repeat",
+    ],
+    "allocate": [
+        "sub",
+        "allocate",
+        "--subscription-id",
+        SUBSCRIPTION_ID,
+        "--ticket",
+        "T-1",
+        "--amount",
+        "1",
+        "--repeat",
+    ],
+}
+
+# Metrics with these units are better when higher, and all others when lower
+HIGHER_IS_BETTER = ("commands/s",)
+
+
+class Runner:
+    """Run rctab commands in new processes against the stub API.
+
+    Attributes:
+        env: The environment the commands run in.
+        work_dir: A directory for the commands' app directory and files.
+    """
+
+    def __init__(self, port: int, work_dir: Path) -> None:
+        """Initialize the Runner class."""
+        self.work_dir = work_dir
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "BASE_URL": "http://127.0.0.1",
+            "PORT": str(port),
+            # Keep the app directory, with its caches and journal, separate
+            "XDG_CONFIG_HOME": str(work_dir / "config"),
+            "RCTAB_NO_DAEMON": "1",
+            "RCTAB_BENCH_RSS_FILE": str(work_dir / "rss"),
+        }
+
+    def run(self, args: List[str], stdin: Optional[str] = None) -> Tuple[float, int]:
+        """Run a command and measure it.
+
+        Args:
+            args: The arguments to rctab.
+            stdin: The standard input for the command, if any.
+
+        Raises:
+            RuntimeError: If the command failed.
+
+        Returns:
+            The seconds the command took and its peak memory use in bytes.
+        """
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, str(ROOT / "benchmarks" / "_rctab.py"), *args],
+            input=stdin,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            cwd=self.work_dir,
+            env=self.env,
+            text=True,
+            check=False,
+        )
+        elapsed = time.perf_counter() - start
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"rctab {' '.join(args)} exited with {process.returncode}: "
+                f"{process.stderr.strip()}"
+            )
+        return elapsed, int((self.work_dir / "rss").read_text(encoding="utf-8"))
+
+    def timings(self, args: List[str], repeat: int) -> Dict[str, Any]:
+        """Run a command several times and summarise how long it took.
+
+        Args:
+            args: The arguments to rctab.
+            repeat: How many times to run the command.
+
+        Returns:
+            The median, fastest and slowest times, in seconds.
+        """
+        times = [self.run(args)[0] for _ in range(repeat)]
+        return {
+            "median": {"value": statistics.median(times), "unit": "s"},
+            "min": {"value": min(times), "unit": "s"},
+            "max": {"value": max(times), "unit": "s"},
+        }
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every benchmark.
+
+    Args:
+        args: The command line arguments.
+
+    Returns:
+        The metrics, by name.
+    """
+    metrics: Dict[str, Any] = {}
+    config = StubConfig(latency=args.latency, rows=args.rows)
+    with StubServer(config) as server, tempfile.TemporaryDirectory() as tmp:
+        runner = Runner(server.port, Path(tmp))
+        # Compile the byte code, so it isn't included in the first run
+        runner.run(["--help"])
+
+        print("cold start", file=sys.stderr)
+        metrics["cold_start"] = runner.timings(["--help"], args.repeat)
+
+        for name, command in COMMANDS.items():
+            print(f"command {name}", file=sys.stderr)
+            metrics[f"command.{name}"] = runner.timings(command, args.repeat)
+
+        lines = "".join(
+            f"--no-cache sub finance get --finance-id {number}\n"
+            for number in range(args.batch_size)
+        )
+        for workers in args.workers:
+            print(f"batch with {workers} workers", file=sys.stderr)
+            elapsed, _ = runner.run(["batch", "--workers", str(workers)], lines)
+            metrics[f"batch.workers_{workers}"] = {
+                "throughput": {"value": args.batch_size / elapsed, "unit": "commands/s"}
+            }
+
+        for size in args.sizes:
+            config.subscriptions = size
+            # Encode the summary now, so that isn't included in the first run
+            encoded_response("summary", size)
+            for output_format in ("json", "jsonl"):
+                print(f"summary of {size} as {output_format}", file=sys.stderr)
+                command = ["--no-cache", "sub", "summary", "-o", output_format]
+                elapsed, peak = runner.run(command)
+                metrics[f"summary.{size}.{output_format}"] = {
+                    "time": {"value": elapsed, "unit": "s"},
+                    "peak_rss": {"value": peak / 2**20, "unit": "MB"},
+                }
+
+    return metrics
+
+
+def git_commit() -> str:
+    """Get the short hash of the commit being benchmarked.
+
+    Returns:
+        The hash, with "-dirty" if there are uncommitted changes, or
+        "unknown" outside a git repository.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, Tuple[float, str]]:
+    """Flatten the metrics of a set of results.
+
+    Args:
+        results: The results, as saved.
+
+    Returns:
+        The value and unit of each metric, by its full name.
+    """
+    return {
+        f"{name}.{stat}": (value["value"], value["unit"])
+        for name, stats in results["metrics"].items()
+        for stat, value in stats.items()
+    }
+
+
+def compare(
+    old: Dict[str, Any], new: Dict[str, Any], threshold: float
+) -> Tuple[List[List[str]], List[str]]:
+    """Compare two sets of results.
+
+    Args:
+        old: The results to compare against.
+        new: The results to compare.
+        threshold: The fraction by which a metric may get worse before it
+            is counted as a regression.
+
+    Returns:
+        A row for each metric in both sets of results, and the names of
+        the metrics that regressed.
+    """
+    old_metrics, new_metrics = flatten(old), flatten(new)
+    rows, regressions = [], []
+    for name, (new_value, unit) in new_metrics.items():
+        if name not in old_metrics:
+            continue
+        old_value = old_metrics[name][0]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        worse = -change if unit in HIGHER_IS_BETTER else change
+        flag = ""
+        if worse > threshold:
+            flag = "regression"
+            regressions.append(name)
+        elif worse < -threshold:
+            flag = "improvement"
+        rows.append(
+            [name, f"{old_value:.4g}", f"{new_value:.4g}", unit, f"{change:+.1%}", flag]
+        )
+    return rows, regressions
+
+
+def print_table(rows: List[List[str]], headers: List[str]) -> None:
+    """Print rows as an aligned table, without needing tabulate."""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+
+def main() -> None:
+    """Run the benchmarks, or compare results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n", maxsplit=1)[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--latency", type=float, default=0.01, help="in seconds")
+    parser.add_argument("--rows", type=int, default=20, help="records per list")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per command")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 8], help="for the batch"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 1000, 50000],
+        help="numbers of subscriptions in the summary",
+    )
+    parser.add_argument("--output", type=Path, help="where to save the results")
+    parser.add_argument(
+        "--compare", type=Path, nargs=2, metavar=("OLD", "NEW"), help="and exit"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="for regressions, as a fraction"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (json.loads(path.read_text("utf-8")) for path in args.compare)
+        rows, regressions = compare(old, new, args.threshold)
+        print(f"{old['commit']} -> {new['commit']}")
+        print_table(rows, ["metric", "old", "new", "unit", "change", ""])
+        sys.exit(1 if regressions else 0)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "latency": args.latency,
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "batch_size": args.batch_size,
+        },
+        "metrics": run_benchmarks(args),
+    }
+
+    output_f = args.output or RESULTS_DIR / f"{commit}.json"
+    output_f.parent.mkdir(parents=True, exist_ok=True)
+    output_f.write_text(json.dumps(results, indent=4) + "\n", encoding="utf-8")
+    print(f"Saved the results to {output_f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""A local stand-in for the RCTab API, to benchmark the CLI against.
+
+It answers the endpoints the CLI uses with generated records, after a
+configurable delay, so that benchmarks measure the CLI rather than the
+network or the real API. Responses are encoded once per size and reused.
+
+Run it on its own with
+
+    python -m benchmarks.stub_api --port 8000 --latency 0.05
+
+and point the CLI at it with BASE_URL=http://127.0.0.1 and PORT=8000.
+"""
+
+import argparse
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from uuid import UUID
+
+
+@dataclass
+class StubConfig:
+    """How the stub API behaves, which can be changed while it runs.
+
+    Attributes:
+        latency: Seconds to wait before each response.
+        subscriptions: How many subscriptions the summary lists.
+        rows: How many records each list of approvals, allocations,
+            finances and costs holds.
+    """
+
+    latency: float = 0.0
+    subscriptions: int = 10
+    rows: int = 5
+
+
+def make_summary(number: int) -> Dict[str, Any]:
+    """Make the summary of a subscription, like the API's."""
+    first_usage = date(2024, 1, 1) + timedelta(days=number % 365)
+    return {
+        "subscription_id": str(UUID(int=number)),
+        "name": f"subscription-{number}",
+        "status": "Enabled",
+        "role_assignments": [
+            {
+                "role_definition_id": str(UUID(int=number + role)),
+                "role_name": "Contributor",
+                "principal_id": str(UUID(int=number * 7 + role)),
+                "display_name": f"User {role}",
+                "mail": f"user{role}@example.com",
+                "scope": f"/subscriptions/{UUID(int=number)}",
+            }
+            for role in range(3)
+        ],
+        "email": f"owner{number}@example.com",
+        "approved_from": "2024-01-01",
+        "approved_to": "2025-01-01",
+        "approved": 1000.0,
+        "allocated": 800.0,
+        "cost": 12.5 * (number % 50),
+        "amortised_cost": 12.5 * (number % 50),
+        "total_cost": 12.5 * (number % 50),
+        "first_usage": first_usage.isoformat(),
+        "latest_usage": (first_usage + timedelta(days=30)).isoformat(),
+        "always_on": number % 10 == 0,
+        "abolished": False,
+    }
+
+
+def make_finance(number: int, subscription_id: str) -> Dict[str, Any]:
+    """Make a finance record, like the API's."""
+    return {
+        "id": number,
+        "subscription_id": subscription_id,
+        "ticket": f"T-{number}",
+        "amount": 100.0 + number,
+        "priority": 100,
+        "finance_code": f"F-{number % 20:03d}",
+        "date_from": "2024-01-01",
+        "date_to": "2024-12-31",
+    }
+
+
+def make_record(number: int, subscription_id: str) -> Dict[str, Any]:
+    """Make an approval or allocation, like the API's."""
+    return {
+        "ticket": f"T-{number}",
+        "amount": 100.0 + number,
+        "date_from": "2024-01-01",
+        "date_to": "2025-01-01",
+        "time_created": "2024-01-01T09:00:00",
+        "subscription_id": subscription_id,
+    }
+
+
+def make_cost(number: int) -> Dict[str, Any]:
+    """Make a recoverable cost, like the API's."""
+    return {
+        "subscription_id": str(UUID(int=number)),
+        "finance_code": f"F-{number % 20:03d}",
+        "month": "2024-01-01",
+        "amount": 10.0 + number,
+        "date_recovered": None,
+    }
+
+
+@lru_cache(maxsize=16)
+def encoded_response(kind: str, size: int) -> bytes:
+    """Encode a list of records once for each kind and size.
+
+    Args:
+        kind: "summary", "finances", "records" or "costs".
+        size: How many records to list.
+
+    Returns:
+        The JSON response body.
+    """
+    subscription_id = str(UUID(int=1))
+    records: List[Any]
+    if kind == "summary":
+        records = [make_summary(number) for number in range(1, size + 1)]
+    elif kind == "finances":
+        records = [make_finance(number, subscription_id) for number in range(size)]
+    elif kind == "records":
+        records = [make_record(number, subscription_id) for number in range(size)]
+    else:
+        records = [make_cost(number) for number in range(size)]
+    return json.dumps(records).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer requests to the stub API."""
+
+    # Keep connections open, as the API does, so that pooling is measured
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        """Don't log each request, which would slow the stub down."""
+
+    def _respond(
+        self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Send a JSON response after the configured delay."""
+        if self.server.config.latency:
+            time.sleep(self.server.config.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str) -> Tuple[int, bytes, Dict[str, str]]:
+        """Work out the response to a request."""
+        url = urlsplit(self.path)
+        path = url.path.strip("/")
+        config = self.server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            # Read the body, which the CLI sends even with GETs
+            self.rfile.read(length)
+
+        if path == "version":
+            return HTTPStatus.OK, b'{"detail": "stub"}', {}
+        if path == "accounting/subscription" and method == "GET":
+            if "sub_id" in parse_qs(url.query):
+                return HTTPStatus.OK, encoded_response("summary", 1), {}
+            return HTTPStatus.OK, encoded_response("summary", config.subscriptions), {}
+        if path in ("accounting/approvals", "accounting/allocations"):
+            return HTTPStatus.OK, encoded_response("records", config.rows), {}
+        if path == "accounting/finance":
+            return HTTPStatus.OK, encoded_response("finances", config.rows), {}
+        if path.startswith("accounting/finances/"):
+            finance_id = int(path.rsplit("/", 1)[1])
+            body = json.dumps(make_finance(finance_id, str(UUID(int=1))))
+            return HTTPStatus.OK, body.encode("utf-8"), {"ETag": f'"{finance_id}"'}
+        if path == "accounting/cli-cost-recovery":
+            return HTTPStatus.OK, encoded_response("costs", config.rows), {}
+        if method == "POST" and path in (
+            "accounting/subscription",
+            "accounting/persistent",
+            "accounting/approve",
+            "accounting/topup",
+            "accounting/finances",
+        ):
+            return HTTPStatus.OK, b'{"status": "success"}', {}
+        return HTTPStatus.NOT_FOUND, b'{"detail": "Not Found"}', {}
+
+    def _handle(self, method: str) -> None:
+        """Respond to a request."""
+        self.server.count_request()
+        status, body, headers = self._route(method)
+        self._respond(status, body, headers)
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Respond to a GET."""
+        self._handle("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        """Respond to a POST."""
+        self._handle("POST")
+
+    def do_PUT(self) -> None:  # noqa: N802
+        """Respond to a PUT."""
+        self._handle("PUT")
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        """Respond to a DELETE."""
+        self._handle("DELETE")
+
+
+class StubServer(ThreadingHTTPServer):
+    """The stub API, which serves from a background thread once started.
+
+    Attributes:
+        config: How the stub behaves.
+        requests: How many requests it has answered.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[StubConfig] = None, port: int = 0) -> None:
+        """Initialize the StubServer class."""
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.config = config or StubConfig()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """The port the stub is listening on."""
+        return self.server_address[1]
+
+    def count_request(self) -> None:
+        """Count a request."""
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> "StubServer":
+        """Serve requests from a background thread.
+
+        Returns:
+            The server.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests."""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        """Start the stub."""
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Stop the stub."""
+        self.stop()
+
+
+def main() -> None:
+    """Run the stub API in the foreground."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="in seconds")
+    parser.add_argument("--subscriptions", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=5)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.subscriptions, args.rows)
+    server = StubServer(config, args.port)
+    print(f"Serving the stub RCTab API on http://127.0.0.1:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
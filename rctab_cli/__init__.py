@@ -1,5 +1,19 @@
-"""RCTab CLI package."""
+"""RCTab CLI package.
 
-from rctab_cli.cli import acquire_access_token, app
+The CLI is imported when it is first used, rather than with the package, so
+that the rctab entry point can hand commands to the daemon without it.
+"""
+
+from typing import Any
 
 __all__ = ["app", "acquire_access_token"]
+
+
+def __getattr__(name: str) -> Any:
+    """Import the CLI when one of its attributes is first used."""
+    if name in __all__:
+        # pylint: disable=import-outside-toplevel
+        from rctab_cli import cli
+
+        return getattr(cli, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,312 @@
+"""Asynchronous client for the RCTab API.
+
+Used by commands that make many independent requests, e.g. for many
+subscriptions, so that the requests can be in flight at the same time.
+aiohttp is imported when a session is opened rather than with this module,
+to keep the CLI's start-up fast. Timeouts and retries follow the same
+policy as the synchronous client.
+"""
+
+import asyncio
+import json
+import logging
+from json.decoder import JSONDecodeError
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Collection, Dict, Optional, Tuple, Type
+from uuid import UUID
+
+from rctab_cli import endpoints, trace
+from rctab_cli.client import APIError, update_cached_reads
+from rctab_cli.journal import IDEMPOTENCY_HEADER, Journal, idempotency_key
+from rctab_cli.retry import CircuitBreaker, RetryPolicy
+from rctab_cli.state import state
+from rctab_cli.utils import create_url
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class AsyncRCTabClient:
+    """An asyncio client for the RCTab API with bounded concurrency.
+
+    Use as an async context manager so that one aiohttp session, and its
+    connections, are shared by every request.
+
+    Attributes:
+        max_concurrency: Maximum number of requests in flight at once.
+        retry_policy: The timeouts and retries for each request.
+        circuit_breaker: Stops requests while the API is failing.
+        journal: If given, approvals, allocations and finance records that
+            it shows were already made are not sent again.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        journal: Optional[Journal] = None,
+    ) -> None:
+        """Initialize the AsyncRCTabClient class."""
+        self.max_concurrency = max_concurrency
+        self.journal = journal
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    async def __aenter__(self) -> "AsyncRCTabClient":
+        """Open the shared aiohttp session."""
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            headers={"Accept": "application/json"},
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.retry_policy.connect_timeout,
+                sock_read=self.retry_policy.read_timeout,
+            ),
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close the shared aiohttp session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        accept_status: Collection[int] = (),
+        with_etag: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        """Send an authenticated request and decode the response.
+
+        Args:
+            method: The HTTP method.
+            path: The path part of the URL.
+            accept_status: Non-2xx status codes that should not raise.
+            with_etag: Whether to also return the ETag header of the response.
+            kwargs: Passed on to aiohttp, e.g. json or params.
+
+        Raises:
+            RuntimeError: If the client is used outside its context manager.
+            APIError: If the response status code is not in the 200s.
+            aiohttp.ClientConnectionError: If the API cannot be reached.
+            asyncio.TimeoutError: If the API does not respond in time.
+
+        Returns:
+            The decoded JSON body, or the text body if it is not JSON. With
+            with_etag, a tuple of the body and the ETag, if any.
+        """
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        if self._session is None:
+            raise RuntimeError("AsyncRCTabClient must be used with 'async with'")
+
+        endpoint = create_url(path)
+
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            headers = {
+                **kwargs.get("headers", {}),
+                "Authorization": f"Bearer {state.get_access_token()}",
+            }
+            try:
+                async with self._semaphore:
+                    with trace.span(
+                        f"{method} {path}", "http", concurrent=True, attempt=attempt
+                    ) as span:
+                        async with self._session.request(
+                            method, endpoint, **{**kwargs, "headers": headers}
+                        ) as resp:
+                            try:
+                                detail = await resp.json(content_type=None)
+                            except JSONDecodeError:
+                                detail = await resp.text()
+                            span.set(
+                                status=resp.status,
+                                bytes=resp.headers.get("Content-Length"),
+                            )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                self.circuit_breaker.record_failure()
+                delay = self.retry_policy.next_delay(method, path, attempt)
+                if delay is None:
+                    raise
+                logging.info("%s %s failed: %r", method, path, error)
+            else:
+                self.circuit_breaker.record_status(resp.status)
+                delay = self.retry_policy.next_delay(
+                    method, path, attempt, resp.status, resp.headers.get("Retry-After")
+                )
+                if delay is None:
+                    break
+                logging.info("%s %s returned %s", method, path, resp.status)
+
+            # Back off outside the semaphore so other requests can proceed
+            logging.info("Retrying in %.1f seconds", delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if not 200 <= resp.status <= 299 and resp.status not in accept_status:
+            raise APIError(resp.status, detail)
+        if method != "GET" and 200 <= resp.status <= 299:
+            update_cached_reads(
+                path,
+                kwargs.get("json"),
+                detail if isinstance(detail, str) else json.dumps(detail),
+                resp.headers.get("ETag"),
+            )
+        if with_etag:
+            return detail, resp.headers.get("ETag")
+        return detail
+
+    async def change(self, path: str, body: Dict[str, Any]) -> Any:
+        """POST a change, at most once if the client has a journal.
+
+        Args:
+            path: The path part of the URL.
+            body: The JSON body of the request.
+
+        Returns:
+            The decoded response, or the journal entry if the change was
+            already made.
+        """
+        if self.journal is None:
+            return await self.request("POST", path, json=body)
+
+        key = idempotency_key(path, body)
+        entry = self.journal.find(key)
+        if entry is not None:
+            return entry
+
+        detail = await self.request(
+            "POST", path, json=body, headers={IDEMPOTENCY_HEADER: key}
+        )
+        self.journal.record(key, path, detail)
+        return detail
+
+    async def add_subscription(self, subscription_id: UUID) -> Any:
+        """Add a subscription to the billing system.
+
+        A subscription that already exists is not an error.
+        """
+        return await self.request(
+            "POST",
+            endpoints.SUBSCRIPTION.path(),
+            accept_status=(409,),
+            json={"sub_id": str(subscription_id)},
+        )
+
+    async def set_persistence(self, subscription_id: UUID, always_on: bool) -> Any:
+        """Set the persistence of a subscription."""
+        return await self.request(
+            "POST",
+            endpoints.PERSISTENT.path(),
+            json={"sub_id": str(subscription_id), "always_on": always_on},
+        )
+
+    async def approve(
+        self,
+        subscription_id: UUID,
+        ticket: str,
+        amount: float,
+        allocate: bool,
+        date_from: str,
+        date_to: str,
+        force: bool = False,
+    ) -> Any:
+        """Create an approval for a subscription."""
+        return await self.change(
+            endpoints.APPROVE.path(),
+            {
+                "sub_id": str(subscription_id),
+                "ticket": ticket,
+                "amount": amount,
+                "allocate": allocate,
+                "date_from": date_from,
+                "date_to": date_to,
+                "force": force,
+            },
+        )
+
+    async def topup(self, subscription_id: UUID, ticket: str, amount: float) -> Any:
+        """Create an allocation for a subscription."""
+        return await self.change(
+            endpoints.TOPUP.path(),
+            {"sub_id": str(subscription_id), "ticket": ticket, "amount": amount},
+        )
+
+    async def approvals(self, subscription_id: UUID) -> Any:
+        """List all approvals for a subscription."""
+        return await self.request(
+            "GET", endpoints.APPROVALS.path(), json={"sub_id": str(subscription_id)}
+        )
+
+    async def allocations(self, subscription_id: UUID) -> Any:
+        """List all allocations for a subscription."""
+        return await self.request(
+            "GET", endpoints.ALLOCATIONS.path(), json={"sub_id": str(subscription_id)}
+        )
+
+    async def summary(self, subscription_id: Optional[UUID] = None) -> Any:
+        """Get a summary for one or all subscriptions."""
+        params = {"sub_id": str(subscription_id)} if subscription_id else {}
+        return await self.request("GET", endpoints.SUBSCRIPTION.path(), params=params)
+
+    async def finance_create(self, finance: Dict[str, Any]) -> Any:
+        """Create a finance record."""
+        return await self.change(endpoints.FINANCES.path(), finance)
+
+    async def finance_get(self, finance_id: int) -> Any:
+        """Get a finance record."""
+        return await self.request("GET", endpoints.FINANCE.path(finance_id=finance_id))
+
+    async def finance_read(self, finance_id: int) -> Tuple[Any, Optional[str]]:
+        """Get a finance record and its ETag."""
+        detail, etag = await self.request(
+            "GET", endpoints.FINANCE.path(finance_id=finance_id), with_etag=True
+        )
+        return detail, etag
+
+    async def finance_update(
+        self, finance_id: int, finance: Dict[str, Any], etag: Optional[str] = None
+    ) -> Any:
+        """Replace a finance record, if it still matches the ETag when given."""
+        return await self.request(
+            "PUT",
+            endpoints.FINANCE.path(finance_id=finance_id),
+            json=finance,
+            headers={"If-Match": etag} if etag else {},
+        )
+
+    async def finance_delete(self, finance_id: int, subscription_id: UUID) -> Any:
+        """Delete a finance record."""
+        return await self.request(
+            "DELETE",
+            endpoints.FINANCE.path(finance_id=finance_id),
+            json={"sub_id": str(subscription_id)},
+        )
+
+    async def finance_list(self, subscription_id: UUID) -> Any:
+        """List all finance records for a subscription."""
+        return await self.request(
+            "GET", endpoints.FINANCE_LIST.path(), json={"sub_id": str(subscription_id)}
+        )
+
+    async def cost_recovery(self, first_day: str, for_real: bool = False) -> Any:
+        """Calculate, and optionally commit, the recoverable costs for a month."""
+        return await self.request(
+            "POST" if for_real else "GET",
+            endpoints.COST_RECOVERY.path(),
+            json={"first_day": first_day},
+        )
@@ -1,17 +1,29 @@
-"""Authentication helpers for the RCTab CLI."""
+"""Authentication helpers for the RCTab CLI.
+
+MSAL is imported only when a token is needed, so that commands which
+don't talk to the API start quickly.
+"""
 
 import atexit
 import logging
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-import msal
-import requests
 import typer
 
-from rctab_cli.config import APP_NAME
+from rctab_cli import trace
+from rctab_cli.config import APP_NAME, get_auth_settings
+from rctab_cli.utils import atomic_write_text, file_lock
+
+if TYPE_CHECKING:
+    import msal
+    import requests
 
 
-class BearerAuth(requests.auth.AuthBase):
+class BearerAuth:
     """Bearer authentication class.
 
     Attributes:
@@ -22,14 +34,17 @@ class BearerAuth(requests.auth.AuthBase):
         """Initialize the BearerAuth class."""
         self.token = token
 
-    def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
+    def __call__(self, r: "requests.PreparedRequest") -> "requests.PreparedRequest":
         """Add the bearer token to the request headers."""
         r.headers["authorization"] = "Bearer " + self.token
         return r
 
 
-def write_cache(token_cache_f: Path, cache: msal.TokenCache) -> None:
-    """Save the token cache to a file.
+def write_cache(token_cache_f: Path, cache: "msal.SerializableTokenCache") -> None:
+    """Save the token cache to a file, if it has changed.
+
+    The file is replaced atomically while holding a lock, so that parallel
+    invocations of the CLI cannot corrupt each other's cache.
 
     Args:
         token_cache_f: The path to the token cache file.
@@ -38,31 +53,213 @@ def write_cache(token_cache_f: Path, cache: msal.TokenCache) -> None:
     Returns:
         None.
     """
-    if not token_cache_f.exists():
-        token_cache_f.touch(mode=0o700)
+    if not cache.has_state_changed:
+        return
+
+    token_cache_f.parent.mkdir(0o700, parents=True, exist_ok=True)
 
     logging.info("Saving auth token to cache")
-    token_cache_f.write_text(cache.serialize())
+    with file_lock(token_cache_f.with_name(token_cache_f.name + ".lock")):
+        atomic_write_text(token_cache_f, cache.serialize())
+    cache.has_state_changed = False
 
 
-def load_cache() -> msal.TokenCache:
+def get_token_cache_path() -> Path:
+    """Get the path of the token cache file.
+
+    Returns:
+        The path, which may not exist yet.
+    """
+    return Path(typer.get_app_dir(APP_NAME)) / "cache.bin"
+
+
+@lru_cache()
+def load_cache() -> "msal.SerializableTokenCache":
     """Load the token cache from a file.
 
+    The cache is loaded once per process and written back at exit if it
+    changed.
+
     Returns:
         The token cache.
     """
-    app_dir = Path(typer.get_app_dir(APP_NAME))
-    token_cache_f = app_dir / "cache.bin"
+    import msal  # pylint: disable=import-outside-toplevel
+
+    token_cache_f = get_token_cache_path()
     cache = msal.SerializableTokenCache()
 
     if token_cache_f.exists():
         cache.deserialize(token_cache_f.read_text(encoding="utf-8"))
 
-    atexit.register(
-        lambda: write_cache(token_cache_f, cache)
-        # Hint: The following optional line persists only when state changed
-        # if cache.has_state_changed
-        # else None
-    )
+    atexit.register(write_cache, token_cache_f, cache)
 
     return cache
+
+
+def save_cache() -> None:
+    """Save the token cache now, rather than at exit, if it has changed.
+
+    Long-running processes, such as the daemon, call this so that renewed
+    tokens are not lost if the process is killed.
+
+    Returns:
+        None.
+    """
+    if load_cache.cache_info().currsize:
+        write_cache(get_token_cache_path(), load_cache())
+
+
+def reload_cache() -> None:
+    """Read the token cache file again, e.g. after another process signed in.
+
+    Returns:
+        None.
+    """
+    token_cache_f = get_token_cache_path()
+    if token_cache_f.exists():
+        load_cache().deserialize(token_cache_f.read_text(encoding="utf-8"))
+
+
+class SignInRequired(Exception):
+    """When a token can't be acquired without signing in interactively."""
+
+
+class TokenProvider:
+    """Acquire access tokens once and reuse them for the rest of the process.
+
+    The MSAL application, its token cache and the most recent token result
+    are kept for the lifetime of the provider, so only the first lookup
+    (and any lookup close to the token's expiry) goes through MSAL.
+    Lookups are serialised with a lock, so the provider can be shared
+    between threads.
+
+    Attributes:
+        refresh_margin: Seconds before expiry at which the token is renewed.
+        interactive: Whether the user may be asked to sign in, which
+            processes without a user, such as the daemon, turn off.
+    """
+
+    def __init__(self, refresh_margin: float = 300, interactive: bool = True) -> None:
+        """Initialize the TokenProvider class."""
+        self.refresh_margin = refresh_margin
+        self.interactive = interactive
+        self._lock = threading.Lock()
+        self._msal_app: Optional["msal.PublicClientApplication"] = None
+        self._result: Optional[Dict] = None
+        self._expires_at = 0.0
+
+    def _get_msal_app(self) -> "msal.PublicClientApplication":
+        """Build the MSAL application on first use.
+
+        Returns:
+            The MSAL public client application.
+        """
+        if self._msal_app is None:
+            with trace.span("msal.load", "auth"):
+                import msal  # pylint: disable=import-outside-toplevel
+
+                app_dir = Path(typer.get_app_dir(APP_NAME))
+                app_dir.mkdir(0o700, exist_ok=True)
+
+                auth = get_auth_settings()
+                self._msal_app = msal.PublicClientApplication(
+                    str(auth.client_id),
+                    authority=auth.authority,
+                    token_cache=load_cache(),
+                )
+        return self._msal_app
+
+    @staticmethod
+    def _scopes() -> List[str]:
+        """Get the scopes that tokens are requested for."""
+        return [f"api://{str(get_auth_settings().client_id)}/admin"]
+
+    def _acquire_silent(self) -> Optional[Dict]:
+        """Get a token from the MSAL cache, refreshing it if need be.
+
+        Returns:
+            The MSAL token result, or None if the user must sign in.
+        """
+        msal_app = self._get_msal_app()
+
+        # pylint: disable=W0511
+        # Firstly, check the cache to see if this end user has signed in before
+        accounts = msal_app.get_accounts()
+        if not accounts:
+            return None
+        logging.info("Account(s) exists in cache, probably with token too. Let's try.")
+        user = accounts[0]
+        with trace.span("msal.silent", "auth"):
+            return msal_app.acquire_token_silent(scopes=self._scopes(), account=user)
+
+    def _acquire(self, interactive: bool) -> Dict:
+        """Get a token from the MSAL cache, or interactively from Azure.
+
+        Args:
+            interactive: Whether the user may be asked to sign in.
+
+        Raises:
+            SignInRequired: If the user must sign in but may not be asked to.
+
+        Returns:
+            The MSAL token result.
+        """
+        result = self._acquire_silent()
+        if not interactive and "access_token" not in (result or {}):
+            # Another process may have signed in since the cache was loaded
+            reload_cache()
+            result = self._acquire_silent()
+            if "access_token" not in (result or {}):
+                raise SignInRequired()
+
+        if not result:
+            logging.info(
+                "No suitable token exists in cache. Let's get a new one from AAD."
+            )
+            with trace.span("msal.interactive", "auth"):
+                result = self._get_msal_app().acquire_token_interactive(
+                    scopes=self._scopes()
+                )
+
+        return result
+
+    def acquire(self, interactive: Optional[bool] = None) -> Dict:
+        """Return a valid token result, renewing it only when near expiry.
+
+        Args:
+            interactive: Whether the user may be asked to sign in, if not as
+                the provider was configured.
+
+        Raises:
+            SignInRequired: If the user must sign in but may not be asked to.
+
+        Returns:
+            The MSAL token result, including the access token.
+        """
+        with self._lock, trace.span("acquire_access_token", "auth") as span:
+            if (
+                self._result is not None
+                and time.monotonic() < self._expires_at - self.refresh_margin
+            ):
+                span.set(memoized=True)
+                return self._result
+
+            span.set(memoized=False)
+            result = self._acquire(
+                self.interactive if interactive is None else interactive
+            )
+            if "access_token" in result:
+                # Only memoize successful results so that errors are retried
+                self._result = result
+                self._expires_at = time.monotonic() + float(result.get("expires_in", 0))
+            return result
+
+
+@lru_cache()
+def get_token_provider() -> TokenProvider:
+    """Create the process-wide instance of TokenProvider.
+
+    Returns:
+        Instance of TokenProvider.
+    """
+    return TokenProvider()
@@ -0,0 +1,207 @@
+"""Run many commands, read from standard input, in one process.
+
+Each line of input is one command, either as a shell-style command line,
+e.g. ``sub finance get --subscription-id 000-000-000-001``, as a JSON array
+of arguments or as a JSON object with the arguments in "argv" and an "id"
+to identify the result by. A leading ``rctab`` is ignored. Blank lines and
+lines starting with # are skipped.
+
+The commands share the settings, the access token and the connection pool,
+so only the first pays for them. For each command, one line of JSON is
+printed with its id (the line number, if it wasn't given), its exit code
+and what it printed. With more than one worker, commands run concurrently
+and their results are printed as they finish, so may be out of order.
+"""
+
+import contextvars
+import io
+import json
+import shlex
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Iterable, List, Optional, TextIO, Tuple
+
+from rctab_cli.daemon import NoStdin, StdinRequired, invoke_command
+from rctab_cli.output import dumps
+
+
+class _ThreadStream(io.TextIOBase):
+    """Standard output or error that each thread can capture separately.
+
+    Threads that are running a command write to their own buffer and others
+    write to the stream that this replaced.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        """Initialize the _ThreadStream class."""
+        super().__init__()
+        self.stream = stream
+        self.local = threading.local()
+
+    @property
+    def encoding(self) -> str:  # type: ignore
+        """The encoding of the text, which stays in memory when captured."""
+        return "utf-8"
+
+    def capture(self) -> None:
+        """Start capturing what the current thread writes."""
+        self.local.buffer = io.StringIO()
+
+    def release(self) -> str:
+        """Stop capturing what the current thread writes.
+
+        Returns:
+            What was written since capture() was called.
+        """
+        buffer = self.local.buffer
+        self.local.buffer = None
+        return buffer.getvalue()
+
+    def write(self, text: str) -> int:  # type: ignore
+        """Write to this thread's buffer or the original stream."""
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self) -> None:
+        """Flush the original stream, if this thread isn't capturing."""
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+    def isatty(self) -> bool:
+        """Whether this is a terminal, which it isn't to commands."""
+        return False
+
+
+@dataclass
+class BatchResult:
+    """The result of one command.
+
+    Attributes:
+        id: The id given with the command, or its line number.
+        exit_code: The exit code of the command.
+        stdout: What the command printed to standard output.
+        stderr: What the command printed to standard error.
+    """
+
+    id: Any
+    exit_code: int
+    stdout: str = ""
+    stderr: str = ""
+
+
+def parse_line(line: str, line_number: int) -> Optional[Tuple[Any, List[str]]]:
+    """Read a command from a line of input.
+
+    Args:
+        line: The line.
+        line_number: The number of the line, the default id of the command.
+
+    Raises:
+        ValueError: If the line is not a valid command.
+
+    Returns:
+        The id and the arguments of the command, or None for a blank line
+        or comment.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    command_id: Any = line_number
+    if line.startswith("{"):
+        spec = json.loads(line)
+        command_id = spec.get("id", line_number)
+        argv = spec.get("argv")
+    elif line.startswith("["):
+        argv = json.loads(line)
+    else:
+        argv = shlex.split(line)
+
+    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+        raise ValueError("The arguments must be a list of strings")
+    if argv[:1] == ["rctab"]:
+        argv = argv[1:]
+    if not argv:
+        raise ValueError("There is no command")
+    if argv[0] in ("batch", "daemon"):
+        raise ValueError(f"{argv[0]} commands can't be run in a batch")
+    return command_id, argv
+
+
+def run_batch(
+    lines: Iterable[str], workers: int = 1, global_args: Optional[List[str]] = None
+) -> int:
+    """Run commands and print the result of each as a line of JSON.
+
+    Args:
+        lines: The commands, one per line.
+        workers: How many commands to run at a time.
+        global_args: Options to give rctab before each command,
+            e.g. --no-cache.
+
+    Returns:
+        0 if every command succeeded, else 1.
+    """
+    global_args = global_args or []
+    old_stdin, old_stdout, old_stderr = sys.stdin, sys.stdout, sys.stderr
+    stdout, stderr = _ThreadStream(old_stdout), _ThreadStream(old_stderr)
+    # Commands can't read our input and can't ask questions
+    sys.stdin = NoStdin()
+    sys.stdout, sys.stderr = stdout, stderr  # type: ignore
+
+    write_lock = threading.Lock()
+    # Don't read much further ahead than we can run
+    slots = threading.BoundedSemaphore(workers * 2)
+    failed = False
+
+    def run(command_id: Any, argv: List[str]) -> BatchResult:
+        stdout.capture()
+        stderr.capture()
+        try:
+            exit_code = invoke_command(global_args + argv)
+        except StdinRequired:
+            print(
+                "The command needs standard input, give it every option",
+                file=sys.stderr,
+            )
+            exit_code = 1
+        finally:
+            out, err = stdout.release(), stderr.release()
+        return BatchResult(command_id, exit_code, out, err)
+
+    def done(future: "Future[BatchResult]") -> None:
+        nonlocal failed
+        slots.release()
+        result = future.result()
+        with write_lock:
+            failed = failed or result.exit_code != 0
+            old_stdout.write(dumps(asdict(result)) + "\n")
+            old_stdout.flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for line_number, line in enumerate(lines, start=1):
+                try:
+                    parsed = parse_line(line, line_number)
+                except ValueError as error:
+                    # Queued like a command, so that one worker keeps the order
+                    slots.acquire()  # pylint: disable=consider-using-with
+                    executor.submit(
+                        BatchResult, line_number, 2, stderr=f"{error}\n"
+                    ).add_done_callback(done)
+                    continue
+                if parsed is None:
+                    continue
+                slots.acquire()  # pylint: disable=consider-using-with
+                # Each command has its own copy of the context, so that one
+                # traced with --trace doesn't record the others' spans
+                command_id, argv = parsed
+                executor.submit(
+                    contextvars.copy_context().run, run, command_id, argv
+                ).add_done_callback(done)
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = old_stdin, old_stdout, old_stderr
+
+    return 1 if failed else 0
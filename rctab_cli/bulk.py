@@ -0,0 +1,263 @@
+"""Helpers for commands that act on many records at once.
+
+Records are read lazily from CSV or JSON Lines files, validated one at a
+time and processed by a fixed number of concurrent workers, so large
+manifests never need to be held in memory.
+"""
+
+import asyncio
+import csv
+import itertools
+import json
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+import typer
+from pydantic import BaseModel, ValidationError
+
+from rctab_cli.client import APIError
+from rctab_cli.journal import JournalEntry
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+
+@dataclass
+class RowResult:
+    """The outcome of processing one record.
+
+    Attributes:
+        row: The 1-based position of the record in its input.
+        ok: Whether the record was processed successfully.
+        key: A human-readable identifier for the record, e.g. its subscription ID.
+        detail: The API response on success, or the error message on failure.
+        skipped: Whether the journal showed the record was already processed.
+    """
+
+    row: int
+    ok: bool
+    key: str
+    detail: Any
+    skipped: bool = False
+
+
+def _parse_lines(lines: Iterable[str], is_csv: bool) -> Iterator[Dict[str, Any]]:
+    """Parse CSV or JSON Lines, dropping empty values."""
+    if is_csv:
+        records: Iterable[Dict[str, Any]] = csv.DictReader(lines)
+    else:
+        records = (json.loads(line) for line in lines if line.strip())
+
+    for record in records:
+        yield {
+            key.strip(): value
+            for key, value in record.items()
+            if key is not None and value not in ("", None)
+        }
+
+
+def read_records(file: Optional[Path]) -> Iterator[Dict[str, Any]]:
+    """Stream records from a CSV file or a JSON Lines file.
+
+    Files ending in .csv are read as CSV with a header row and anything
+    else as one JSON object per line. Standard input is read as JSON Lines
+    if it starts with "{" and as CSV otherwise. Empty values are dropped
+    so that defaults apply to them.
+
+    Args:
+        file: The path to the file, or None to read standard input.
+
+    Yields:
+        One dictionary per record.
+    """
+    if file is None:
+        lines = (line for line in sys.stdin if line.strip())
+        first_line = next(lines, "")
+        yield from _parse_lines(
+            itertools.chain([first_line], lines),
+            is_csv=not first_line.lstrip().startswith("{"),
+        )
+        return
+
+    with open(file, encoding="utf-8", newline="") as handle:
+        yield from _parse_lines(handle, is_csv=file.suffix.lower() == ".csv")
+
+
+def parse_records(
+    records: Iterable[Dict[str, Any]], model: Type[ModelT]
+) -> Iterator[Tuple[int, Dict[str, Any], Union[ModelT, str]]]:
+    """Validate records against a model.
+
+    Args:
+        records: The raw records.
+        model: The pydantic model each record should match.
+
+    Yields:
+        The 1-based row number, the raw record and either the parsed
+        model or an error message.
+    """
+    for row, record in enumerate(records, start=1):
+        try:
+            yield row, record, model.parse_obj(record)
+        except ValidationError as error:
+            yield row, record, "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                for err in error.errors()
+            )
+
+
+async def map_concurrently(
+    func: Callable[[ItemT], Awaitable[ResultT]],
+    items: Iterable[ItemT],
+    workers: int,
+) -> List[ResultT]:
+    """Apply an async function to items with a fixed number of workers.
+
+    Items are pulled from the iterable only when a worker is free, so the
+    iterable can be a lazy stream.
+
+    Args:
+        func: The async function to apply.
+        items: The items to process.
+        workers: The number of items to process at the same time.
+
+    Returns:
+        The results, in the order they completed.
+    """
+    iterator = iter(items)
+    results: List[ResultT] = []
+
+    async def worker() -> None:
+        for item in iterator:
+            results.append(await func(item))
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return results
+
+
+async def run_records(
+    file: Optional[Path],
+    model: Type[ModelT],
+    func: Callable[[ModelT], Awaitable[Any]],
+    workers: int,
+    key_field: str = "subscription_id",
+) -> List[RowResult]:
+    """Validate and process every record in a file, several at a time.
+
+    Invalid records and records whose processing raises are reported as
+    failures without stopping the others. Records whose processing returns
+    a journal entry are reported as skipped.
+
+    Args:
+        file: The path to the file, or None to read standard input.
+        model: The pydantic model each record should match.
+        func: The async function that processes one valid record.
+        workers: The number of records to process at the same time.
+        key_field: The field that identifies a record in the results.
+
+    Returns:
+        The outcome of each record, in the order they completed.
+    """
+
+    async def process(
+        item: Tuple[int, Dict[str, Any], Union[ModelT, str]]
+    ) -> RowResult:
+        row, record, parsed = item
+        key = str(record.get(key_field, f"unknown {key_field}"))
+        if isinstance(parsed, str):
+            return RowResult(row, False, key, parsed)
+
+        try:
+            detail = await func(parsed)
+        except Exception as error:  # pylint: disable=broad-except
+            return RowResult(row, False, key, error_detail(error))
+        if isinstance(detail, JournalEntry):
+            return RowResult(row, True, key, detail.response, skipped=True)
+        return RowResult(row, True, key, detail)
+
+    return await map_concurrently(
+        process, parse_records(read_records(file), model), workers
+    )
+
+
+def error_detail(error: Exception) -> str:
+    """Describe an error raised while processing a record.
+
+    Args:
+        error: The error.
+
+    Returns:
+        A one-line description.
+    """
+    if isinstance(error, APIError):
+        return f"status code {error.status_code}: {error.detail}"
+    return f"{type(error).__name__}: {error}"
+
+
+def write_results(results: Iterable[RowResult], results_file: Path) -> None:
+    """Save the outcome of each record as JSON Lines, in input order.
+
+    Args:
+        results: The outcome of each record.
+        results_file: The path of the file to write.
+
+    Returns:
+        None.
+    """
+    with open(results_file, "w", encoding="utf-8") as handle:
+        for result in sorted(results, key=lambda result: result.row):
+            handle.write(json.dumps(asdict(result), default=str) + "\n")
+
+
+def report_results(results: Iterable[RowResult]) -> None:
+    """Print one line per record and a final count.
+
+    Args:
+        results: The outcome of each record.
+
+    Raises:
+        typer.Exit: With exit code 1 if any record failed.
+
+    Returns:
+        None.
+    """
+    succeeded = skipped = failed = 0
+    for result in sorted(results, key=lambda result: result.row):
+        if result.skipped:
+            skipped += 1
+            typer.secho(
+                f"Row {result.row} ({result.key}): SKIPPED, already done",
+                fg=typer.colors.YELLOW,
+            )
+        elif result.ok:
+            succeeded += 1
+            typer.secho(f"Row {result.row} ({result.key}): OK", fg=typer.colors.GREEN)
+        else:
+            failed += 1
+            typer.secho(
+                f"Row {result.row} ({result.key}): FAILED {result.detail}",
+                fg=typer.colors.RED,
+            )
+
+    summary = f"{succeeded} succeeded, "
+    if skipped:
+        summary += f"{skipped} skipped, "
+    typer.echo(summary + f"{failed} failed")
+    if failed:
+        raise typer.Exit(code=1)
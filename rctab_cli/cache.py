@@ -0,0 +1,197 @@
+"""On-disk cache of responses from read-only API endpoints.
+
+Entries live in the app directory, next to the token cache. Each entry is
+keyed by the URL and request parameters and holds the response body with
+its ETag and Last-Modified headers, so that stale entries can be
+revalidated with a conditional request instead of downloaded again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import typer
+
+from rctab_cli.config import APP_NAME, get_cli_settings
+from rctab_cli.utils import atomic_write_text
+
+if TYPE_CHECKING:
+    import requests
+
+
+@dataclass
+class CachedResponse:
+    """A response stored in the cache.
+
+    Attributes:
+        url: The URL the response came from.
+        stored_at: When the response was fetched or last revalidated.
+        content: The response body.
+        etag: The ETag header of the response, if any.
+        last_modified: The Last-Modified header of the response, if any.
+    """
+
+    url: str
+    stored_at: float
+    content: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, ttl: float) -> bool:
+        """Whether the response is younger than ttl seconds."""
+        return time.time() - self.stored_at < ttl
+
+    def validators(self) -> Dict[str, str]:
+        """Headers for a conditional request that revalidates this response.
+
+        Returns:
+            The If-None-Match and If-Modified-Since headers, where known.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> "requests.Response":
+        """Rebuild a requests response from the cached data.
+
+        Returns:
+            A response with status code 200, the cached body and the
+            cached validators as headers.
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = self.url
+        resp.encoding = "utf-8"
+        resp.headers["Content-Type"] = "application/json"
+        if self.etag:
+            resp.headers["ETag"] = self.etag
+        if self.last_modified:
+            resp.headers["Last-Modified"] = self.last_modified
+        resp._content = self.content.encode("utf-8")  # pylint: disable=W0212
+        return resp
+
+
+class ResponseCache:
+    """A size-bounded, least-recently-used cache of responses on disk.
+
+    Attributes:
+        cache_dir: The directory holding one file per entry.
+        max_bytes: The total size above which the oldest entries are evicted.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int) -> None:
+        """Initialize the ResponseCache class."""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(url: str, **request_kwargs: Any) -> str:
+        """Make a cache key from a URL and the parameters of a request.
+
+        Args:
+            url: The URL of the request.
+            request_kwargs: The params and json body of the request.
+
+        Returns:
+            A hex digest identifying the request.
+        """
+        identity = json.dumps([url, request_kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _entry_f(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Look up an entry and mark it as recently used.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached response, or None if there isn't a readable one.
+        """
+        entry_f = self._entry_f(key)
+        try:
+            entry = CachedResponse(**json.loads(entry_f.read_text(encoding="utf-8")))
+            os.utime(entry_f)
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store an entry, evicting the least recently used ones if needed.
+
+        Args:
+            key: The cache key.
+            entry: The response to store.
+
+        Returns:
+            None.
+        """
+        self.cache_dir.mkdir(0o700, parents=True, exist_ok=True)
+        atomic_write_text(self._entry_f(key), json.dumps(asdict(entry)))
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        """Remove an entry, if there is one.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            None.
+        """
+        self._entry_f(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Remove every entry.
+
+        Returns:
+            None.
+        """
+        if not self.cache_dir.exists():
+            return
+        for entry_f in self.cache_dir.glob("*.json"):
+            entry_f.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until under max_bytes."""
+        entries = []
+        for entry_f in self.cache_dir.glob("*.json"):
+            try:
+                stat = entry_f.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_f))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_f in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logging.info("Evicting %s from the response cache", entry_f.name)
+            entry_f.unlink(missing_ok=True)
+            total -= size
+
+
+@lru_cache()
+def get_response_cache() -> ResponseCache:
+    """Create the process-wide instance of ResponseCache.
+
+    Returns:
+        Instance of ResponseCache.
+    """
+    return ResponseCache(
+        Path(typer.get_app_dir(APP_NAME)) / "responses",
+        max_bytes=get_cli_settings().response_cache_mb * 2**20,
+    )
@@ -2,10 +2,18 @@
 
 Attributes:
     app: Typer object for the CLI.
+    VERSION_CHECK_TIMEOUT: Seconds that --version waits for its lookups.
+    LATEST_TAGS_TTL: Seconds that the latest release tags are cached for.
 """
 
+import json
 import logging
 import os
+import shutil
+import sys
+import threading
+import time
+from functools import partial
 
 try:
     from importlib import metadata  # type: ignore
@@ -14,59 +22,44 @@ except ImportError:  # for Python<3.8
 
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Union
+from typing import Callable, Dict, Optional, Union
 
-import msal
-import requests
 import typer
 
-from rctab_cli.auth import BearerAuth, load_cache
-from rctab_cli.config import APP_NAME, get_auth_settings
+from rctab_cli import endpoints, trace
+from rctab_cli.auth import SignInRequired, get_token_provider
+from rctab_cli.batch import run_batch
+from rctab_cli.client import get_client
+from rctab_cli.config import APP_NAME
 from rctab_cli.state import state
-from rctab_cli.sub_apps import subscription_app
-from rctab_cli.utils import create_url
+from rctab_cli.sub_apps import daemon_app, jobs_app, store_app, subscription_app
+from rctab_cli.utils import atomic_write_text
+
+VERSION_CHECK_TIMEOUT = 0.8
+LATEST_TAGS_TTL = 24 * 60 * 60
 
 app = typer.Typer()
 
 app.add_typer(subscription_app, name="sub", help="Manage Azure subscriptions")
+app.add_typer(jobs_app, name="jobs", help="List and resume interrupted jobs")
+app.add_typer(
+    daemon_app, name="daemon", help="Run sub commands in a background process"
+)
+# The sync and query commands are top level
+app.add_typer(store_app)
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
 
 
 def acquire_access_token() -> Dict:
     """Get an access token from Azure.
 
+    The token is memoized by the process-wide token provider, so repeated
+    calls only contact Azure when the token is about to expire.
+
     Returns:
         Access token.
     """
-    app_dir = Path(typer.get_app_dir(APP_NAME))
-    app_dir.mkdir(0o700, exist_ok=True)
-
-    auth = get_auth_settings()
-    cache = load_cache()
-    msal_app = msal.PublicClientApplication(
-        str(auth.client_id), authority=auth.authority, token_cache=cache
-    )
-
-    # The pattern to acquire a token looks like this.
-    result = None
-
-    # pylint: disable=W0511
-    # Firstly, check the cache to see if this end user has signed in before
-    accounts = msal_app.get_accounts()
-    if accounts:
-        logging.info("Account(s) exists in cache, probably with token too. Let's try.")
-        user = accounts[0]
-        result = msal_app.acquire_token_silent(
-            scopes=[f"api://{str(auth.client_id)}/admin"], account=user
-        )
-
-    if not result:
-        logging.info("No suitable token exists in cache. Let's get a new one from AAD.")
-        result = msal_app.acquire_token_interactive(
-            scopes=[f"api://{str(auth.client_id)}/admin"],
-        )
-
-    return result
+    return get_token_provider().acquire()
 
 
 def version_callback(value: bool) -> None:
@@ -80,23 +73,52 @@ def version_callback(value: bool) -> None:
     """
     if value:
         cli_version = metadata.version(__package__)
-        api_version = get_api_version()
+
+        # The latest release tags change rarely, so are only looked up daily
+        latest_tags = load_latest_tags()
+        lookups = {"api_version": get_api_version}
+        if "cli" not in latest_tags:
+            lookups["cli"] = get_latest_cli_tag
+        if "api" not in latest_tags:
+            lookups["api"] = get_latest_api_tag
+
+        results = run_with_deadline(lookups, VERSION_CHECK_TIMEOUT)
+        new_tags = {
+            name: tag
+            for name, tag in results.items()
+            if name in ("cli", "api") and tag is not None
+        }
+        if new_tags:
+            save_latest_tags(new_tags)
+        latest_tags.update(new_tags)
+
+        api_version = results["api_version"]
         version_str = f"RCTab CLI version {cli_version}"
         if api_version:
             version_str += f", API version {api_version}"
         typer.secho(version_str, fg=typer.colors.GREEN)
-        check_cli_version(cli_version)
-        check_api_version(api_version)
+        check_cli_version(cli_version, latest_tags.get("cli"))
+        check_api_version(api_version, latest_tags.get("api"))
         raise typer.Exit()
 
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     version: bool = typer.Option(  # pylint: disable=unused-argument
         False,
         callback=version_callback,
         help="Display RCTab CLI version and API version.",
-    )
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Fetch fresh data instead of using cached responses."
+    ),
+    trace_file: Optional[Path] = typer.Option(
+        None,
+        "--trace",
+        dir_okay=False,
+        help="Save where the command spends its time to this file, as a Chrome trace.",
+    ),
 ) -> None:
     """Perform RCTab administrative duties.
 
@@ -109,6 +131,17 @@ def main(
     See also https://github.com/alan-turing-institute/rctab
     """
     state.access_token = acquire_access_token
+    state.no_cache = no_cache
+
+    if trace_file is not None:
+        trace.start_tracing()
+        # Closed in reverse order, so the command's span ends first
+        ctx.call_on_close(partial(trace.stop_tracing, trace_file))
+        ctx.with_resource(
+            trace.span(
+                f"rctab {ctx.invoked_subcommand}", argv=ctx.protected_args + ctx.args
+            )
+        )
 
 
 @app.command()
@@ -120,12 +153,16 @@ def logout() -> None:
     """
     app_dir = Path(typer.get_app_dir(APP_NAME))
 
-    cache_dir = app_dir / "cache.bin"
+    for cache_name in ("cache.bin", "cache.bin.lock", "latest_tags.json"):
+        (app_dir / cache_name).unlink(missing_ok=True)
 
-    if cache_dir.exists():
-        cache_dir.unlink()
+    responses_dir = app_dir / "responses"
 
-    if app_dir.exists():
+    if responses_dir.exists():
+        shutil.rmtree(responses_dir)
+
+    # Keep the directory if it still holds other data, e.g. job state
+    if app_dir.exists() and not any(app_dir.iterdir()):
         app_dir.rmdir()
 
 
@@ -139,9 +176,8 @@ def request_access() -> None:
     Returns:
         None.
     """
-    path = "admin/request-access"
-    endpoint = create_url(path)
-    resp = requests.post(endpoint, auth=BearerAuth(state.get_access_token()))
+    path = endpoints.REQUEST_ACCESS.path()
+    resp = get_client().post(path)
 
     if resp.status_code != 200:
         typer.echo(
@@ -163,79 +199,217 @@ def token() -> None:
     typer.echo(state.get_access_token(), nl=False)
 
 
+@app.command()
+def batch(
+    workers: int = typer.Option(
+        1,
+        min=1,
+        max=32,
+        help="Commands to run at a time. Results are printed as they finish.",
+    ),
+) -> None:
+    """Run commands read from standard input, one per line, in one process.
+
+    Each line is a command line, e.g. 'sub finance get --subscription-id ...',
+    a JSON array of arguments, or a JSON object with the arguments in "argv"
+    and an "id" to find the result by. One line of JSON is printed for each
+    command, with its id, exit code, stdout and stderr.
+    """
+    global_args = ["--no-cache"] if state.no_cache else []
+    exit_code = run_batch(sys.stdin, workers, global_args)
+    if exit_code:
+        raise typer.Exit(code=exit_code)
+
+
 def get_api_version() -> Union[str, None]:
-    """Get the RCTab CLI version.
+    """Get the RCTab API version.
+
+    The version is only looked up if there is an access token already, as
+    showing the version should not ask the user to sign in.
 
     Returns:
-        The RCTab CLI version if the request is successful, else None.
+        The RCTab API version if the user is signed in and the request is
+        successful, else None.
     """
-    path = "version"
-    endpoint = create_url(path)
-    state.access_token = acquire_access_token
-    resp = requests.get(endpoint, auth=BearerAuth(state.get_access_token()))
+    path = endpoints.VERSION.path()
+    acquire_silently = partial(get_token_provider().acquire, interactive=False)
+    try:
+        acquire_silently()
+    except SignInRequired:
+        return None
+    if state.access_token is None:
+        # The --version callback runs before main() has set this
+        state.access_token = acquire_silently
+    # Retries would outlast the deadline in version_callback
+    resp = get_client().get(path, timeout=VERSION_CHECK_TIMEOUT, retry=False)
     if resp.status_code != 200:
         return None
     return resp.json()["detail"]
 
 
-def check_api_version(api_version: Union[str, None]) -> None:
-    """Check the RCTab API version on Azure uses the latest Docker Hub image.
+def get_latest_api_tag() -> Union[str, None]:
+    """Get the tag of the latest RCTab API image on Docker Hub.
 
-    A list of docker image tags is retrieved from Docker Hub along with the time
-    when they were pushed. The latest image tag is then compared to the API version.
+    A list of docker image tags is retrieved from Docker Hub along with the
+    time when they were pushed.
 
-    Args:
-        api_version: The RCTab API version on Azure.
+    Returns:
+        The most recently pushed tag if the request is successful, else None.
     """
+    import requests  # pylint: disable=import-outside-toplevel
+
     url = "https://hub.docker.com/v2/repositories/turingrc/rctab-api/tags"
-    response = requests.get(url)
-    if api_version and response.status_code == 200 and response.json() != []:
-        tag_names = {
-            datetime.strptime(tag["tag_last_pushed"], "%Y-%m-%dT%H:%M:%S.%fZ"): tag[
-                "name"
-            ]
-            for tag in response.json()["results"]
-            if "release" not in tag["name"]
-        }
-        latest_tag = tag_names[max(tag_names.keys())]
-        if latest_tag != api_version:
-            typer.secho(
-                "You are using an old version of the RCTab API."
-                f"The latest version is {latest_tag}. Restart the webapp in the "
-                "Azure portal to update to the latest version.",
-                fg=typer.colors.YELLOW,
-            )
+    response = requests.get(url, timeout=VERSION_CHECK_TIMEOUT)
+    if response.status_code != 200 or response.json() == []:
+        return None
+    tag_names = {
+        datetime.strptime(tag["tag_last_pushed"], "%Y-%m-%dT%H:%M:%S.%fZ"): tag["name"]
+        for tag in response.json()["results"]
+        if "release" not in tag["name"]
+    }
+    return tag_names[max(tag_names.keys())] if tag_names else None
 
 
-def check_cli_version(cli_version: str) -> None:
-    """Check if the RCTab CLI version matches the latest release on GitHub.
+def get_latest_cli_tag() -> Union[str, None]:
+    """Get the tag of the latest RCTab CLI release on GitHub.
 
-    A list of release tags is retrieved from the GitHub API along with the time
-    when it was published. The latest tag is then compared to the CLI version.
+    A list of release tags is retrieved from the GitHub API along with the
+    time when each was published.
 
-    Args:
-        cli_version: The RCTab CLI package version.
+    Returns:
+        The most recently published tag if the request is successful, else None.
     """
+    import requests  # pylint: disable=import-outside-toplevel
+
     url = "https://api.github.com/repos/alan-turing-institute/rctab-cli/releases"
     headers = {
         "Accept": "application/vnd.github.v3+json",
     }
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200 and response.json() != []:
-        tags = {
-            datetime.strptime(tag["published_at"], "%Y-%m-%dT%H:%M:%SZ"): tag[
-                "tag_name"
-            ]
-            for tag in response.json()
-        }
-        latest_tag = tags[max(tags.keys())]
-        if latest_tag != cli_version:
-            typer.secho(
-                "You are using an old version of the RCTab CLI. The latest "
-                f"version is {latest_tag}. Pull the latest version from GitHub "
-                "(https://github.com/alan-turing-institute/rctab-cli)",
-                fg=typer.colors.YELLOW,
-            )
+    response = requests.get(url, headers=headers, timeout=VERSION_CHECK_TIMEOUT)
+    if response.status_code != 200 or response.json() == []:
+        return None
+    tags = {
+        datetime.strptime(tag["published_at"], "%Y-%m-%dT%H:%M:%SZ"): tag["tag_name"]
+        for tag in response.json()
+    }
+    return tags[max(tags.keys())]
+
+
+def load_latest_tags() -> Dict[str, str]:
+    """Load the latest release tags that were looked up in the last day.
+
+    Returns:
+        The fresh cached tags, keyed by "api" and "cli".
+    """
+    tags_f = Path(typer.get_app_dir(APP_NAME)) / "latest_tags.json"
+    try:
+        cached = json.loads(tags_f.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {
+        name: entry["tag"]
+        for name, entry in cached.items()
+        if time.time() - entry["checked_at"] < LATEST_TAGS_TTL
+    }
+
+
+def save_latest_tags(tags: Dict[str, str]) -> None:
+    """Cache newly looked up release tags.
+
+    Args:
+        tags: The tags, keyed by "api" and "cli".
+
+    Returns:
+        None.
+    """
+    app_dir = Path(typer.get_app_dir(APP_NAME))
+    tags_f = app_dir / "latest_tags.json"
+    try:
+        cached = json.loads(tags_f.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cached = {}
+    cached.update(
+        {name: {"tag": tag, "checked_at": time.time()} for name, tag in tags.items()}
+    )
+    try:
+        app_dir.mkdir(0o700, exist_ok=True)
+        atomic_write_text(tags_f, json.dumps(cached))
+    except OSError as error:
+        logging.info("Could not cache the latest release tags: %s", error)
+
+
+def run_with_deadline(
+    lookups: Dict[str, Callable[[], Union[str, None]]], timeout: float
+) -> Dict[str, Union[str, None]]:
+    """Run lookups concurrently, giving up on any still running at the deadline.
+
+    The lookups run in daemon threads, so that the process can exit without
+    waiting for those still running, e.g. one that is signing in.
+
+    Args:
+        lookups: Functions to run, by name.
+        timeout: Seconds to wait for all of them together.
+
+    Returns:
+        The result of each lookup, or None if it failed or timed out.
+    """
+    results: Dict[str, Union[str, None]] = {}
+    finished: Dict[str, Union[str, None]] = {}
+
+    def run(name: str, lookup: Callable[[], Union[str, None]]) -> None:
+        try:
+            finished[name] = lookup()
+        except Exception as error:  # pylint: disable=broad-except
+            logging.info("The %s lookup failed: %s", name, error)
+            finished[name] = None
+
+    threads = {
+        name: threading.Thread(target=run, args=(name, lookup), daemon=True)
+        for name, lookup in lookups.items()
+    }
+    for thread in threads.values():
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for name, thread in threads.items():
+        thread.join(max(deadline - time.monotonic(), 0))
+        if thread.is_alive():
+            logging.info("Gave up waiting for the %s lookup", name)
+        results[name] = finished.get(name)
+    return results
+
+
+def check_api_version(
+    api_version: Union[str, None], latest_tag: Union[str, None]
+) -> None:
+    """Check the RCTab API version on Azure uses the latest Docker Hub image.
+
+    Args:
+        api_version: The RCTab API version on Azure.
+        latest_tag: The latest RCTab API image tag on Docker Hub.
+    """
+    if api_version and latest_tag and latest_tag != api_version:
+        typer.secho(
+            "You are using an old version of the RCTab API."
+            f"The latest version is {latest_tag}. Restart the webapp in the "
+            "Azure portal to update to the latest version.",
+            fg=typer.colors.YELLOW,
+        )
+
+
+def check_cli_version(cli_version: str, latest_tag: Union[str, None]) -> None:
+    """Check if the RCTab CLI version matches the latest release on GitHub.
+
+    Args:
+        cli_version: The RCTab CLI package version.
+        latest_tag: The latest RCTab CLI release tag on GitHub.
+    """
+    if latest_tag and latest_tag != cli_version:
+        typer.secho(
+            "You are using an old version of the RCTab CLI. The latest "
+            f"version is {latest_tag}. Pull the latest version from GitHub "
+            "(https://github.com/alan-turing-institute/rctab-cli)",
+            fg=typer.colors.YELLOW,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,346 @@
+"""HTTP client for the RCTab API.
+
+All commands send their requests through the process-wide client returned
+by :func:`get_client`, so that connections to the API are kept alive and
+reused between calls instead of being re-established for every request.
+Requests have timeouts, and transient failures are retried as described in
+:mod:`rctab_cli.retry`.
+requests is imported when the client is created rather than with this
+module, to keep the CLI's start-up fast.
+"""
+
+import logging
+import time
+from dataclasses import replace
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from rctab_cli import endpoints, trace
+from rctab_cli.auth import BearerAuth
+from rctab_cli.cache import CachedResponse, get_response_cache
+from rctab_cli.config import get_cli_settings
+from rctab_cli.retry import (
+    CircuitBreaker,
+    RetryPolicy,
+    get_circuit_breaker,
+    get_retry_policy,
+)
+from rctab_cli.state import state
+from rctab_cli.utils import create_url
+
+if TYPE_CHECKING:
+    import requests
+
+
+class APIError(Exception):
+    """When the RCTab API responds with a status code outside the 200s.
+
+    Attributes:
+        status_code: The status code of the response.
+        detail: The decoded body of the response.
+    """
+
+    def __init__(self, status_code: int, detail: Any) -> None:
+        """Initialize the APIError class."""
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f"Failed with status code: {status_code}. Details: {detail}")
+
+
+# The cached reads, for the same subscription, that a successful write to
+# each endpoint makes stale
+STALE_READS: Dict[endpoints.Endpoint, Tuple[endpoints.Endpoint, ...]] = {
+    endpoints.SUBSCRIPTION: (endpoints.SUBSCRIPTION,),
+    endpoints.PERSISTENT: (endpoints.SUBSCRIPTION,),
+    endpoints.APPROVE: (
+        endpoints.APPROVALS,
+        endpoints.ALLOCATIONS,
+        endpoints.SUBSCRIPTION,
+    ),
+    endpoints.TOPUP: (endpoints.ALLOCATIONS, endpoints.SUBSCRIPTION),
+    endpoints.FINANCES: (endpoints.FINANCE_LIST,),
+    endpoints.FINANCE: (endpoints.FINANCE_LIST,),
+}
+
+
+def cache_key(path: str, params: Any = None, json: Any = None) -> str:
+    """Identify a GET request in the response cache.
+
+    Args:
+        path: The path part of the URL.
+        params: The query parameters of the request.
+        json: The JSON body of the request.
+
+    Returns:
+        The cache key.
+    """
+    return get_response_cache().key(
+        get_cli_settings().base_url_full + path, params=params, json=json
+    )
+
+
+def _stale_keys(endpoint: endpoints.Endpoint, sub_id: Optional[str]) -> List[str]:
+    """List the cache keys of the reads from an endpoint for a subscription."""
+    path = endpoint.path()
+    if endpoint == endpoints.SUBSCRIPTION:
+        # The summaries of every subscription, and of this one
+        keys = [cache_key(path), cache_key(path, params={})]
+        if sub_id:
+            keys.append(cache_key(path, params={"sub_id": sub_id}))
+        return keys
+    return [cache_key(path, json={"sub_id": sub_id})] if sub_id else []
+
+
+def update_cached_reads(
+    path: str, body: Any, content: str, etag: Optional[str] = None
+) -> None:
+    """Update the response cache after a successful write.
+
+    Only the reads that the write affects are removed from the cache. A
+    finance record that was replaced is stored as the server returned it,
+    if it sent the record's new ETag.
+
+    Args:
+        path: The path part of the URL that was written to.
+        body: The JSON body of the write.
+        content: The body of the response.
+        etag: The ETag header of the response, if any.
+
+    Returns:
+        None.
+    """
+    cache = get_response_cache()
+    body = body if isinstance(body, dict) else {}
+    sub_id = body.get("sub_id") or body.get("subscription_id")
+
+    for endpoint, stale in STALE_READS.items():
+        if not endpoint.matches(path):
+            continue
+        for read in stale:
+            for key in _stale_keys(read, sub_id and str(sub_id)):
+                cache.delete(key)
+
+    if endpoints.FINANCE.matches(path):
+        if etag:
+            cache.put(
+                cache_key(path),
+                CachedResponse(
+                    url=create_url(path),
+                    stored_at=time.time(),
+                    content=content,
+                    etag=etag,
+                ),
+            )
+        else:
+            cache.delete(cache_key(path))
+
+
+class RCTabClient:
+    """A client for the RCTab API with a pool of keep-alive connections.
+
+    Attributes:
+        session: The requests session shared by all calls.
+        retry_policy: The timeouts and retries for each call.
+        circuit_breaker: Stops calls while the API is failing.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        """Initialize the RCTabClient class.
+
+        Args:
+            pool_size: Maximum number of connections kept open to the API.
+            retry_policy: The timeouts and retries for each call.
+            circuit_breaker: Stops calls while the API is failing.
+        """
+        # pylint: disable=import-outside-toplevel
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept": "application/json"})
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+    def request(
+        self, method: str, path: str, retry: bool = True, **kwargs: Any
+    ) -> "requests.Response":
+        """Send an authenticated request to the RCTab API.
+
+        Args:
+            method: The HTTP method.
+            path: The path part of the URL.
+            retry: Whether to retry the request if it is idempotent and fails
+                with a transient error.
+            kwargs: Passed on to requests, e.g. json or params.
+
+        Raises:
+            requests.ConnectionError: If the API cannot be reached.
+            requests.Timeout: If the API does not respond in time.
+
+        Returns:
+            The response.
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        endpoint = create_url(path)
+        kwargs.setdefault("timeout", self.retry_policy.timeout)
+
+        policy = (
+            self.retry_policy if retry else replace(self.retry_policy, max_retries=0)
+        )
+
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            try:
+                token = state.get_access_token()
+                with trace.span(f"{method} {path}", "http", attempt=attempt) as span:
+                    resp = self.session.request(
+                        method, endpoint, auth=BearerAuth(token), **kwargs
+                    )
+                    if isinstance(span, trace.Span):
+                        self._trace_response(span, resp, kwargs.get("stream", False))
+            except (requests.ConnectionError, requests.Timeout) as error:
+                self.circuit_breaker.record_failure()
+                delay = policy.next_delay(method, path, attempt)
+                if delay is None:
+                    raise
+                logging.info("%s %s failed: %s", method, path, error)
+            else:
+                self.circuit_breaker.record_status(resp.status_code)
+                delay = policy.next_delay(
+                    method,
+                    path,
+                    attempt,
+                    resp.status_code,
+                    resp.headers.get("Retry-After"),
+                )
+                if delay is None:
+                    break
+                logging.info("%s %s returned %s", method, path, resp.status_code)
+                resp.close()
+
+            logging.info("Retrying in %.1f seconds", delay)
+            time.sleep(delay)
+            attempt += 1
+
+        if method != "GET" and 200 <= resp.status_code <= 299:
+            update_cached_reads(
+                path, kwargs.get("json"), resp.text, resp.headers.get("ETag")
+            )
+        return resp
+
+    @staticmethod
+    def _trace_response(
+        span: "trace.Span", resp: "requests.Response", stream: bool
+    ) -> None:
+        """Add the details of a response to its span, and time its decoding."""
+        span.set(
+            status=resp.status_code,
+            # From sending the request to reading the headers, which
+            # includes connecting and the API's own time
+            until_headers_ms=resp.elapsed.total_seconds() * 1000,
+            bytes=(
+                resp.headers.get("Content-Length")
+                if stream
+                else len(resp.content or b"")
+            ),
+        )
+        resp.json = trace.traced(resp.json, "decode_json", "http")  # type: ignore
+
+    def get(
+        self, path: str, cache_ttl: Optional[float] = None, **kwargs: Any
+    ) -> "requests.Response":
+        """Send a GET request to the RCTab API.
+
+        Args:
+            path: The path part of the URL.
+            cache_ttl: If given, serve the response from the response cache
+                while it is younger than this many seconds, and revalidate
+                it with a conditional request once it is older.
+            kwargs: Passed on to requests, e.g. json or params.
+
+        Returns:
+            The response.
+        """
+        if cache_ttl is None or kwargs.get("stream"):
+            return self.request("GET", path, **kwargs)
+
+        cache = get_response_cache()
+        key = cache_key(path, kwargs.get("params"), kwargs.get("json"))
+        entry = cache.get(key)
+        if entry and not state.no_cache:
+            if entry.is_fresh(cache_ttl):
+                return entry.to_response()
+            kwargs["headers"] = {**kwargs.get("headers", {}), **entry.validators()}
+
+        resp = self.request("GET", path, **kwargs)
+
+        if entry and resp.status_code == 304:
+            entry.stored_at = time.time()
+            cache.put(key, entry)
+            return entry.to_response()
+
+        if resp.status_code == 200:
+            cache.put(
+                key,
+                CachedResponse(
+                    url=resp.url,
+                    stored_at=time.time(),
+                    content=resp.text,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                ),
+            )
+        return resp
+
+    def cached(self, path: str, **kwargs: Any) -> Optional[CachedResponse]:
+        """Look up the cached response to a GET request, however old it is.
+
+        Args:
+            path: The path part of the URL.
+            kwargs: The params or json that the request would be sent with.
+
+        Returns:
+            The cached response, or None if there is none or --no-cache
+            was given.
+        """
+        if state.no_cache:
+            return None
+        return get_response_cache().get(
+            cache_key(path, kwargs.get("params"), kwargs.get("json"))
+        )
+
+    def post(self, path: str, **kwargs: Any) -> "requests.Response":
+        """Send a POST request to the RCTab API."""
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs: Any) -> "requests.Response":
+        """Send a PUT request to the RCTab API."""
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs: Any) -> "requests.Response":
+        """Send a DELETE request to the RCTab API."""
+        return self.request("DELETE", path, **kwargs)
+
+
+@lru_cache()
+def get_client() -> RCTabClient:
+    """Create the process-wide instance of RCTabClient.
+
+    Returns:
+        Instance of RCTabClient.
+    """
+    return RCTabClient(
+        pool_size=get_cli_settings().pool_size,
+        retry_policy=get_retry_policy(),
+        circuit_breaker=get_circuit_breaker(),
+    )
@@ -18,6 +18,11 @@ class CLIConfig(BaseSettings):
     Attributes:
         base_url: Base URL of the API.
         port: Port of the API.
+        pool_size: Maximum number of connections kept open to the API.
+        response_cache_mb: Maximum size of the on-disk response cache.
+        connect_timeout: Seconds to wait for a connection to the API.
+        read_timeout: Seconds to wait between bytes of an API response.
+        max_retries: Times to retry a failed idempotent request.
     """
 
     # e.g. "https://myapp.azurewebsites.net"
@@ -26,6 +31,19 @@ class CLIConfig(BaseSettings):
     # Typically 443 for https and 80 for http and 8000 for local development
     port: int
 
+    # Raise this when running many API calls in parallel
+    pool_size: int = 10
+
+    # Least recently used responses are evicted above this size
+    response_cache_mb: int = 50
+
+    # Some endpoints, e.g. the summary, can take a while to start responding
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+
+    # Only reads and finance updates are retried, with exponential backoff
+    max_retries: int = 3
+
     @property
     def base_url_full(self) -> str:
         """Create full URL from base URL and port.
@@ -0,0 +1,341 @@
+"""A background process that runs commands for the rctab entry point.
+
+The daemon imports the CLI, parses the settings, acquires an access token
+and opens a connection pool once, then runs each command it is sent in the
+same process, so that they start without those costs. It listens on a Unix
+socket in the app directory that only the current user can connect to, runs
+one command at a time, and exits when it has been idle for a while.
+
+Each request is one line of JSON, with the command line arguments, the
+working directory, whether to print in colour and a fingerprint of the
+client's settings. The response ends with one line of JSON with the rest of
+what the command printed and its exit code, or with "local": true if the
+command should be run locally instead: because it wanted to read standard
+input, because the user must sign in, which the daemon never asks them to
+do, or because the client's settings differ from the daemon's, which are
+read once when it starts. Commands that print a lot, e.g. exports as jsonl
+or csv, are sent to the client in chunks while they run, each a line of JSON
+with "stdout" or "stderr", so that neither process holds all of the output.
+
+Attributes:
+    IDLE_TIMEOUT: Seconds without a command after which the daemon exits.
+    CHUNK_SIZE: Characters of output held before they are sent to the
+        client.
+"""
+
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+import typer
+
+from rctab_cli.forward import get_settings_fingerprint, get_socket_path
+
+IDLE_TIMEOUT = 8 * 60 * 60
+
+# Small enough to bound memory, large enough that a command which prints a
+# little and then asks a question can still be run locally instead
+CHUNK_SIZE = 64 * 1024
+
+# Seconds to wait for a client to send its request
+_REQUEST_TIMEOUT = 10
+
+
+class StdinRequired(Exception):
+    """When a command run without standard input tries to read it."""
+
+
+class NoStdin(io.TextIOBase):
+    """Standard input for commands that must not read it."""
+
+    def read(self, size: Optional[int] = -1) -> str:
+        """Refuse to read."""
+        raise StdinRequired()
+
+    def readline(self, size: Optional[int] = -1) -> str:  # type: ignore
+        """Refuse to read."""
+        raise StdinRequired()
+
+    def isatty(self) -> bool:
+        """Whether standard input is a terminal, which it might be."""
+        return True
+
+
+class ChunkedOutput(io.TextIOBase):
+    """Output that is sent to the client in chunks once there is enough.
+
+    Attributes:
+        name: "stdout" or "stderr".
+        sent: Whether any output has been sent.
+    """
+
+    def __init__(
+        self, name: str, send: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        """Initialize the ChunkedOutput class.
+
+        Args:
+            name: "stdout" or "stderr".
+            send: Sends a message to the client, or None to hold all output.
+        """
+        super().__init__()
+        self.name = name
+        self.sent = False
+        self._send = send
+        self._chunks: List[str] = []
+        self._size = 0
+
+    def write(self, text: str) -> int:
+        """Hold some output, and send what is held once there is enough."""
+        if not isinstance(text, str):
+            # As io.StringIO does, which click relies on to tell text apart
+            raise TypeError(f"write() argument must be str, not {type(text)}")
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._send is not None and self._size >= CHUNK_SIZE:
+            self._send({self.name: self.getvalue()})
+            self._chunks, self._size, self.sent = [], 0, True
+        return len(text)
+
+    def getvalue(self) -> str:
+        """Get the output that has not been sent."""
+        return "".join(self._chunks)
+
+    def isatty(self) -> bool:
+        """Whether the output is a terminal, which it might be."""
+        return False
+
+
+def warm_up() -> None:
+    """Load everything that commands share, before the first command."""
+    # pylint: disable=import-outside-toplevel
+    from rctab_cli.auth import get_token_provider
+    from rctab_cli.client import get_client
+    from rctab_cli.config import get_cli_settings
+
+    get_cli_settings()
+    get_client()
+    # No one is there to sign in, so commands that need to are run locally
+    get_token_provider().interactive = False
+    token_available()
+
+
+def token_available() -> bool:
+    """Whether an access token can be acquired without signing in.
+
+    Returns:
+        True if there is a token, or one can be renewed silently.
+    """
+    # pylint: disable=import-outside-toplevel
+    from rctab_cli.auth import get_token_provider, save_cache
+
+    try:
+        get_token_provider().acquire(interactive=False)
+    except Exception:  # pylint: disable=broad-except
+        logging.info("No access token, so commands will run locally", exc_info=True)
+        return False
+    save_cache()
+    return True
+
+
+def invoke_command(argv: List[str], color: bool = False) -> int:
+    """Run a command in this process, printing errors as the CLI would.
+
+    Args:
+        argv: The command line arguments, without the program name.
+        color: Whether to keep colours and styles in the output.
+
+    Raises:
+        StdinRequired: If the command tried to read standard input while it
+            is a NoStdin.
+        SignInRequired: If the command needed the user to sign in, but the
+            token provider may not ask them to.
+
+    Returns:
+        The exit code of the command.
+    """
+    # pylint: disable=import-outside-toplevel
+    from rctab_cli.auth import SignInRequired
+    from rctab_cli.cli import app
+
+    command = typer.main.get_command(app)
+    try:
+        result = command.main(
+            argv, prog_name="rctab", standalone_mode=False, color=color
+        )
+        return result if isinstance(result, int) else 0
+    except (StdinRequired, SignInRequired):
+        raise
+    except click.exceptions.Abort:
+        click.echo("Aborted!", err=True)
+        return 1
+    except click.ClickException as error:
+        error.show()
+        return error.exit_code
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+        return 1
+
+
+def run_command(
+    argv: List[str],
+    cwd: str = ".",
+    color: bool = False,
+    send: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Run a command in this process and capture what it prints.
+
+    Args:
+        argv: The command line arguments, without the program name.
+        cwd: The directory to run the command in.
+        color: Whether to keep colours and styles in the output.
+        send: Sends chunks of output to the client while the command runs,
+            or None to return all of it at the end.
+
+    Returns:
+        The last response for the client.
+    """
+    # pylint: disable=import-outside-toplevel
+    from rctab_cli.auth import SignInRequired, save_cache
+
+    stdout, stderr = ChunkedOutput("stdout", send), ChunkedOutput("stderr", send)
+    old_cwd, old_stdin = os.getcwd(), sys.stdin
+    os.chdir(cwd)
+    sys.stdin = NoStdin()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):  # type: ignore
+            try:
+                exit_code = invoke_command(argv, color)
+            except (StdinRequired, SignInRequired):
+                if not (stdout.sent or stderr.sent):
+                    return {"local": True}
+                # Part of the output has been printed, so it's too late
+                click.echo(
+                    "\nThis command needs input, run it with RCTAB_NO_DAEMON=1",
+                    err=True,
+                )
+                exit_code = 1
+    finally:
+        sys.stdin = old_stdin
+        os.chdir(old_cwd)
+        save_cache()
+
+    return {
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "exit_code": exit_code,
+    }
+
+
+def send_message(conn: socket.socket, message: Dict[str, Any]) -> None:
+    """Send a line of JSON to the client.
+
+    Args:
+        conn: The connection to the client.
+        message: The message, which must be JSON serializable.
+    """
+    conn.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def handle(conn: socket.socket, started_at: float, settings: str) -> bool:
+    """Respond to one request.
+
+    Args:
+        conn: The connection from the client.
+        started_at: When the daemon started, as a Unix timestamp.
+        settings: The fingerprint of the daemon's settings.
+
+    Returns:
+        Whether the daemon should stop.
+    """
+    conn.settimeout(_REQUEST_TIMEOUT)
+    with conn.makefile("rb") as reader:
+        line = reader.readline()
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return False
+    conn.settimeout(None)
+
+    stop = False
+    if request.get("command") == "status":
+        response: Dict[str, Any] = {"pid": os.getpid(), "started_at": started_at}
+    elif request.get("command") == "stop":
+        response, stop = {"pid": os.getpid()}, True
+    elif request.get("settings") != settings:
+        # The command would be sent to the API the daemon was started for
+        response = {"local": True}
+    elif not token_available():
+        # The client can ask the user to sign in
+        response = {"local": True}
+    else:
+        response = run_command(
+            request["argv"],
+            request.get("cwd", "."),
+            request.get("color", False),
+            partial(send_message, conn),
+        )
+
+    send_message(conn, response)
+    return stop
+
+
+def serve(
+    socket_path: Optional[Path] = None, idle_timeout: float = IDLE_TIMEOUT
+) -> None:
+    """Run commands sent to the socket until stopped or idle.
+
+    Args:
+        socket_path: The path of the socket to listen on.
+        idle_timeout: Seconds without a request after which to stop.
+    """
+    socket_path = socket_path or get_socket_path()
+    socket_path.parent.mkdir(0o700, parents=True, exist_ok=True)
+    socket_path.unlink(missing_ok=True)
+
+    started_at = time.time()
+    settings = get_settings_fingerprint()
+    warm_up()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only the current user may connect
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(str(socket_path))
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    server.settimeout(idle_timeout)
+    logging.info("Listening on %s", socket_path)
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                logging.info("Stopping after %s idle seconds", idle_timeout)
+                break
+            with conn:
+                try:
+                    if handle(conn, started_at, settings):
+                        break
+                except OSError:
+                    logging.exception("Lost contact with a client")
+    finally:
+        server.close()
+        socket_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
+    serve(idle_timeout=float(sys.argv[1]) if len(sys.argv) > 1 else IDLE_TIMEOUT)
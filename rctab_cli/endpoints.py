@@ -0,0 +1,131 @@
+"""The routes of the RCTab API that the CLI uses.
+
+Every route is declared here once, as a path template relative to the base
+URL. The base URL is validated the first time it is needed, and URLs are
+made from it by formatting strings, so that requests in tight loops don't
+pay for validating every URL.
+
+Attributes:
+    SUBSCRIPTION: Add a subscription (POST) or get summaries (GET).
+    PERSISTENT: Set whether a subscription is always on.
+    APPROVE: Approve credit for a subscription.
+    TOPUP: Allocate credit to a subscription.
+    APPROVALS: List the approvals of a subscription.
+    ALLOCATIONS: List the allocations of a subscription.
+    FINANCES: Create a finance record.
+    FINANCE: Get, update or delete a finance record.
+    FINANCE_LIST: List the finance records of a subscription.
+    COST_RECOVERY: Calculate (GET) or recover (POST) the costs for a month.
+    REQUEST_ACCESS: Request access to the API.
+    VERSION: The version of the API.
+    ENDPOINTS: Every route above.
+"""
+
+import re
+import string
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Pattern
+from urllib.parse import quote
+
+from pydantic import AnyHttpUrl
+from pydantic.tools import parse_obj_as
+
+from rctab_cli import trace
+from rctab_cli.config import get_cli_settings
+from rctab_cli.types import RCTabURL
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """A route of the RCTab API.
+
+    Attributes:
+        template: The path, relative to the base URL, with parameters in
+            braces, e.g. "accounting/finances/{finance_id}".
+        pattern: Matches the paths made from the template.
+    """
+
+    template: str
+    pattern: Pattern[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Compile the pattern that matches the endpoint's paths."""
+        regex = "".join(
+            re.escape(literal) + ("[^/]+" if name is not None else "")
+            for literal, name, _, _ in string.Formatter().parse(self.template)
+        )
+        object.__setattr__(self, "pattern", re.compile(regex))
+
+    def path(self, **params: Any) -> str:
+        """Make the path to the endpoint.
+
+        Args:
+            params: The value of each parameter in the template, which are
+                percent-encoded.
+
+        Returns:
+            The path, relative to the base URL.
+        """
+        if not params:
+            return self.template
+        return self.template.format(
+            **{name: quote(str(value), safe="") for name, value in params.items()}
+        )
+
+    def matches(self, path: str) -> bool:
+        """Whether a path is to this endpoint.
+
+        Args:
+            path: A path relative to the base URL.
+
+        Returns:
+            True if the path could have been made by path().
+        """
+        return self.pattern.fullmatch(path) is not None
+
+
+SUBSCRIPTION = Endpoint("accounting/subscription")
+PERSISTENT = Endpoint("accounting/persistent")
+APPROVE = Endpoint("accounting/approve")
+TOPUP = Endpoint("accounting/topup")
+APPROVALS = Endpoint("accounting/approvals")
+ALLOCATIONS = Endpoint("accounting/allocations")
+FINANCES = Endpoint("accounting/finances")
+FINANCE = Endpoint("accounting/finances/{finance_id}")
+FINANCE_LIST = Endpoint("accounting/finance")
+COST_RECOVERY = Endpoint("accounting/cli-cost-recovery")
+REQUEST_ACCESS = Endpoint("admin/request-access")
+VERSION = Endpoint("version")
+
+ENDPOINTS = (
+    SUBSCRIPTION,
+    PERSISTENT,
+    APPROVE,
+    TOPUP,
+    APPROVALS,
+    ALLOCATIONS,
+    FINANCES,
+    FINANCE,
+    FINANCE_LIST,
+    COST_RECOVERY,
+    REQUEST_ACCESS,
+    VERSION,
+)
+
+
+@lru_cache()
+def get_base_url() -> str:
+    """Validate the base URL of the API, once per process.
+
+    Raises:
+        pydantic.ValidationError: If the BASE_URL and PORT settings don't
+            make an http or https URL.
+
+    Returns:
+        The base URL, ending with a slash.
+    """
+    with trace.span("validate_base_url", "url"):
+        return str(
+            RCTabURL(url=parse_obj_as(AnyHttpUrl, get_cli_settings().base_url_full)).url
+        )
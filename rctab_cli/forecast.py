@@ -0,0 +1,117 @@
+"""Forecast when subscriptions will run out of credit.
+
+Costs are assumed to carry on at the average daily rate a subscription has
+spent at since it was first used. They are projected from the latest usage,
+which may be a few days old, but the days left are counted from today.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+
+@dataclass
+class Forecast:
+    """How fast a subscription is spending its credit.
+
+    Attributes:
+        subscription_id: The ID of the subscription.
+        name: The name of the subscription.
+        allocated: The credit allocated to the subscription.
+        total_cost: What the subscription has spent so far.
+        burn_rate: The average spend per day.
+        days_left: Days from today until the allocated credit runs out, 0 if
+            it already has, or None if the subscription is not spending.
+        runs_out: The day the allocated credit runs out, if it will.
+        overspend: How much more than its allocation the subscription will
+            have spent by the end of its approval, if it has an end date.
+    """
+
+    subscription_id: str
+    name: str
+    allocated: float
+    total_cost: float
+    burn_rate: float
+    days_left: Optional[float]
+    runs_out: Optional[date]
+    overspend: Optional[float]
+
+
+def _to_date(value: Any) -> Optional[date]:
+    """Read a date, or the date part of a datetime, from a summary field."""
+    if not value:
+        return None
+    return date.fromisoformat(str(value)[:10])
+
+
+def forecast_subscription(summary: Dict[str, Any], today: date) -> Forecast:
+    """Forecast the spending of one subscription.
+
+    Args:
+        summary: The summary of the subscription.
+        today: The day to count the days left from.
+
+    Returns:
+        The forecast.
+    """
+    allocated = float(summary.get("allocated") or 0)
+    total_cost = float(summary.get("total_cost") or 0)
+    first_usage = _to_date(summary.get("first_usage"))
+    latest_usage = _to_date(summary.get("latest_usage")) or today
+    approved_to = _to_date(summary.get("approved_to"))
+
+    burn_rate = 0.0
+    if first_usage is not None:
+        burn_rate = total_cost / max(1, (latest_usage - first_usage).days + 1)
+
+    days_left: Optional[float] = None
+    runs_out = None
+    if total_cost >= allocated and (allocated > 0 or total_cost > 0):
+        # Unfunded subscriptions that haven't been used aren't running out
+        days_left, runs_out = 0.0, latest_usage
+    elif burn_rate > 0:
+        days_after_usage = (allocated - total_cost) / burn_rate
+        runs_out = latest_usage + timedelta(days=days_after_usage)
+        # The costs may have been spent since the latest usage was recorded
+        days_left = max(0.0, days_after_usage - (today - latest_usage).days)
+
+    overspend = None
+    if approved_to is not None:
+        days_to_end = max(0, (approved_to - latest_usage).days)
+        overspend = max(0.0, total_cost + burn_rate * days_to_end - allocated)
+
+    return Forecast(
+        subscription_id=str(summary.get("subscription_id")),
+        name=str(summary.get("name") or ""),
+        allocated=allocated,
+        total_cost=total_cost,
+        burn_rate=burn_rate,
+        days_left=days_left,
+        runs_out=runs_out,
+        overspend=overspend,
+    )
+
+
+def forecast_all(
+    summaries: Iterable[Dict[str, Any]], today: Optional[date] = None
+) -> List[Forecast]:
+    """Forecast the spending of many subscriptions, most urgent first.
+
+    Args:
+        summaries: The summaries of the subscriptions.
+        today: The day to count the days left from, by default today.
+
+    Returns:
+        The forecasts, ordered by days left and then by overspend.
+        Subscriptions that are not spending come last.
+    """
+    today = today or date.today()
+    forecasts = [forecast_subscription(summary, today) for summary in summaries]
+    return sorted(
+        forecasts,
+        key=lambda item: (
+            item.days_left is None,
+            item.days_left or 0.0,
+            -(item.overspend or 0.0),
+        ),
+    )
@@ -0,0 +1,230 @@
+"""The rctab entry point, which hands commands to the daemon if it is running.
+
+When ``rctab daemon start`` has been run, ``rctab sub ...`` commands are
+sent over a Unix socket in the app directory to the daemon, which already
+has the settings, an access token and open connections to the API. Until
+a command has been sent, only the standard library is imported, so that a
+forwarded command does not pay for importing the rest of the CLI.
+
+Commands are run locally instead when there is no daemon, when they read
+standard input, e.g. to ask for confirmation, when RCTAB_NO_DAEMON is set,
+or when the settings differ from those the daemon started with, e.g. in a
+directory with another .env file, so that they go to the right API.
+
+Attributes:
+    FORWARDED_COMMANDS: The first arguments of commands that are forwarded.
+    SETTINGS_ENV_VARS: The environment variables the settings are read from.
+    SETTINGS_FILES: The files the settings are read from.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import Any, Dict, Generator, List, Optional
+
+FORWARDED_COMMANDS = ("sub",)
+
+# The fields of CLIConfig and AuthSettings in rctab_cli.config
+SETTINGS_ENV_VARS = (
+    "base_url",
+    "port",
+    "pool_size",
+    "response_cache_mb",
+    "connect_timeout",
+    "read_timeout",
+    "max_retries",
+    "client_id",
+    "auth_base_url",
+    "tenant_id",
+)
+SETTINGS_FILES = (".env", ".auth.env")
+
+# The same as APP_NAME in rctab_cli.config, which we avoid importing
+_APP_NAME = "RCTab-CLI"
+
+
+def get_app_dir() -> Path:
+    """Get the app directory without importing click.
+
+    Returns:
+        The same path as typer.get_app_dir(APP_NAME), on Unix-like systems.
+    """
+    if sys.platform == "darwin":
+        return Path("~/Library/Application Support").expanduser() / _APP_NAME
+    config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+    return Path(config_home) / "-".join(_APP_NAME.split()).lower()
+
+
+def get_socket_path() -> Path:
+    """Get the path of the daemon's socket.
+
+    Returns:
+        The path, which exists only while the daemon is running.
+    """
+    return get_app_dir() / "daemon.sock"
+
+
+def get_settings_fingerprint() -> str:
+    """Fingerprint the settings a command would read here and now.
+
+    Returns:
+        A hash of the settings' environment variables, which, like
+        pydantic, we match ignoring case, and of the files in the working
+        directory they are read from.
+    """
+    digest = hashlib.sha256()
+    for name, value in sorted(os.environ.items()):
+        if name.lower() in SETTINGS_ENV_VARS:
+            digest.update(f"{name.lower()}={value}\0".encode("utf-8"))
+    for file_name in SETTINGS_FILES:
+        try:
+            contents = Path(file_name).read_bytes()
+        except OSError:
+            contents = b"missing"
+        digest.update(file_name.encode("utf-8") + b"\0" + contents + b"\0")
+    return digest.hexdigest()
+
+
+def connect(timeout: Optional[float] = None) -> socket.socket:
+    """Connect to the daemon.
+
+    Args:
+        timeout: Seconds to wait for each response, or None to wait forever.
+
+    Raises:
+        OSError: If the daemon is not running.
+
+    Returns:
+        The connection.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.settimeout(timeout)
+        conn.connect(str(get_socket_path()))
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def receive(
+    conn: socket.socket, request: Dict[str, Any]
+) -> Generator[Dict[str, Any], None, None]:
+    """Send a request to the daemon and read the lines of its response.
+
+    Args:
+        conn: A connection to the daemon, which is closed afterwards.
+        request: The request, which must be JSON serializable.
+
+    Raises:
+        ConnectionError: If the daemon stopped before responding.
+
+    Yields:
+        Each line of the response, up to the last one, which is the first
+        that isn't only a chunk of output.
+    """
+    with conn:
+        conn.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with conn.makefile("rb") as reader:
+            for line in reader:
+                response = json.loads(line)
+                yield response
+                if not response.keys() <= {"stdout", "stderr"}:
+                    return
+    raise ConnectionError("The daemon stopped before responding")
+
+
+def send(conn: socket.socket, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Send a request to the daemon and wait for the response.
+
+    Args:
+        conn: A connection to the daemon, which is closed afterwards.
+        request: The request, which must be JSON serializable.
+
+    Raises:
+        ConnectionError: If the daemon stopped before responding.
+
+    Returns:
+        The response.
+    """
+    responses = receive(conn, request)
+    try:
+        return next(responses)
+    finally:
+        responses.close()
+
+
+def _stdin_is_forwardable() -> bool:
+    """Whether the daemon can tell when a command reads standard input.
+
+    Standard input is not sent to the daemon. A terminal or /dev/null is
+    only read by a command that asks a question, which the daemon notices,
+    but a pipe or file may hold data for the command.
+    """
+    try:
+        if sys.stdin is None or sys.stdin.isatty():
+            return True
+        return os.path.samestat(os.fstat(sys.stdin.fileno()), os.stat(os.devnull))
+    except (OSError, ValueError):
+        return False
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Run a command in the daemon, if it is running.
+
+    Args:
+        argv: The command line arguments, without the program name.
+
+    Returns:
+        The exit code of the command, or None if it should be run locally.
+    """
+    if (
+        sys.platform == "win32"
+        or not argv
+        or argv[0] not in FORWARDED_COMMANDS
+        or os.environ.get("RCTAB_NO_DAEMON")
+        or not _stdin_is_forwardable()
+    ):
+        return None
+
+    try:
+        conn = connect()
+    except OSError:
+        # There is no daemon, so run the command here
+        return None
+
+    request = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "color": sys.stdout.isatty(),
+        "settings": get_settings_fingerprint(),
+    }
+    try:
+        # Long output arrives in chunks while the command runs
+        for response in receive(conn, request):
+            if response.get("local"):
+                return None
+            sys.stdout.write(response.get("stdout", ""))
+            sys.stderr.write(response.get("stderr", ""))
+            if "exit_code" in response:
+                sys.stdout.flush()
+                return int(response["exit_code"])
+    except (OSError, ValueError) as error:
+        # The command may have been run, so it is not safe to run it again
+        sys.stderr.write(f"Lost contact with the rctab daemon: {error}\n")
+    return 1
+
+
+def main() -> None:
+    """Run the rctab command line."""
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    # pylint: disable=import-outside-toplevel
+    from rctab_cli.cli import app
+
+    app()
@@ -0,0 +1,362 @@
+"""Resumable jobs made up of many API calls.
+
+A job is a DAG of steps, each of which calls one method of
+:class:`rctab_cli.async_client.AsyncRCTabClient`. A step runs as soon as
+the steps it depends on are complete, so independent steps, e.g. for
+different subscriptions, run at the same time. The job is saved to the app
+directory before it starts and the outcome of every step is appended to a
+checkpoint log as soon as it finishes, so that a job that was interrupted
+can be loaded again and only the steps that had not completed are run. Once
+every step has completed, the job is deleted.
+
+Attributes:
+    ACTIONS: The client methods that a step may call.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+import typer
+
+from rctab_cli.async_client import AsyncRCTabClient
+from rctab_cli.bulk import RowResult, error_detail
+from rctab_cli.config import APP_NAME
+from rctab_cli.journal import JournalEntry
+from rctab_cli.utils import atomic_write_text
+
+ACTIONS = frozenset(
+    {
+        "add_subscription",
+        "set_persistence",
+        "approve",
+        "topup",
+        "finance_create",
+        "finance_update",
+        "finance_delete",
+    }
+)
+
+
+@dataclass
+class Step:
+    """One API call in a job.
+
+    Attributes:
+        id: The ID of the step, unique within its job.
+        action: The name of the client method to call.
+        args: Keyword arguments for the method, which must be JSON
+            serializable. A subscription_id is passed on as a UUID.
+        after: The IDs of the steps that must complete first.
+        row: The record the step is for, e.g. a row of a manifest.
+        key: A human-readable identifier for the record.
+        status: One of "pending", "done", "skipped" (because the journal
+            shows it was already done) or "failed".
+        detail: The API response on success, or the error message on failure.
+    """
+
+    id: str
+    action: str
+    args: Dict[str, Any]
+    after: List[str] = field(default_factory=list)
+    row: int = 0
+    key: str = ""
+    status: str = "pending"
+    detail: Any = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether the steps that depend on this one can run."""
+        return self.status in ("done", "skipped")
+
+
+def get_jobs_dir() -> Path:
+    """Get the directory that jobs are saved in.
+
+    Returns:
+        The path of the directory, which may not exist yet.
+    """
+    return Path(typer.get_app_dir(APP_NAME)) / "jobs"
+
+
+class Job:
+    """A DAG of steps that is checkpointed to disk as it runs.
+
+    Attributes:
+        id: The ID of the job.
+        name: A short description of the job.
+        created_at: When the job was created, as a Unix timestamp.
+        steps: The steps of the job, by ID, in the order they were given.
+        jobs_dir: The directory the job is saved in.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        steps: Iterable[Step],
+        job_id: Optional[str] = None,
+        created_at: Optional[float] = None,
+        jobs_dir: Optional[Path] = None,
+    ) -> None:
+        """Initialize the Job class.
+
+        Raises:
+            ValueError: If the steps do not form a DAG of known actions.
+        """
+        self.created_at = created_at or time.time()
+        self.id = job_id or (
+            datetime.fromtimestamp(self.created_at).strftime("%Y%m%d-%H%M%S-")
+            + secrets.token_hex(3)
+        )
+        self.name = name
+        self.jobs_dir = jobs_dir or get_jobs_dir()
+        self.steps: Dict[str, Step] = {}
+        for step in steps:
+            if step.id in self.steps:
+                raise ValueError(f"Duplicate step {step.id}")
+            if step.action not in ACTIONS:
+                raise ValueError(f"Unknown action {step.action} in step {step.id}")
+            self.steps[step.id] = step
+        self._check_dag()
+
+    def _check_dag(self) -> None:
+        """Check that every dependency exists and that there are no cycles."""
+        waiting_on = {step.id: len(step.after) for step in self.steps.values()}
+        dependents = defaultdict(list)
+        for step in self.steps.values():
+            for dependency in step.after:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step {step.id} depends on unknown {dependency}")
+                dependents[dependency].append(step.id)
+
+        ready = [step_id for step_id, count in waiting_on.items() if count == 0]
+        ordered = 0
+        while ready:
+            ordered += 1
+            for dependent in dependents[ready.pop()]:
+                waiting_on[dependent] -= 1
+                if waiting_on[dependent] == 0:
+                    ready.append(dependent)
+        if ordered != len(self.steps):
+            raise ValueError("The steps depend on each other in a cycle")
+
+    @property
+    def job_f(self) -> Path:
+        """The file that holds the definition of the job."""
+        return self.jobs_dir / f"{self.id}.json"
+
+    @property
+    def log_f(self) -> Path:
+        """The file that the outcome of each step is appended to."""
+        return self.jobs_dir / f"{self.id}.log"
+
+    def save(self) -> None:
+        """Save the definition of the job, before it is run."""
+        self.jobs_dir.mkdir(0o700, parents=True, exist_ok=True)
+        definition = {
+            "id": self.id,
+            "name": self.name,
+            "created_at": self.created_at,
+            "steps": [
+                {
+                    name: value
+                    for name, value in asdict(step).items()
+                    if name not in ("status", "detail")
+                }
+                for step in self.steps.values()
+            ],
+        }
+        atomic_write_text(self.job_f, json.dumps(definition))
+
+    def checkpoint(self, step: Step) -> None:
+        """Record the outcome of a step.
+
+        Args:
+            step: The step that has finished.
+        """
+        line = {"step": step.id, "status": step.status, "detail": step.detail}
+        with open(self.log_f, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(line, default=str) + "\n")
+
+    def delete(self) -> None:
+        """Delete the saved job, e.g. once every step has completed."""
+        self.job_f.unlink(missing_ok=True)
+        self.log_f.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, job_id: str, jobs_dir: Optional[Path] = None) -> "Job":
+        """Load a job and the outcome of its steps so far.
+
+        Args:
+            job_id: The ID of the job.
+            jobs_dir: The directory the job was saved in.
+
+        Raises:
+            FileNotFoundError: If there is no such job.
+
+        Returns:
+            The job.
+        """
+        jobs_dir = jobs_dir or get_jobs_dir()
+        definition = json.loads((jobs_dir / f"{job_id}.json").read_text("utf-8"))
+        job = cls(
+            definition["name"],
+            (Step(**step) for step in definition["steps"]),
+            job_id=definition["id"],
+            created_at=definition["created_at"],
+            jobs_dir=jobs_dir,
+        )
+
+        if job.log_f.exists():
+            log = job.log_f.read_bytes()
+            complete = log.rfind(b"\n") + 1
+            if complete < len(log):
+                # The process stopped part way through writing a checkpoint
+                os.truncate(job.log_f, complete)
+
+            for line in log[:complete].splitlines():
+                outcome = json.loads(line)
+                step = job.steps[outcome["step"]]
+                step.status = outcome["status"]
+                step.detail = outcome["detail"]
+        return job
+
+    @property
+    def complete(self) -> bool:
+        """Whether every step has completed."""
+        return all(step.complete for step in self.steps.values())
+
+    def counts(self) -> Dict[str, int]:
+        """Count the steps with each status.
+
+        Returns:
+            The number of steps, by status.
+        """
+        counts: Dict[str, int] = defaultdict(int)
+        for step in self.steps.values():
+            counts[step.status] += 1
+        return dict(counts)
+
+
+def list_jobs(jobs_dir: Optional[Path] = None) -> List[Job]:
+    """Load every saved job.
+
+    Args:
+        jobs_dir: The directory the jobs were saved in.
+
+    Returns:
+        The jobs, oldest first.
+    """
+    jobs_dir = jobs_dir or get_jobs_dir()
+    if not jobs_dir.exists():
+        return []
+    jobs = [Job.load(job_f.stem, jobs_dir) for job_f in jobs_dir.glob("*.json")]
+    return sorted(jobs, key=lambda job: job.created_at)
+
+
+async def _run_step(client: AsyncRCTabClient, step: Step) -> Step:
+    """Call the client method for a step and record the outcome on it."""
+    args = dict(step.args)
+    if "subscription_id" in args:
+        args["subscription_id"] = UUID(args["subscription_id"])
+
+    try:
+        detail = await getattr(client, step.action)(**args)
+    except Exception as error:  # pylint: disable=broad-except
+        step.status, step.detail = "failed", error_detail(error)
+        return step
+
+    if isinstance(detail, JournalEntry):
+        step.status, step.detail = "skipped", detail.response
+    else:
+        step.status, step.detail = "done", detail
+    return step
+
+
+async def run_job(job: Job, client: AsyncRCTabClient, workers: int) -> None:
+    """Run the steps of a job that have not completed, several at a time.
+
+    A step starts as soon as the steps it depends on have completed. The
+    steps that depend on a failed step are not run, and stay pending.
+
+    Args:
+        job: The job to run.
+        client: The client to call the API with.
+        workers: The maximum number of steps to run at the same time.
+    """
+    waiting_on: Dict[str, Set[str]] = {
+        step.id: {
+            dependency
+            for dependency in step.after
+            if not job.steps[dependency].complete
+        }
+        for step in job.steps.values()
+        if not step.complete
+    }
+    dependents = defaultdict(list)
+    for step_id, dependencies in waiting_on.items():
+        for dependency in dependencies:
+            dependents[dependency].append(step_id)
+
+    ready: Deque[str] = deque(
+        step_id for step_id, dependencies in waiting_on.items() if not dependencies
+    )
+    running: Set["asyncio.Task[Step]"] = set()
+    while ready or running:
+        while ready and len(running) < workers:
+            step = job.steps[ready.popleft()]
+            running.add(asyncio.create_task(_run_step(client, step)))
+
+        finished, running = await asyncio.wait(
+            running, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in finished:
+            step = task.result()
+            job.checkpoint(step)
+            if not step.complete:
+                continue
+            for dependent in dependents[step.id]:
+                waiting_on[dependent].discard(step.id)
+                if not waiting_on[dependent]:
+                    ready.append(dependent)
+
+
+def job_results(job: Job) -> List[RowResult]:
+    """Summarise the outcome of the steps for each record of a job.
+
+    Args:
+        job: The job.
+
+    Returns:
+        The outcome of each record, as for a batch command.
+    """
+    records: Dict[Tuple[int, str], List[Step]] = defaultdict(list)
+    for step in job.steps.values():
+        records[(step.row, step.key)].append(step)
+
+    results = []
+    for (row, key), steps in records.items():
+        failed = [step for step in steps if step.status == "failed"]
+        if failed:
+            results.append(RowResult(row, False, key, failed[0].detail))
+        elif not all(step.complete for step in steps):
+            results.append(RowResult(row, False, key, "not run"))
+        else:
+            results.append(
+                RowResult(
+                    row,
+                    True,
+                    key,
+                    steps[-1].detail,
+                    skipped=steps[-1].status == "skipped",
+                )
+            )
+    return results
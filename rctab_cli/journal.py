@@ -0,0 +1,137 @@
+"""A local journal of the changes made to the RCTab API.
+
+Approvals, allocations and finance records move money, so each one is
+given an idempotency key derived from its request body. The key is sent to
+the API in the Idempotency-Key header and, once the API has accepted the
+change, recorded in a small SQLite database in the app directory. Sending
+the same change again, e.g. when an interrupted batch run is resumed, is
+then skipped without asking the API.
+
+Attributes:
+    IDEMPOTENCY_HEADER: The request header that carries the key.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+import typer
+
+from rctab_cli.config import APP_NAME
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+def idempotency_key(path: str, body: Any) -> str:
+    """Derive a key that is the same every time a change is sent.
+
+    Args:
+        path: The path part of the URL the change is sent to.
+        body: The JSON body of the request, e.g. the subscription ID,
+            ticket, amount and dates of an approval.
+
+    Returns:
+        A hex digest.
+    """
+    canonical = json.dumps([path, body], sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class JournalEntry:
+    """A change that the API has accepted.
+
+    Attributes:
+        key: The idempotency key of the change.
+        path: The path part of the URL the change was sent to.
+        response: The decoded response from the API.
+        completed_at: When the change was accepted, as a Unix timestamp.
+    """
+
+    key: str
+    path: str
+    response: Any
+    completed_at: float
+
+
+class Journal:
+    """The changes that the API has accepted, by idempotency key.
+
+    The database can be shared by several processes, and one instance by
+    several threads.
+    """
+
+    def __init__(self, journal_f: Path) -> None:
+        """Open, and if needed create, the journal.
+
+        Args:
+            journal_f: The path of the SQLite database.
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(journal_f), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS changes ("
+                "key TEXT PRIMARY KEY, "
+                "path TEXT NOT NULL, "
+                "response TEXT NOT NULL, "
+                "completed_at REAL NOT NULL)"
+            )
+
+    def find(self, key: str) -> Optional[JournalEntry]:
+        """Look up a change.
+
+        Args:
+            key: The idempotency key of the change.
+
+        Returns:
+            The entry, or None if the change has not been made.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT key, path, response, completed_at FROM changes WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return JournalEntry(row[0], row[1], json.loads(row[2]), row[3])
+
+    def record(self, key: str, path: str, response: Any) -> None:
+        """Record that the API has accepted a change.
+
+        Args:
+            key: The idempotency key of the change.
+            path: The path part of the URL the change was sent to.
+            response: The decoded response from the API.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO changes VALUES (?, ?, ?, ?)",
+                (key, path, json.dumps(response, default=str), time.time()),
+            )
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+
+@lru_cache()
+def get_journal() -> Journal:
+    """Open the journal in the app directory.
+
+    Returns:
+        Instance of Journal.
+    """
+    app_dir = Path(typer.get_app_dir(APP_NAME))
+    app_dir.mkdir(0o700, parents=True, exist_ok=True)
+    return Journal(app_dir / "journal.sqlite")
@@ -0,0 +1,148 @@
+"""Print the results of commands as JSON, JSON Lines, CSV or a table.
+
+JSON is indented with sorted keys, for people to read. The other machine
+readable formats are written compactly and incrementally, a batch of
+records at a time, so that pipelines can start on the first records before
+the last have arrived. orjson is used to encode them, if it is installed.
+"""
+
+import csv
+import io
+import itertools
+import json
+from typing import Any, Iterable, Iterator, List, Optional
+
+import typer
+
+from rctab_cli import trace
+from rctab_cli.types import OutputFormat
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None  # type: ignore
+
+# Records printed with each write to standard output
+_BATCH_SIZE = 500
+
+
+def output_option(
+    default: Optional[OutputFormat] = OutputFormat.JSON,
+    help_text: str = "Print indented json, one line per record (jsonl), csv or a table",
+) -> Any:
+    """Create the --output option shared by commands that print records.
+
+    Args:
+        default: The format to print in if the option is not given.
+        help_text: The help for the option.
+
+    Returns:
+        A Typer option.
+    """
+    return typer.Option(default, "--output", "--format", "-o", help=help_text)
+
+
+def dumps(value: Any) -> str:
+    """Encode a value as compact JSON on one line.
+
+    Args:
+        value: The value to encode.
+
+    Returns:
+        The JSON document.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=str).decode("utf-8")
+        except TypeError:
+            # e.g. integers too big for orjson, which json can encode
+            pass
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def _cell(value: Any) -> Any:
+    """Flatten a field of a record into a single CSV or table cell."""
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    return value
+
+
+def _batches(records: Iterable[Any]) -> Iterator[List[Any]]:
+    """Group records so that each write to standard output prints several."""
+    iterator = iter(records)
+    while batch := list(itertools.islice(iterator, _BATCH_SIZE)):
+        yield batch
+
+
+def write_output(data: Any, output_format: OutputFormat) -> None:
+    """Print the result of a command.
+
+    Args:
+        data: A list of records, an iterable that yields them as they
+            arrive, or a single record or other JSON value.
+        output_format: How to print the data.
+    """
+    with trace.span("write_output", "output", format=output_format.value):
+        _write_output(data, output_format)
+
+
+def _write_output(data: Any, output_format: OutputFormat) -> None:
+    """Print the result of a command, for write_output."""
+    single = isinstance(data, (dict, str)) or not isinstance(data, Iterable)
+    if output_format == OutputFormat.JSON:
+        if not single and not isinstance(data, list):
+            data = list(data)
+        typer.echo(json.dumps(data, indent=4, sort_keys=True))
+        return
+
+    records: Iterable[Any] = [data] if single else data
+
+    if output_format == OutputFormat.JSONL:
+        for batch in _batches(records):
+            typer.echo("\n".join(dumps(record) for record in batch))
+
+    elif output_format == OutputFormat.CSV:
+        write_csv(records)
+
+    else:
+        # pylint: disable=import-outside-toplevel
+        from tabulate import tabulate
+
+        rows = [
+            (
+                {key: _cell(value) for key, value in record.items()}
+                if isinstance(record, dict)
+                else {"value": _cell(record)}
+            )
+            for record in records
+        ]
+        typer.echo(tabulate(rows, headers="keys"))
+
+
+def write_csv(records: Iterable[Any]) -> None:
+    """Print records as CSV, a batch at a time.
+
+    The columns are the fields of the first record. Fields that later
+    records have and the first does not are left out.
+
+    Args:
+        records: The records, which should be dicts.
+    """
+    buffer = io.StringIO()
+    writer = None
+    for batch in _batches(records):
+        for record in batch:
+            if not isinstance(record, dict):
+                record = {"value": record}
+            if writer is None:
+                writer = csv.DictWriter(
+                    buffer,
+                    fieldnames=list(record),
+                    extrasaction="ignore",
+                    lineterminator="\n",
+                )
+                writer.writeheader()
+            writer.writerow({key: _cell(value) for key, value in record.items()})
+        typer.echo(buffer.getvalue(), nl=False)
+        buffer.seek(0)
+        buffer.truncate()
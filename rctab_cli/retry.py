@@ -0,0 +1,219 @@
+"""Timeouts, retries and a circuit breaker for requests to the RCTab API.
+
+Azure App Service answers with a transient 429, 502, 503 or 504 when it is
+under load. Idempotent requests that get one of those, or that fail to
+connect, are retried with exponential backoff and jitter, honouring any
+Retry-After header. Repeated server failures open a circuit breaker so that
+a long run fails fast, rather than waiting out every retry, while the API
+is down.
+
+Attributes:
+    RETRY_STATUSES: Status codes that are worth retrying.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from rctab_cli import endpoints
+from rctab_cli.config import get_cli_settings
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """When requests are refused because the API has been failing."""
+
+
+@dataclass
+class RetryPolicy:
+    """How long to wait for the API and how to retry failed requests.
+
+    Attributes:
+        connect_timeout: Seconds to wait for a connection to the API.
+        read_timeout: Seconds to wait between bytes of a response.
+        max_retries: Maximum number of retries after the first attempt.
+        backoff_base: Seconds to back off by before the first retry,
+            doubled for each retry after that.
+        backoff_max: Maximum seconds to wait before a retry.
+    """
+
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """The connect and read timeouts, as taken by requests."""
+        return self.connect_timeout, self.read_timeout
+
+    @staticmethod
+    def is_idempotent(method: str, path: str) -> bool:
+        """Whether a request can be sent again without changing the outcome.
+
+        Args:
+            method: The HTTP method.
+            path: The path part of the URL.
+
+        Returns:
+            True for GETs and for PUTs of a finance record.
+        """
+        if method == "GET":
+            return True
+        # Updating a finance record sends the whole record, so repeating it is safe
+        return method == "PUT" and endpoints.FINANCE.matches(path)
+
+    def next_delay(
+        self,
+        method: str,
+        path: str,
+        attempt: int,
+        status_code: Optional[int] = None,
+        retry_after: Optional[str] = None,
+    ) -> Optional[float]:
+        """Decide whether, and after how long, to retry a request.
+
+        Args:
+            method: The HTTP method.
+            path: The path part of the URL.
+            attempt: How many times the request has been retried so far.
+            status_code: The status code of the response, or None if no
+                response was received.
+            retry_after: The value of the response's Retry-After header.
+
+        Returns:
+            Seconds to wait before retrying, or None to not retry.
+        """
+        if attempt >= self.max_retries or not self.is_idempotent(method, path):
+            return None
+        if status_code is not None and status_code not in RETRY_STATUSES:
+            return None
+
+        requested = parse_retry_after(retry_after)
+        if requested is not None:
+            return min(requested, self.backoff_max)
+
+        # "Full jitter" spreads out retries from many concurrent requests
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Read a Retry-After header.
+
+    Args:
+        value: Either a number of seconds or an HTTP date.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """Fail fast after the API has failed several times in a row.
+
+    Connection errors and 5xx responses count as failures. Once there have
+    been failure_threshold in a row the circuit opens and requests are
+    refused. After reset_timeout seconds one trial request is let through;
+    if it succeeds the circuit closes again, otherwise it stays open for
+    another reset_timeout seconds.
+
+    Attributes:
+        failure_threshold: Consecutive failures that open the circuit.
+        reset_timeout: Seconds before a trial request is let through.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Initialize the CircuitBreaker class."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    def before_request(self) -> None:
+        """Check that a request may be sent.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"The RCTab API failed {self._failures} times in a row. "
+                    f"Not sending requests for another "
+                    f"{self.reset_timeout - waited:.0f} seconds."
+                )
+            # Let this request through as a trial, but no others for now
+            self._opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        """Close the circuit after the API has responded normally."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def record_status(self, status_code: int) -> None:
+        """Count a response as a success or, if it is a 5xx, a failure.
+
+        Args:
+            status_code: The status code of the response.
+        """
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+@lru_cache()
+def get_retry_policy() -> RetryPolicy:
+    """Create the retry policy from the CLI settings.
+
+    Returns:
+        Instance of RetryPolicy.
+    """
+    settings = get_cli_settings()
+    return RetryPolicy(
+        connect_timeout=settings.connect_timeout,
+        read_timeout=settings.read_timeout,
+        max_retries=settings.max_retries,
+    )
+
+
+@lru_cache()
+def get_circuit_breaker() -> CircuitBreaker:
+    """Create the circuit breaker shared by all clients in this process.
+
+    Returns:
+        Instance of CircuitBreaker.
+    """
+    return CircuitBreaker()
@@ -0,0 +1,316 @@
+"""Snapshots of cost recovery results, and the differences between them.
+
+Every run of cost-recovery saves the costs the API calculated to the app
+directory, as a dry run or as committed, so that a dry run can be checked
+against a later dry run or against what was actually committed. Snapshots
+are stored by column, as gzipped JSON, which keeps them small even with tens
+of thousands of rows. They are compared with a hash join on subscription,
+finance code and month, which takes milliseconds at that size.
+
+Each file is named after the snapshot's ID, which starts with when it was
+taken, and its kind, so the latest snapshot of a kind can be found without
+reading any of them. Only the most recent snapshots of each kind are kept.
+
+Attributes:
+    KINDS: The kinds of snapshot.
+    KEEP_SNAPSHOTS: How many snapshots of each kind are kept.
+"""
+
+import gzip
+import json
+import secrets
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import typer
+
+from rctab_cli.config import APP_NAME
+from rctab_cli.utils import atomic_write_bytes
+
+KINDS = ("dry-run", "committed")
+
+KEEP_SNAPSHOTS = 100
+
+# Finance code, month and subscription ID, which is the order costs are shown
+CostKey = Tuple[str, str, str]
+
+
+def get_snapshots_dir() -> Path:
+    """Get the directory that snapshots are saved in.
+
+    Returns:
+        The path of the directory, which may not exist yet.
+    """
+    return Path(typer.get_app_dir(APP_NAME)) / "cost-recovery"
+
+
+@dataclass
+class Snapshot:
+    """The recoverable costs for one or more months.
+
+    Attributes:
+        id: The ID of the snapshot.
+        kind: Either "dry-run" or "committed".
+        months: The months the costs are for, in YYYY-MM format.
+        created_at: When the snapshot was taken, as a Unix timestamp.
+        subscription_id: The subscription of each row.
+        finance_code: The finance code of each row.
+        month: The month of each row, in YYYY-MM format.
+        amount: The amount of each row.
+    """
+
+    id: str
+    kind: str
+    months: List[str]
+    created_at: float
+    subscription_id: List[str] = field(default_factory=list)
+    finance_code: List[str] = field(default_factory=list)
+    month: List[str] = field(default_factory=list)
+    amount: List[float] = field(default_factory=list)
+
+    @classmethod
+    def from_costs(cls, kind: str, costs: Dict[str, Any]) -> "Snapshot":
+        """Take a snapshot of the costs returned by the API.
+
+        Args:
+            kind: Either "dry-run" or "committed".
+            costs: The costs the API calculated, by month, each a list of
+                records with a subscription_id, finance_code and amount.
+
+        Raises:
+            ValueError: If the kind is unknown.
+
+        Returns:
+            The snapshot, which has not been saved yet.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind of snapshot {kind}")
+        created_at = time.time()
+        snapshot = cls(
+            # Sorts in the order the snapshots were taken
+            id=datetime.fromtimestamp(created_at).strftime("%Y%m%d-%H%M%S-%f-")
+            + secrets.token_hex(2),
+            kind=kind,
+            months=sorted(costs),
+            created_at=created_at,
+        )
+        for month, records in costs.items():
+            for record in records if isinstance(records, list) else []:
+                snapshot.subscription_id.append(str(record.get("subscription_id")))
+                snapshot.finance_code.append(str(record.get("finance_code")))
+                snapshot.month.append(month)
+                snapshot.amount.append(float(record.get("amount") or 0))
+        return snapshot
+
+    def __len__(self) -> int:
+        """Count the rows of the snapshot."""
+        return len(self.amount)
+
+    def save(self, snapshots_dir: Optional[Path] = None) -> Path:
+        """Save the snapshot.
+
+        Args:
+            snapshots_dir: The directory to save the snapshot in.
+
+        Returns:
+            The path of the snapshot file.
+        """
+        snapshots_dir = snapshots_dir or get_snapshots_dir()
+        snapshots_dir.mkdir(0o700, parents=True, exist_ok=True)
+        snapshot_f = snapshots_dir / f"{self.id}.{self.kind}.json.gz"
+        data = json.dumps(self.__dict__, separators=(",", ":")).encode("utf-8")
+        atomic_write_bytes(snapshot_f, gzip.compress(data))
+        return snapshot_f
+
+    @classmethod
+    def load(cls, snapshot_id: str, snapshots_dir: Optional[Path] = None) -> "Snapshot":
+        """Load a saved snapshot.
+
+        Args:
+            snapshot_id: The ID of the snapshot.
+            snapshots_dir: The directory the snapshot was saved in.
+
+        Raises:
+            FileNotFoundError: If there is no such snapshot.
+
+        Returns:
+            The snapshot.
+        """
+        snapshots_dir = snapshots_dir or get_snapshots_dir()
+        for kind in KINDS:
+            snapshot_f = snapshots_dir / f"{snapshot_id}.{kind}.json.gz"
+            if snapshot_f.exists():
+                return cls.from_file(snapshot_f)
+        raise FileNotFoundError(f"There is no snapshot with ID {snapshot_id}")
+
+    @classmethod
+    def from_file(cls, snapshot_f: Path) -> "Snapshot":
+        """Load a snapshot from its file.
+
+        Args:
+            snapshot_f: The path of the snapshot file.
+
+        Returns:
+            The snapshot.
+        """
+        return cls(**json.loads(gzip.decompress(snapshot_f.read_bytes())))
+
+    def totals(self) -> Dict[CostKey, float]:
+        """Total the amounts by finance code, month and subscription.
+
+        Returns:
+            The total amount for each key.
+        """
+        keys = list(zip(self.finance_code, self.month, self.subscription_id))
+        totals = dict(zip(keys, self.amount))
+        if len(totals) < len(keys):
+            # Some keys have more than one row, so add them up
+            totals = dict.fromkeys(totals, 0.0)
+            for key, amount in zip(keys, self.amount):
+                totals[key] += amount
+        return totals
+
+
+def snapshot_files(
+    snapshots_dir: Optional[Path] = None, kind: Optional[str] = None
+) -> List[Path]:
+    """Find the saved snapshots without reading them.
+
+    Args:
+        snapshots_dir: The directory the snapshots were saved in.
+        kind: Only find snapshots of this kind.
+
+    Returns:
+        The snapshot files, oldest first.
+    """
+    snapshots_dir = snapshots_dir or get_snapshots_dir()
+    if not snapshots_dir.exists():
+        return []
+    # The names start with the IDs, which start with when they were taken
+    return sorted(
+        snapshots_dir.glob(f"*.{kind}.json.gz" if kind else "*.json.gz"),
+        key=lambda snapshot_f: snapshot_f.name,
+    )
+
+
+def list_snapshots(
+    snapshots_dir: Optional[Path] = None, kind: Optional[str] = None
+) -> List[Snapshot]:
+    """Load every saved snapshot.
+
+    Args:
+        snapshots_dir: The directory the snapshots were saved in.
+        kind: Only load snapshots of this kind.
+
+    Returns:
+        The snapshots, oldest first.
+    """
+    return [
+        Snapshot.from_file(snapshot_f)
+        for snapshot_f in snapshot_files(snapshots_dir, kind)
+    ]
+
+
+def latest_snapshot(
+    kind: str, snapshots_dir: Optional[Path] = None
+) -> Optional[Snapshot]:
+    """Load the latest snapshot of a kind.
+
+    Args:
+        kind: Either "dry-run" or "committed".
+        snapshots_dir: The directory the snapshots were saved in.
+
+    Returns:
+        The snapshot, or None if there are no snapshots of the kind.
+    """
+    files = snapshot_files(snapshots_dir, kind)
+    if not files:
+        return None
+    return Snapshot.from_file(files[-1])
+
+
+def prune_snapshots(
+    kind: str, keep: int = KEEP_SNAPSHOTS, snapshots_dir: Optional[Path] = None
+) -> int:
+    """Remove all but the latest snapshots of a kind.
+
+    Args:
+        kind: Either "dry-run" or "committed".
+        keep: How many snapshots to keep.
+        snapshots_dir: The directory the snapshots were saved in.
+
+    Returns:
+        The number of snapshots removed.
+    """
+    files = snapshot_files(snapshots_dir, kind)
+    stale = files[: max(len(files) - keep, 0)]
+    for snapshot_f in stale:
+        snapshot_f.unlink(missing_ok=True)
+    return len(stale)
+
+
+@dataclass
+class CostChange:
+    """A difference between two snapshots.
+
+    Attributes:
+        subscription_id: The subscription the costs are for.
+        finance_code: The finance code the costs are charged to.
+        month: The month the costs are for, in YYYY-MM format.
+        old_amount: The amount in the first snapshot, or None if it had none.
+        new_amount: The amount in the second snapshot, or None if it had none.
+    """
+
+    subscription_id: str
+    finance_code: str
+    month: str
+    old_amount: Optional[float]
+    new_amount: Optional[float]
+
+    @property
+    def status(self) -> str:
+        """Whether the costs were "added", "removed" or "changed"."""
+        if self.old_amount is None:
+            return "added"
+        if self.new_amount is None:
+            return "removed"
+        return "changed"
+
+
+def diff_snapshots(
+    old: Snapshot, new: Snapshot, months: Optional[Iterable[str]] = None
+) -> List[CostChange]:
+    """Find the costs that differ between two snapshots.
+
+    Args:
+        old: The first snapshot.
+        new: The second snapshot.
+        months: Only compare these months. By default, the months that are
+            in both snapshots.
+
+    Returns:
+        The differences, ordered by finance code, month and subscription.
+    """
+    compared = set(months) if months is not None else set(old.months) & set(new.months)
+    old_totals, new_totals = old.totals(), new.totals()
+    if not compared.issuperset(old.months):
+        old_totals = {key: v for key, v in old_totals.items() if key[1] in compared}
+    if not compared.issuperset(new.months):
+        new_totals = {key: v for key, v in new_totals.items() if key[1] in compared}
+
+    changes = []
+    for key, old_amount in old_totals.items():
+        new_amount = new_totals.get(key)
+        # Amounts are money, so ignore differences of less than a penny
+        if new_amount is None or abs(old_amount - new_amount) >= 0.005:
+            changes.append(CostChange(key[2], key[0], key[1], old_amount, new_amount))
+    for key in new_totals.keys() - old_totals.keys():
+        changes.append(CostChange(key[2], key[0], key[1], None, new_totals[key]))
+
+    return sorted(
+        changes,
+        key=lambda change: (change.finance_code, change.month, change.subscription_id),
+    )
@@ -11,10 +11,12 @@ class State:
     Args:
         access_token: The access token.
         verbose: Whether to display verbose output.
+        no_cache: Whether to bypass cached responses from the API.
     """
 
     access_token: Optional[Callable]
     verbose: bool = False
+    no_cache: bool = False
 
     def get_headers(self) -> Dict:
         """Get the headers with the bearer token if the access_token is valid.
@@ -0,0 +1,352 @@
+"""A local copy of the RCTab API's records, for querying offline.
+
+The summary of every subscription, and its approvals, allocations and
+finance records, are synced into a SQLite database in the app directory.
+Each summary is stored with a digest so that later syncs only fetch the
+records of subscriptions whose summary has changed. The database can then
+be queried with SQL, without contacting the API.
+
+Attributes:
+    TABLE_COLUMNS: The fields of each kind of record that are stored as
+        columns, and so can be indexed. Every record is also stored in
+        full, as JSON, in the data column.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from uuid import UUID
+
+import typer
+
+from rctab_cli.async_client import AsyncRCTabClient
+from rctab_cli.bulk import error_detail
+from rctab_cli.config import APP_NAME
+
+TABLE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "summaries": (
+        "subscription_id",
+        "name",
+        "status",
+        "always_on",
+        "approved_from",
+        "approved_to",
+        "approved",
+        "allocated",
+        "total_cost",
+    ),
+    "approvals": ("subscription_id", "ticket", "amount", "date_from", "date_to"),
+    "allocations": ("subscription_id", "ticket", "amount"),
+    "finances": (
+        "subscription_id",
+        "id",
+        "finance_code",
+        "amount",
+        "date_from",
+        "date_to",
+        "priority",
+        "ticket",
+    ),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    subscription_id TEXT PRIMARY KEY,
+    name TEXT,
+    status TEXT,
+    always_on INTEGER,
+    approved_from TEXT,
+    approved_to TEXT,
+    approved REAL,
+    allocated REAL,
+    total_cost REAL,
+    data TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_status ON summaries (status);
+CREATE INDEX IF NOT EXISTS summaries_always_on ON summaries (always_on);
+
+CREATE TABLE IF NOT EXISTS approvals (
+    subscription_id TEXT NOT NULL,
+    ticket TEXT,
+    amount REAL,
+    date_from TEXT,
+    date_to TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS approvals_subscription ON approvals (subscription_id);
+
+CREATE TABLE IF NOT EXISTS allocations (
+    subscription_id TEXT NOT NULL,
+    ticket TEXT,
+    amount REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS allocations_subscription ON allocations (subscription_id);
+
+CREATE TABLE IF NOT EXISTS finances (
+    subscription_id TEXT NOT NULL,
+    id INTEGER,
+    finance_code TEXT,
+    amount REAL,
+    date_from TEXT,
+    date_to TEXT,
+    priority INTEGER,
+    ticket TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS finances_subscription ON finances (subscription_id);
+CREATE INDEX IF NOT EXISTS finances_finance_code ON finances (finance_code);
+"""
+
+
+def get_store_path() -> Path:
+    """Get the path of the local database.
+
+    Returns:
+        The path, which may not exist yet.
+    """
+    return Path(typer.get_app_dir(APP_NAME)) / "store.sqlite"
+
+
+def summary_digest(summary: Dict[str, Any]) -> str:
+    """Derive a digest that changes whenever a summary does.
+
+    Args:
+        summary: The summary of a subscription.
+
+    Returns:
+        A hex digest.
+    """
+    canonical = json.dumps(summary, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _row(table: str, record: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Pick out the columns of a record, followed by the record as JSON."""
+    values = []
+    for column in TABLE_COLUMNS[table]:
+        value = record.get(column)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, default=str)
+        values.append(value)
+    return (*values, json.dumps(record, default=str))
+
+
+class Store:
+    """The local database of synced records.
+
+    One instance can be shared by several threads.
+    """
+
+    def __init__(self, store_f: Path) -> None:
+        """Open, and if needed create, the database.
+
+        Args:
+            store_f: The path of the SQLite database.
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(store_f), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def digests(self) -> Dict[str, str]:
+        """Get the digest of every stored summary.
+
+        Returns:
+            The digests, by subscription ID.
+        """
+        with self._lock:
+            return dict(
+                self._connection.execute(
+                    "SELECT subscription_id, digest FROM summaries"
+                ).fetchall()
+            )
+
+    def replace_subscription(
+        self,
+        summary: Dict[str, Any],
+        approvals: Iterable[Dict[str, Any]],
+        allocations: Iterable[Dict[str, Any]],
+        finances: Iterable[Dict[str, Any]],
+    ) -> None:
+        """Replace everything stored for a subscription, all at once.
+
+        Args:
+            summary: The summary of the subscription.
+            approvals: Its approvals.
+            allocations: Its allocations.
+            finances: Its finance records.
+        """
+        subscription_id = str(summary["subscription_id"])
+        children = {
+            "approvals": approvals,
+            "allocations": allocations,
+            "finances": finances,
+        }
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO summaries VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        *_row("summaries", summary),
+                        summary_digest(summary),
+                        time.time(),
+                    ),
+                )
+                for table, records in children.items():
+                    columns = len(TABLE_COLUMNS[table]) + 1
+                    self._connection.execute(
+                        f"DELETE FROM {table} WHERE subscription_id = ?",
+                        (subscription_id,),
+                    )
+                    self._connection.executemany(
+                        f"INSERT INTO {table} VALUES ({', '.join('?' * columns)})",
+                        (
+                            _row(table, {**record, "subscription_id": subscription_id})
+                            for record in records
+                        ),
+                    )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def remove_others(self, subscription_ids: Iterable[str]) -> int:
+        """Remove the subscriptions that the API no longer returns.
+
+        Args:
+            subscription_ids: The subscriptions to keep.
+
+        Returns:
+            The number of subscriptions removed.
+        """
+        removed = set(self.digests()) - set(subscription_ids)
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                for table in TABLE_COLUMNS:
+                    self._connection.executemany(
+                        f"DELETE FROM {table} WHERE subscription_id = ?",
+                        ((subscription_id,) for subscription_id in removed),
+                    )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return len(removed)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+
+@dataclass
+class SyncResult:
+    """The outcome of a sync.
+
+    Attributes:
+        changed: The number of subscriptions whose records were fetched.
+        unchanged: The number of subscriptions whose summary had not changed.
+        removed: The number of subscriptions that are no longer returned.
+        failures: An error message for each subscription that failed.
+    """
+
+    changed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failures: List[str] = field(default_factory=list)
+
+
+async def sync_store(
+    client: AsyncRCTabClient, store: Store, full: bool = False
+) -> SyncResult:
+    """Bring the local database up to date with the API.
+
+    The summaries of all subscriptions are fetched in one request. The
+    approvals, allocations and finance records are then fetched, several
+    subscriptions at a time, only for subscriptions whose summary has
+    changed. A subscription that fails keeps its old records, and the old
+    digest, so it is fetched again by the next sync.
+
+    Args:
+        client: The client to call the API with.
+        store: The local database.
+        full: Whether to fetch the records of every subscription.
+
+    Returns:
+        What was synced.
+    """
+    result = SyncResult()
+    summaries = await client.summary()
+    known = {} if full else store.digests()
+
+    changed = []
+    for summary in summaries:
+        if known.get(str(summary["subscription_id"])) == summary_digest(summary):
+            result.unchanged += 1
+        else:
+            changed.append(summary)
+
+    async def fetch(summary: Dict[str, Any]) -> None:
+        subscription_id = UUID(str(summary["subscription_id"]))
+        try:
+            approvals, allocations, finances = await asyncio.gather(
+                client.approvals(subscription_id),
+                client.allocations(subscription_id),
+                client.finance_list(subscription_id),
+            )
+        except Exception as error:  # pylint: disable=broad-except
+            result.failures.append(
+                f"Failed for {subscription_id} with {error_detail(error)}"
+            )
+            return
+        store.replace_subscription(summary, approvals, allocations, finances)
+        result.changed += 1
+
+    await asyncio.gather(*(fetch(summary) for summary in changed))
+    result.removed = store.remove_others(
+        str(summary["subscription_id"]) for summary in summaries
+    )
+    return result
+
+
+def query_store(
+    store_f: Path, sql: str, params: Sequence[Any] = ()
+) -> Tuple[List[str], List[Tuple[Any, ...]]]:
+    """Run a query against the local database, which is opened read-only.
+
+    Args:
+        store_f: The path of the SQLite database.
+        sql: A single SQL statement.
+        params: Values for any placeholders in the statement.
+
+    Raises:
+        FileNotFoundError: If the database does not exist yet.
+        sqlite3.Error: If the statement is not valid or tries to write.
+
+    Returns:
+        The names of the columns and the rows of the result.
+    """
+    if not store_f.exists():
+        raise FileNotFoundError(store_f)
+    connection = sqlite3.connect(f"{store_f.as_uri()}?mode=ro", uri=True)
+    try:
+        cursor = connection.execute(sql, params)
+        columns = [description[0] for description in cursor.description or ()]
+        return columns, cursor.fetchall()
+    finally:
+        connection.close()
@@ -1,5 +1,8 @@
-"""Subscription management app."""
+"""Subscription management, job, local store and daemon apps."""
 
+from rctab_cli.sub_apps.daemon import daemon_app
+from rctab_cli.sub_apps.jobs import jobs_app
+from rctab_cli.sub_apps.store import store_app
 from rctab_cli.sub_apps.sub import subscription_app
 
-__all__ = ["subscription_app"]
+__all__ = ["daemon_app", "jobs_app", "store_app", "subscription_app"]
@@ -0,0 +1,117 @@
+"""Commands to start and stop the daemon.
+
+Attributes:
+    daemon_app: Typer object for the daemon CLI.
+"""
+
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import typer
+
+from rctab_cli.daemon import IDLE_TIMEOUT, serve
+from rctab_cli.forward import connect, get_socket_path, send
+
+daemon_app = typer.Typer(no_args_is_help=True)
+
+# Seconds to wait for the daemon to start listening
+START_TIMEOUT = 10.0
+
+
+def daemon_status() -> Optional[Dict[str, Any]]:
+    """Ask the daemon how it is.
+
+    Returns:
+        The daemon's process ID and start time, or None if it isn't running.
+    """
+    try:
+        return send(connect(timeout=2), {"command": "status"})
+    except (OSError, ValueError):
+        return None
+
+
+@daemon_app.command("start")
+def daemon_start(
+    idle_timeout: float = typer.Option(
+        IDLE_TIMEOUT, min=1, help="Seconds without a command after which to stop"
+    ),
+) -> None:
+    """Start the daemon in the background.
+
+    rctab sub commands are then run by the daemon, which keeps the settings,
+    an access token and connections to the API ready between commands.
+    """
+    # pylint: disable=import-outside-toplevel
+    from rctab_cli.auth import get_token_provider, save_cache
+
+    if sys.platform == "win32":
+        typer.secho("The daemon needs Unix sockets", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    status = daemon_status()
+    if status is not None:
+        typer.echo(f"The daemon is already running with PID {status['pid']}")
+        return
+
+    # Sign in here, where we can ask the user to, so the daemon doesn't have to
+    get_token_provider().acquire()
+    save_cache()
+
+    socket_f = get_socket_path()
+    socket_f.parent.mkdir(0o700, parents=True, exist_ok=True)
+    with open(socket_f.with_name("daemon.log"), "ab") as log:
+        subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", "rctab_cli.daemon", str(idle_timeout)],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        status = daemon_status()
+        if status is not None:
+            typer.echo(f"Started the daemon with PID {status['pid']}")
+            return
+        time.sleep(0.1)
+    typer.secho(
+        f"The daemon did not start, see {socket_f.with_name('daemon.log')}",
+        fg=typer.colors.RED,
+    )
+    raise typer.Exit(code=1)
+
+
+@daemon_app.command("run")
+def daemon_run(
+    idle_timeout: float = typer.Option(
+        IDLE_TIMEOUT, min=1, help="Seconds without a command after which to stop"
+    ),
+) -> None:
+    """Run the daemon in the foreground, e.g. under a service manager."""
+    serve(idle_timeout=idle_timeout)
+
+
+@daemon_app.command("stop")
+def daemon_stop() -> None:
+    """Stop the daemon."""
+    try:
+        response = send(connect(timeout=10), {"command": "stop"})
+    except (OSError, ValueError):
+        typer.echo("The daemon is not running")
+        return
+    typer.echo(f"Stopped the daemon with PID {response['pid']}")
+
+
+@daemon_app.command("status")
+def daemon_show_status() -> None:
+    """Show whether the daemon is running."""
+    status = daemon_status()
+    if status is None:
+        typer.echo("The daemon is not running")
+        raise typer.Exit(code=1)
+    started = datetime.fromtimestamp(status["started_at"]).strftime("%Y-%m-%d %H:%M")
+    typer.echo(f"The daemon is running with PID {status['pid']}, since {started}")
@@ -0,0 +1,72 @@
+"""Commands for jobs, such as add-bulk, that can be resumed.
+
+Attributes:
+    jobs_app: Typer object for the jobs CLI.
+"""
+
+from datetime import datetime
+
+import typer
+
+from rctab_cli.jobs import Job, list_jobs
+from rctab_cli.sub_apps.sub import execute_job, report_job
+
+jobs_app = typer.Typer(no_args_is_help=True)
+
+
+def load_job(job_id: str) -> Job:
+    """Load a saved job.
+
+    Args:
+        job_id: The ID of the job.
+
+    Raises:
+        typer.Exit: With exit code 1 if there is no such job.
+
+    Returns:
+        The job.
+    """
+    try:
+        return Job.load(job_id)
+    except FileNotFoundError:
+        typer.secho(f"There is no job with ID {job_id}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+
+@jobs_app.command("list")
+def jobs_list() -> None:
+    """List saved jobs and how far each has got."""
+    for job in list_jobs():
+        counts = job.counts()
+        complete = counts.get("done", 0) + counts.get("skipped", 0)
+        created = datetime.fromtimestamp(job.created_at).strftime("%Y-%m-%d %H:%M")
+        line = f"{job.id}  {created}  {job.name}: {complete}/{len(job.steps)} steps"
+        if counts.get("failed"):
+            line += f", {counts['failed']} failed"
+        typer.echo(line)
+
+
+@jobs_app.command("show")
+def jobs_show(job_id: str = typer.Argument(..., help="Job ID")) -> None:
+    """Show the status of every step of a job."""
+    job = load_job(job_id)
+    for step in job.steps.values():
+        line = f"{step.id}  {step.key}  {step.action}: {step.status}"
+        if step.status == "failed":
+            line += f" {step.detail}"
+        typer.echo(line)
+
+
+@jobs_app.command("resume")
+def jobs_resume(
+    job_id: str = typer.Argument(..., help="Job ID"),
+    workers: int = typer.Option(10, min=1, help="Number of steps to run concurrently"),
+) -> None:
+    """Run the steps of a job that have not completed.
+
+    Steps that failed are tried again. Steps that are already complete,
+    and changes that the journal shows were already made, are skipped.
+    """
+    job = load_job(job_id)
+    execute_job(job, workers)
+    report_job(job)
@@ -0,0 +1,89 @@
+"""Commands that sync records to a local database and query them.
+
+Attributes:
+    store_app: Typer object for the sync and query commands.
+"""
+
+import asyncio
+import sqlite3
+from typing import List
+
+import typer
+
+from rctab_cli.async_client import AsyncRCTabClient
+from rctab_cli.config import get_cli_settings
+from rctab_cli.retry import get_circuit_breaker, get_retry_policy
+from rctab_cli.store import Store, SyncResult, get_store_path, query_store, sync_store
+
+store_app = typer.Typer()
+
+
+@store_app.command()
+def sync(
+    full: bool = typer.Option(
+        False, "--full", help="Fetch the records of every subscription"
+    ),
+) -> None:
+    """Copy subscription records into a local database, for rctab query.
+
+    Only the subscriptions whose summary has changed since the last sync
+    have their approvals, allocations and finance records fetched again.
+    """
+    store_f = get_store_path()
+    store_f.parent.mkdir(0o700, parents=True, exist_ok=True)
+    store = Store(store_f)
+
+    async def run() -> SyncResult:
+        async with AsyncRCTabClient(
+            max_concurrency=get_cli_settings().pool_size,
+            retry_policy=get_retry_policy(),
+            circuit_breaker=get_circuit_breaker(),
+        ) as client:
+            return await sync_store(client, store, full)
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        store.close()
+
+    typer.echo(
+        f"{result.changed} subscriptions synced, {result.unchanged} unchanged, "
+        f"{result.removed} removed"
+    )
+    if result.failures:
+        for failure in result.failures:
+            typer.secho(failure, fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1)
+
+
+@store_app.command()
+def query(
+    sql: str = typer.Argument(..., help="An SQL SELECT statement"),
+    params: List[str] = typer.Option(
+        None, "--param", help="A value for a ? placeholder, can be given more than once"
+    ),
+) -> None:
+    """Query the records copied by rctab sync, without contacting the API.
+
+    The tables are summaries, approvals, allocations and finances. Each
+    has a subscription_id column, columns for the commonly used fields
+    and a data column with the whole record as JSON, e.g.
+
+    rctab query "SELECT name FROM summaries WHERE total_cost > 0.9 * allocated"
+    """
+    # pylint: disable=import-outside-toplevel
+    from tabulate import tabulate
+
+    try:
+        columns, rows = query_store(get_store_path(), sql, params or [])
+    except FileNotFoundError:
+        typer.secho(
+            "There is no local database. Run rctab sync first.",
+            fg=typer.colors.RED,
+        )
+        raise typer.Exit(code=1)
+    except sqlite3.Error as error:
+        typer.secho(f"Query failed: {error}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    typer.echo(tabulate(rows, headers=columns))
@@ -3,31 +3,91 @@
 Attributes:
     subscription_app: Typer object for the subscription CLI.
     finance_app: Typer object for the finance CLI.
+    cost_recovery_app: Typer object for the cost recovery CLI.
 """
 
 # pylint: disable=too-many-arguments, redefined-outer-name
+import asyncio
 import calendar
 import json
-from datetime import date
+import logging
+from datetime import date, datetime
+from functools import partial
 from json.decoder import JSONDecodeError
-from typing import Dict, Optional, Union
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 from uuid import UUID
 
-import requests
+import click
 import typer
+from pydantic import ValidationError
+
+from rctab_cli import endpoints
+from rctab_cli.async_client import AsyncRCTabClient
+from rctab_cli.bulk import (
+    ModelT,
+    RowResult,
+    error_detail,
+    parse_records,
+    read_records,
+    report_results,
+    run_records,
+    write_results,
+)
+from rctab_cli.client import APIError, get_client
+from rctab_cli.config import get_cli_settings
+from rctab_cli.forecast import forecast_all
+from rctab_cli.jobs import Job, Step, job_results, run_job
+from rctab_cli.journal import IDEMPOTENCY_HEADER, get_journal, idempotency_key
+from rctab_cli.output import output_option, write_output
+from rctab_cli.retry import get_circuit_breaker, get_retry_policy
+from rctab_cli.snapshots import (
+    Snapshot,
+    diff_snapshots,
+    latest_snapshot,
+    list_snapshots,
+    prune_snapshots,
+)
+from rctab_cli.types import (
+    AllocationRow,
+    ApprovalRow,
+    FinanceUpdateRow,
+    OutputFormat,
+    SubscriptionRow,
+)
+from rctab_cli.utils import iter_json_array
+
+if TYPE_CHECKING:
+    import requests
+
+# Seconds that cached responses from read-only endpoints stay fresh
+SUMMARY_CACHE_TTL = 60
+RECORDS_CACHE_TTL = 300
 
-from rctab_cli.auth import BearerAuth
-from rctab_cli.state import state
-from rctab_cli.utils import create_url
 
 subscription_app = typer.Typer(no_args_is_help=True)
 finance_app = typer.Typer(no_args_is_help=True)
+cost_recovery_app = typer.Typer()
 subscription_app.add_typer(
     finance_app, name="finance", help="Manage subscription finance"
 )
+subscription_app.add_typer(cost_recovery_app, name="cost-recovery")
 
 
-def raise_for_status(resp: requests.Response) -> None:
+def raise_for_status(resp: "requests.Response") -> None:
     """Check the status code of a response.
 
     Args:
@@ -54,30 +114,40 @@ def raise_for_status(resp: requests.Response) -> None:
     raise typer.Abort()
 
 
-def add_subscription(subscription_id: UUID) -> None:
-    """Add a subscription to the billing system.
+def post_change(path: str, body: Dict[str, Any], repeat: bool = False) -> Any:
+    """Send an approval, allocation or finance record at most once.
 
     Args:
-        subscription_id: The ID of the subscription to add.
+        path: The path part of the URL.
+        body: The JSON body of the request.
+        repeat: Whether to send the change even if the journal shows that
+            it was already made.
 
     Returns:
-        None.
+        The decoded response, or the one recorded in the journal if the
+        change was already made.
     """
-    path = "accounting/subscription"
-    endpoint = create_url(path)
-
-    resp = requests.post(
-        endpoint,
-        json={"sub_id": str(subscription_id)},
-        auth=BearerAuth(state.get_access_token()),
-    )
-
-    if resp.status_code == 409:
-        typer.echo(resp.json())
-        return
+    if repeat:
+        resp = get_client().post(path, json=body)
+        raise_for_status(resp)
+        return resp.json()
+
+    key = idempotency_key(path, body)
+    journal = get_journal()
+    entry = journal.find(key)
+    if entry is not None:
+        made_at = datetime.fromtimestamp(entry.completed_at).strftime("%Y-%m-%d %H:%M")
+        typer.secho(
+            f"Not sent, the same change was already made at {made_at}. "
+            "Use --repeat to make it again.",
+            fg=typer.colors.YELLOW,
+        )
+        return entry.response
 
+    resp = get_client().post(path, json=body, headers={IDEMPOTENCY_HEADER: key})
     raise_for_status(resp)
-    typer.echo(resp.json())
+    journal.record(key, path, resp.json())
+    return resp.json()
 
 
 def set_the_persistence(subscription_id: UUID, always_on: bool = False) -> None:
@@ -90,13 +160,11 @@ def set_the_persistence(subscription_id: UUID, always_on: bool = False) -> None:
     Returns:
         None.
     """
-    path = "accounting/persistent"
-    endpoint = create_url(path)
+    path = endpoints.PERSISTENT.path()
 
-    resp = requests.post(
-        endpoint,
+    resp = get_client().post(
+        path,
         json={"sub_id": str(subscription_id), "always_on": always_on},
-        auth=BearerAuth(state.get_access_token()),
     )
 
     raise_for_status(resp)
@@ -111,6 +179,7 @@ def create_approval(
     date_from: str,
     date_to: str,
     force: bool = False,
+    repeat: bool = False,
 ) -> None:
     """Create an approval for a subscription.
 
@@ -122,16 +191,16 @@ def create_approval(
         date_from: The date the approval is valid from.
         date_to: The date the approval is valid to.
         force: Whether to allow the date_from to be > 30 days ago.
+        repeat: Whether to approve even if the same approval was already made.
 
     Returns:
         None.
     """
-    path = "accounting/approve"
-    endpoint = create_url(path)
+    path = endpoints.APPROVE.path()
 
-    resp = requests.post(
-        endpoint,
-        json={
+    detail = post_change(
+        path,
+        {
             "sub_id": str(subscription_id),
             "ticket": ticket,
             "amount": amount,
@@ -140,17 +209,16 @@ def create_approval(
             "date_to": date_to,
             "force": force,
         },
-        auth=BearerAuth(state.get_access_token()),
+        repeat,
     )
-
-    raise_for_status(resp)
-    typer.echo(resp.json())
+    typer.echo(detail)
 
 
 def create_allocation(
     subscription_id: UUID,
     ticket: str,
     amount: float,
+    repeat: bool = False,
 ) -> None:
     """Create an allocation for a subscription.
 
@@ -158,25 +226,23 @@ def create_allocation(
         subscription_id: The ID of the subscription to allocate.
         ticket: The ticket reference of the request made.
         amount: The amount to allocate.
+        repeat: Whether to allocate even if the same allocation was already made.
 
     Returns:
         None.
     """
-    path = "accounting/topup"
-    endpoint = create_url(path)
+    path = endpoints.TOPUP.path()
 
-    resp = requests.post(
-        endpoint,
-        json={
+    detail = post_change(
+        path,
+        {
             "sub_id": str(subscription_id),
             "ticket": ticket,
             "amount": amount,
         },
-        auth=BearerAuth(state.get_access_token()),
+        repeat,
     )
-
-    raise_for_status(resp)
-    typer.echo(resp.json())
+    typer.echo(detail)
 
 
 @subscription_app.command()
@@ -227,14 +293,247 @@ def add(
         if not confirm:
             raise typer.Abort()
 
-    # Enter subscription_id into database
-    add_subscription(subscription_id)
+    try:
+        row = SubscriptionRow(
+            subscription_id=subscription_id,
+            ticket=ticket,
+            amount=amount,
+            allocate=allocate,
+            date_from=date_from,
+            date_to=date_to,
+            persistent=persistent,
+        )
+    except ValidationError as error:
+        typer.secho(str(error), fg=typer.colors.RED)
+        raise typer.Abort()
+
+    # Add the subscription, set its persistence and approve funds, as a job
+    # that can be resumed if it is interrupted
+    job = Job(f"add {subscription_id}", subscription_steps(1, row))
+    job.save()
+    execute_job(job, workers=1)
 
-    # Set persistence
-    set_the_persistence(subscription_id, always_on=persistent)
+    for step in job.steps.values():
+        if step.status == "failed":
+            typer.secho(
+                f"\nFailed to {step.action.replace('_', ' ')}: {step.detail}",
+                fg=typer.colors.RED,
+            )
+            typer.echo(f"Resume with: rctab jobs resume {job.id}")
+            raise typer.Exit(code=1)
+        typer.echo(step.detail)
+
+
+def _run_batch(
+    file: Optional[Path],
+    model: Type[ModelT],
+    func: Callable[[AsyncRCTabClient, ModelT], Awaitable[Any]],
+    workers: int,
+    results_file: Optional[Path],
+    repeat: bool = False,
+    key_field: str = "subscription_id",
+) -> None:
+    """Process every record in a file concurrently and report the outcomes.
+
+    Approvals, allocations and finance records are recorded in the journal,
+    so records that were already processed, e.g. by an interrupted run of
+    the same file, are skipped.
+
+    Args:
+        file: The path to a CSV or JSON Lines file, or None for standard input.
+        model: The pydantic model each record should match.
+        func: The async function that sends the requests for one record.
+        workers: The number of records to process at the same time.
+        results_file: Where to save the outcome of each record as JSON Lines.
+        repeat: Whether to process records that the journal shows were
+            already processed.
+        key_field: The field that identifies a record in the outcomes.
+
+    Returns:
+        None.
+    """
+
+    async def run() -> List[RowResult]:
+        async with AsyncRCTabClient(
+            max_concurrency=workers,
+            retry_policy=get_retry_policy(),
+            circuit_breaker=get_circuit_breaker(),
+            journal=None if repeat else get_journal(),
+        ) as client:
+            return await run_records(
+                file, model, partial(func, client), workers, key_field
+            )
+
+    results = asyncio.run(run())
+    if results_file:
+        write_results(results, results_file)
+    report_results(results)
+
+
+def subscription_steps(row: int, sub: SubscriptionRow) -> List[Step]:
+    """Plan the steps to add and fund one subscription.
+
+    Args:
+        row: The position of the subscription in its manifest.
+        sub: The subscription.
+
+    Returns:
+        The steps, which must happen in this order.
+    """
+    subscription_id = str(sub.subscription_id)
+    add_step = Step(
+        f"{row}:add",
+        "add_subscription",
+        {"subscription_id": subscription_id},
+        row=row,
+        key=subscription_id,
+    )
+    persistence_step = Step(
+        f"{row}:persistence",
+        "set_persistence",
+        {"subscription_id": subscription_id, "always_on": sub.persistent},
+        after=[add_step.id],
+        row=row,
+        key=subscription_id,
+    )
+    approve_step = Step(
+        f"{row}:approve",
+        "approve",
+        {
+            "subscription_id": subscription_id,
+            "ticket": sub.ticket,
+            "amount": sub.amount,
+            "allocate": sub.allocate,
+            "date_from": sub.date_from.isoformat(),
+            "date_to": sub.date_to.isoformat(),
+        },
+        after=[persistence_step.id],
+        row=row,
+        key=subscription_id,
+    )
+    return [add_step, persistence_step, approve_step]
+
+
+def execute_job(job: Job, workers: int, repeat: bool = False) -> None:
+    """Run the steps of a job that have not completed.
+
+    The saved job is deleted if every step has then completed, so that only
+    jobs that can be resumed are kept.
+
+    Args:
+        job: The job to run.
+        workers: The maximum number of steps to run at the same time.
+        repeat: Whether to make changes that the journal shows were already
+            made.
+
+    Returns:
+        None.
+    """
+
+    async def run() -> None:
+        async with AsyncRCTabClient(
+            max_concurrency=workers,
+            retry_policy=get_retry_policy(),
+            circuit_breaker=get_circuit_breaker(),
+            journal=None if repeat else get_journal(),
+        ) as client:
+            await run_job(job, client, workers)
 
-    # Approve funds
-    create_approval(subscription_id, ticket, amount, allocate, date_from, date_to)
+    asyncio.run(run())
+    if job.complete:
+        job.delete()
+
+
+def report_job(
+    job: Job,
+    results_file: Optional[Path] = None,
+    invalid: Iterable[RowResult] = (),
+) -> None:
+    """Report the outcome of each record of a job that has run.
+
+    Args:
+        job: The job.
+        results_file: Where to save the outcome of each record as JSON Lines.
+        invalid: The outcome of records that were not valid, so are not
+            part of the job.
+
+    Returns:
+        None.
+    """
+    results = list(invalid) + job_results(job)
+    if results_file:
+        write_results(results, results_file)
+    if not all(result.ok for result in results):
+        typer.echo(f"Resume the job with: rctab jobs resume {job.id}")
+    report_results(results)
+
+
+async def _approve_row(client: AsyncRCTabClient, row: ApprovalRow) -> Any:
+    """Approve credits for one subscription."""
+    return await client.approve(
+        row.subscription_id,
+        row.ticket,
+        row.amount,
+        row.allocate,
+        row.date_from.isoformat(),
+        row.date_to.isoformat(),
+        row.force,
+    )
+
+
+async def _allocate_row(client: AsyncRCTabClient, row: AllocationRow) -> Any:
+    """Allocate credits to one subscription."""
+    return await client.topup(row.subscription_id, row.ticket, row.amount)
+
+
+@subscription_app.command()
+def add_bulk(
+    file: Path = typer.Option(
+        ...,
+        exists=True,
+        dir_okay=False,
+        help="CSV or JSON Lines manifest with one subscription per row",
+    ),
+    workers: int = typer.Option(
+        10, min=1, help="Number of subscriptions to add concurrently"
+    ),
+    results_file: Optional[Path] = typer.Option(
+        None,
+        "--results",
+        dir_okay=False,
+        help="Save the outcome of each row as JSON Lines",
+    ),
+    repeat: bool = typer.Option(
+        False, "--repeat", help="Send even if the journal shows it was already sent"
+    ),
+    skip_check: bool = typer.Option(False, "-y", help="Dont ask for confirmation"),
+) -> None:
+    """Add many existing subscriptions to the billing system and add funds.
+
+    The manifest needs subscription_id, ticket, amount and date_to
+    columns, and can also have allocate, date_from and persistent columns.
+    The subscriptions are added as a job that can be resumed with
+    "rctab jobs resume" if it is interrupted.
+    """
+    if not skip_check:
+        confirm = typer.confirm(f"Add and fund every subscription in {file}?")
+
+        if not confirm:
+            raise typer.Abort()
+
+    invalid = []
+    steps = []
+    for row, record, parsed in parse_records(read_records(file), SubscriptionRow):
+        if isinstance(parsed, str):
+            key = str(record.get("subscription_id", "unknown subscription_id"))
+            invalid.append(RowResult(row, False, key, parsed))
+        else:
+            steps.extend(subscription_steps(row, parsed))
+
+    job = Job(f"add-bulk {file.name}", steps)
+    job.save()
+    execute_job(job, workers, repeat)
+    report_job(job, results_file, invalid)
 
 
 @subscription_app.command()
@@ -264,10 +563,13 @@ def approve(
     force: bool = typer.Option(
         False, "--force", help="Allow date-from to be > 30 days ago"
     ),
+    repeat: bool = typer.Option(
+        False, "--repeat", help="Send even if the journal shows it was already sent"
+    ),
 ) -> None:
     """Approve credits for a subscription."""
     create_approval(
-        subscription_id, ticket, amount, allocate, date_from, date_to, force
+        subscription_id, ticket, amount, allocate, date_from, date_to, force, repeat
     )
 
 
@@ -276,48 +578,223 @@ def allocate(
     subscription_id: UUID = typer.Option(..., help="Subscription id"),
     ticket: str = typer.Option(..., help="Helpdesk ticket reference"),
     amount: float = typer.Option(..., help="Amount to allocate"),
+    repeat: bool = typer.Option(
+        False, "--repeat", help="Send even if the journal shows it was already sent"
+    ),
 ) -> None:
     """Allocate credits a subscription.
 
     Funds must already be approved.
     """
-    create_allocation(subscription_id, ticket, amount)
+    create_allocation(subscription_id, ticket, amount, repeat)
+
+
+@subscription_app.command()
+def approve_batch(
+    file: Optional[Path] = typer.Option(
+        None,
+        exists=True,
+        dir_okay=False,
+        help="CSV or JSON Lines file with one approval per row [default: stdin]",
+    ),
+    workers: int = typer.Option(
+        10, min=1, help="Number of approvals to send concurrently"
+    ),
+    results_file: Optional[Path] = typer.Option(
+        None,
+        "--results",
+        dir_okay=False,
+        help="Save the outcome of each row as JSON Lines",
+    ),
+    repeat: bool = typer.Option(
+        False, "--repeat", help="Send even if the journal shows it was already sent"
+    ),
+) -> None:
+    """Approve credits for many subscriptions.
+
+    Each row needs subscription_id, ticket, amount and date_to fields,
+    and can also have allocate, date_from and force fields.
+    """
+    _run_batch(file, ApprovalRow, _approve_row, workers, results_file, repeat)
+
+
+@subscription_app.command()
+def allocate_batch(
+    file: Optional[Path] = typer.Option(
+        None,
+        exists=True,
+        dir_okay=False,
+        help="CSV or JSON Lines file with one allocation per row [default: stdin]",
+    ),
+    workers: int = typer.Option(
+        10, min=1, help="Number of allocations to send concurrently"
+    ),
+    results_file: Optional[Path] = typer.Option(
+        None,
+        "--results",
+        dir_okay=False,
+        help="Save the outcome of each row as JSON Lines",
+    ),
+    repeat: bool = typer.Option(
+        False, "--repeat", help="Send even if the journal shows it was already sent"
+    ),
+) -> None:
+    """Allocate credits to many subscriptions.
+
+    Each row needs subscription_id, ticket and amount fields. Funds must
+    already be approved.
+    """
+    _run_batch(file, AllocationRow, _allocate_row, workers, results_file, repeat)
+
+
+def _check_subscription_ids(
+    subscription_ids: Optional[List[UUID]], all_subscriptions: bool
+) -> List[UUID]:
+    """Check that either some subscription IDs or --all were given.
+
+    Raises:
+        typer.Abort: If neither or both were given.
+
+    Returns:
+        The subscription IDs.
+    """
+    subscription_ids = list(subscription_ids or [])
+    if bool(subscription_ids) == all_subscriptions:
+        typer.secho(
+            "Give either one or more --subscription-id options or --all",
+            fg=typer.colors.RED,
+        )
+        raise typer.Abort()
+    return subscription_ids
+
+
+def _fetch_many(
+    subscription_ids: List[UUID],
+    all_subscriptions: bool,
+    fetch: Callable[[AsyncRCTabClient, UUID], Awaitable[List[Any]]],
+    output_format: OutputFormat = OutputFormat.JSON,
+) -> List[Any]:
+    """Fetch records for many subscriptions concurrently and merge them.
+
+    Each record is labelled with the ID of the subscription it belongs to.
+
+    Args:
+        subscription_ids: The subscriptions to fetch records for.
+        all_subscriptions: Whether to fetch records for every subscription
+            in the summary instead.
+        fetch: Sends the request for one subscription.
+        output_format: How to print the records that were fetched, if any
+            request failed.
+
+    Raises:
+        typer.Exit: With exit code 1 if any request failed, after printing
+            the records that were fetched.
+
+    Returns:
+        The records for all subscriptions.
+    """
+
+    async def run() -> Tuple[List[UUID], List[Any]]:
+        async with AsyncRCTabClient(
+            max_concurrency=get_cli_settings().pool_size,
+            retry_policy=get_retry_policy(),
+            circuit_breaker=get_circuit_breaker(),
+        ) as client:
+            ids = subscription_ids
+            if all_subscriptions:
+                ids = [UUID(item["subscription_id"]) for item in await client.summary()]
+            responses = await asyncio.gather(
+                *(fetch(client, sub_id) for sub_id in ids), return_exceptions=True
+            )
+            return ids, responses
+
+    ids, responses = asyncio.run(run())
+
+    merged = []
+    failures = []
+    for sub_id, response in zip(ids, responses):
+        if isinstance(response, Exception):
+            failures.append(f"Failed for {sub_id} with {error_detail(response)}")
+            continue
+        for item in response:
+            if isinstance(item, dict):
+                item.setdefault("subscription_id", str(sub_id))
+            merged.append(item)
+
+    if failures:
+        write_output(merged, output_format)
+        for failure in failures:
+            typer.secho(failure, fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1)
+    return merged
 
 
 @subscription_app.command()
 def approvals(
-    subscription_id: UUID = typer.Option(..., help="Subscription id")
+    subscription_id: List[UUID] = typer.Option(
+        None, help="Subscription id, can be given more than once"
+    ),
+    all_subscriptions: bool = typer.Option(
+        False, "--all", help="List approvals for every subscription"
+    ),
+    output_format: OutputFormat = output_option(),
 ) -> None:
-    """List all approvals for a subscription."""
-    path = "accounting/approvals"
-    endpoint = create_url(path)
+    """List all approvals for one or more subscriptions."""
+    subscription_ids = _check_subscription_ids(subscription_id, all_subscriptions)
+    if len(subscription_ids) != 1:
+        merged = _fetch_many(
+            subscription_ids,
+            all_subscriptions,
+            lambda client, sub_id: client.approvals(sub_id),
+            output_format,
+        )
+        write_output(merged, output_format)
+        return
 
-    resp = requests.get(
-        endpoint,
-        json={"sub_id": str(subscription_id)},
-        auth=BearerAuth(state.get_access_token()),
+    path = endpoints.APPROVALS.path()
+
+    resp = get_client().get(
+        path,
+        json={"sub_id": str(subscription_ids[0])},
+        cache_ttl=RECORDS_CACHE_TTL,
     )
 
     raise_for_status(resp)
-    typer.echo(json.dumps(resp.json(), indent=4, sort_keys=True))
+    write_output(resp.json(), output_format)
 
 
 @subscription_app.command()
 def allocations(
-    subscription_id: UUID = typer.Option(..., help="Subscription id")
+    subscription_id: List[UUID] = typer.Option(
+        None, help="Subscription id, can be given more than once"
+    ),
+    all_subscriptions: bool = typer.Option(
+        False, "--all", help="List allocations for every subscription"
+    ),
+    output_format: OutputFormat = output_option(),
 ) -> None:
-    """List all allocations for a subscription."""
-    path = "accounting/allocations"
-    endpoint = create_url(path)
+    """List all allocations for one or more subscriptions."""
+    subscription_ids = _check_subscription_ids(subscription_id, all_subscriptions)
+    if len(subscription_ids) != 1:
+        merged = _fetch_many(
+            subscription_ids,
+            all_subscriptions,
+            lambda client, sub_id: client.allocations(sub_id),
+            output_format,
+        )
+        write_output(merged, output_format)
+        return
 
-    resp = requests.get(
-        endpoint,
-        json={"sub_id": str(subscription_id)},
-        auth=BearerAuth(state.get_access_token()),
+    path = endpoints.ALLOCATIONS.path()
+
+    resp = get_client().get(
+        path,
+        json={"sub_id": str(subscription_ids[0])},
+        cache_ttl=RECORDS_CACHE_TTL,
     )
 
     raise_for_status(resp)
-    typer.echo(json.dumps(resp.json(), indent=4, sort_keys=True))
+    write_output(resp.json(), output_format)
 
 
 @subscription_app.command()
@@ -326,20 +803,35 @@ def summary(
     show_rbac: bool = typer.Option(
         False, "--show-rbac", help="Include the role assignments"
     ),
+    output_format: OutputFormat = output_option(),
 ) -> None:
     """Get a summary of approvals, allocations and costs for one or all subscriptions."""
-    path = "accounting/subscription"
-    endpoint = create_url(path)
+    path = endpoints.SUBSCRIPTION.path()
 
     params = {}
 
     if subscription_id:
         params["sub_id"] = str(subscription_id)
 
-    resp = requests.get(
-        endpoint,
+    if output_format in (OutputFormat.JSONL, OutputFormat.CSV):
+        # Parse and print each summary as it arrives so that memory use
+        # does not grow with the number of subscriptions
+        resp = get_client().get(path, params=params, stream=True)
+        raise_for_status(resp)
+
+        def stream() -> Iterator[Any]:
+            for item in iter_json_array(resp.iter_content(chunk_size=65536)):
+                if not show_rbac:
+                    item.pop("role_assignments", None)
+                yield item
+
+        write_output(stream(), output_format)
+        return
+
+    resp = get_client().get(
+        path,
         params=params,
-        auth=BearerAuth(state.get_access_token()),
+        cache_ttl=SUMMARY_CACHE_TTL,
     )
 
     raise_for_status(resp)
@@ -349,7 +841,56 @@ def summary(
         for item in summaries:
             item.pop("role_assignments")
 
-    typer.echo(json.dumps(summaries, indent=4, sort_keys=True))
+    write_output(summaries, output_format)
+
+
+@subscription_app.command()
+def forecast(
+    top: Optional[int] = typer.Option(
+        None, min=1, help="Only show this many subscriptions"
+    ),
+) -> None:
+    """Rank subscriptions by how soon they will run out of credit.
+
+    Each subscription is assumed to keep spending at its average daily rate
+    since it was first used.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tabulate import tabulate
+
+    resp = get_client().get(endpoints.SUBSCRIPTION.path(), cache_ttl=SUMMARY_CACHE_TTL)
+    raise_for_status(resp)
+
+    forecasts = forecast_all(resp.json())[:top]
+    typer.echo(
+        tabulate(
+            [
+                (
+                    item.name,
+                    item.subscription_id,
+                    item.allocated,
+                    item.total_cost,
+                    item.burn_rate,
+                    None if item.days_left is None else int(item.days_left),
+                    item.runs_out,
+                    item.overspend,
+                )
+                for item in forecasts
+            ],
+            headers=(
+                "Name",
+                "Subscription",
+                "Allocated",
+                "Cost",
+                "Per day",
+                "Days left",
+                "Runs out",
+                "Overspend",
+            ),
+            floatfmt=".2f",
+            missingval="-",
+        )
+    )
 
 
 @finance_app.command("create")
@@ -361,6 +902,9 @@ def finance_create(
     finance_code: str = typer.Option(..., help="Finance code for cost recovery"),
     ticket: str = typer.Option(..., help="Helpdesk ticket reference"),
     priority: int = typer.Option(100, help="Lower number is higher priority"),
+    repeat: bool = typer.Option(
+        False, "--repeat", help="Send even if the journal shows it was already sent"
+    ),
 ) -> None:
     """Create a finance record for a subscription."""
     try:
@@ -379,10 +923,9 @@ def finance_create(
     month_range = calendar.monthrange(date_to_date.year, date_to_date.month)
     date_to_date = date(date_to_date.year, date_to_date.month, month_range[1])
 
-    endpoint = create_url("accounting/finances")
-    resp = requests.post(
-        endpoint,
-        json={
+    detail = post_change(
+        endpoints.FINANCES.path(),
+        {
             "subscription_id": str(subscription_id),
             "date_from": date_from_date.isoformat(),
             "date_to": date_to_date.isoformat(),
@@ -391,128 +934,332 @@ def finance_create(
             "ticket": ticket,
             "priority": priority,
         },
-        auth=BearerAuth(state.get_access_token()),
+        repeat,
     )
-    raise_for_status(resp)
-    typer.echo(resp.json())
+    typer.echo(detail)
 
 
 def get_finance(
     finance_id: int,
+    cache_ttl: Optional[float] = None,
 ) -> Dict[str, Union[float, str]]:
     """Retrieve a finance record from the server.
 
     Not to be confused with finance_get, for the finance-get command.
-    """
-    endpoint = create_url("accounting/finances")
 
-    resp = requests.get(
-        endpoint + f"/{finance_id}",
-        json={
-            "finance_id": finance_id,
-        },
-        auth=BearerAuth(state.get_access_token()),
+    Args:
+        finance_id: The ID of the finance record.
+        cache_ttl: If given, how many seconds a cached copy stays fresh.
+    """
+    resp = get_client().get(
+        endpoints.FINANCE.path(finance_id=finance_id), cache_ttl=cache_ttl
     )
     raise_for_status(resp)
     return resp.json()
 
 
+def read_finance(
+    finance_id: int, fresh: bool = False
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Retrieve a finance record, and its ETag, in order to update it.
+
+    A cached copy with an ETag is used however old it is, because the update
+    is sent with If-Match and is refused if the record has changed since.
+    Without an ETag, nothing would protect the update, so the record is
+    always revalidated with the server.
+
+    Args:
+        finance_id: The ID of the finance record.
+        fresh: Whether to revalidate any cached copy with the server.
+
+    Returns:
+        The finance record and its ETag, if the server sent one.
+    """
+    path = endpoints.FINANCE.path(finance_id=finance_id)
+    entry = None if fresh else get_client().cached(path)
+    if entry is not None and entry.etag:
+        return json.loads(entry.content), entry.etag
+
+    resp = get_client().get(path, cache_ttl=0)
+    raise_for_status(resp)
+    return resp.json(), resp.headers.get("ETag")
+
+
+def cached_etag(finance_id: int) -> Optional[str]:
+    """Get the ETag of the cached copy of a finance record, if there is one.
+
+    A record that is replaced without being read is sent with If-Match this
+    ETag, so that changes made since it was cached are not overwritten.
+
+    Args:
+        finance_id: The ID of the finance record.
+
+    Returns:
+        The ETag, or None if there is no cached copy with one.
+    """
+    entry = get_client().cached(endpoints.FINANCE.path(finance_id=finance_id))
+    return entry.etag if entry else None
+
+
 @finance_app.command("get")
 def finance_get(
     finance_id: int = typer.Option(..., help="Finance ID"),
+    output_format: OutputFormat = output_option(),
 ) -> None:
     """Get a finance row from the database."""
-    result = get_finance(finance_id)
-    typer.echo(result)
+    result = get_finance(finance_id, cache_ttl=RECORDS_CACHE_TTL)
+    write_output(result, output_format)
 
 
 class SubscriptionIdMismatch(Exception):
     """When the Subscription ID and Finance ID don't match."""
 
 
+def first_day(month: str) -> date:
+    """Get the first day of a month.
+
+    Args:
+        month: The month, in YYYY-MM format.
+
+    Raises:
+        ValueError: If the month is not in YYYY-MM format.
+
+    Returns:
+        The first day of the month.
+    """
+    try:
+        return date.fromisoformat(month + "-01")
+    except ValueError as error:
+        raise ValueError("Month must be in YYYY-MM format") from error
+
+
+def last_day(month: str) -> date:
+    """Get the last day of a month.
+
+    Args:
+        month: The month, in YYYY-MM format.
+
+    Raises:
+        ValueError: If the month is not in YYYY-MM format.
+
+    Returns:
+        The last day of the month.
+    """
+    start = first_day(month)
+    return date(
+        start.year, start.month, calendar.monthrange(start.year, start.month)[1]
+    )
+
+
+def apply_finance_changes(
+    finance: Dict[str, Any], changes: FinanceUpdateRow
+) -> Dict[str, Any]:
+    """Change the fields of a finance record that are given.
+
+    Args:
+        finance: The finance record.
+        changes: The new values of the fields to change.
+
+    Raises:
+        SubscriptionIdMismatch: If the record is for another subscription.
+        ValueError: If a month is not in YYYY-MM format.
+
+    Returns:
+        A changed copy of the finance record.
+    """
+    if str(changes.subscription_id) != finance["subscription_id"]:
+        raise SubscriptionIdMismatch
+
+    new_finance = finance.copy()
+    if changes.date_from:
+        new_finance["date_from"] = first_day(changes.date_from).isoformat()
+    if changes.date_to:
+        new_finance["date_to"] = last_day(changes.date_to).isoformat()
+    if changes.amount is not None:
+        new_finance["amount"] = changes.amount
+    if changes.finance_code:
+        new_finance["finance_code"] = changes.finance_code
+    if changes.ticket:
+        new_finance["ticket"] = changes.ticket
+    if changes.priority is not None:
+        new_finance["priority"] = changes.priority
+    return new_finance
+
+
+def blank_finance(changes: FinanceUpdateRow) -> Dict[str, Any]:
+    """Start a finance record to fill in with changes that give every field.
+
+    Args:
+        changes: The changes.
+
+    Returns:
+        A finance record with only its IDs.
+    """
+    return {"id": changes.finance_id, "subscription_id": str(changes.subscription_id)}
+
+
 @finance_app.command("update")
 def finance_update(
     finance_id: int = typer.Option(..., help="Finance ID"),
     subscription_id: UUID = typer.Option(..., help="Subscription ID"),
-    date_from: str = typer.Option(None, help="Start date, in YYYY-MM format"),
-    date_to: str = typer.Option(None, help="End date, in YYYY-MM format"),
-    amount: float = typer.Option(None, help="Amount to finance"),
-    finance_code: str = typer.Option(None, help="Finance code for cost recovery"),
-    ticket: str = typer.Option(None, help="Helpdesk ticket reference"),
-    priority: int = typer.Option(None, help="Lower number is higher priority"),
+    date_from: Optional[str] = typer.Option(None, help="Start date, in YYYY-MM format"),
+    date_to: Optional[str] = typer.Option(None, help="End date, in YYYY-MM format"),
+    amount: Optional[float] = typer.Option(None, help="Amount to finance"),
+    finance_code: Optional[str] = typer.Option(
+        None, help="Finance code for cost recovery"
+    ),
+    ticket: Optional[str] = typer.Option(None, help="Helpdesk ticket reference"),
+    priority: Optional[int] = typer.Option(
+        None, help="Lower number is higher priority"
+    ),
+    skip_read: bool = typer.Option(
+        False,
+        "--skip-read",
+        help=(
+            "Replace the whole record without reading it first; needs every "
+            "field, and is refused if the record changed since it was cached"
+        ),
+    ),
 ) -> None:
     """Update a finance record for a subscription."""
-    endpoint = create_url("accounting/finances")
-
-    # Get the finance object as it currently is in case we have only
-    # been given some optional arguments
-    old_finance = get_finance(finance_id)
-    new_finance = old_finance.copy()
-
-    if str(subscription_id) != old_finance["subscription_id"]:
-        raise SubscriptionIdMismatch
+    changes = FinanceUpdateRow(
+        finance_id=finance_id,
+        subscription_id=subscription_id,
+        date_from=date_from,
+        date_to=date_to,
+        amount=amount,
+        finance_code=finance_code,
+        ticket=ticket,
+        priority=priority,
+    )
+    # Check the months before sending any requests
+    try:
+        apply_finance_changes(blank_finance(changes), changes)
+    except ValueError as error:
+        typer.secho(str(error), fg=typer.colors.RED)
+        raise typer.Abort()
 
-    if date_from:
-        try:
-            # The first day of the month
-            date_from_date = date.fromisoformat(date_from + "-01")
+    path = endpoints.FINANCE.path(finance_id=finance_id)
 
-        except ValueError:
+    if skip_read:
+        if not changes.complete:
             typer.secho(
-                "Month must be in YYYY-MM format",
-                fg=typer.colors.RED,
+                "--skip-read needs every field to be given", fg=typer.colors.RED
             )
             raise typer.Abort()
-        new_finance["date_from"] = date_from_date.isoformat()
-
-    if date_to:
-        try:
-            # The last day of the month
-            date_to_date = date.fromisoformat(date_to + "-01")
-        except ValueError:
+        new_finance = apply_finance_changes(blank_finance(changes), changes)
+        etag = cached_etag(finance_id)
+        resp = get_client().put(
+            path, json=new_finance, headers={"If-Match": etag} if etag else {}
+        )
+        if resp.status_code == 412:
             typer.secho(
-                "Month must be in YYYY-MM format",
+                "The record has changed since it was cached, "
+                "check it and update it without --skip-read",
                 fg=typer.colors.RED,
             )
             raise typer.Abort()
-        month_range = calendar.monthrange(date_to_date.year, date_to_date.month)
-        date_to_date = date(date_to_date.year, date_to_date.month, month_range[1])
-        new_finance["date_to"] = date_to_date.isoformat()
+        raise_for_status(resp)
+        typer.echo(resp.json())
+        return
 
-    new_finance["amount"] = amount if amount is not None else old_finance["amount"]
-    new_finance["finance_code"] = (
-        finance_code if finance_code else old_finance["finance_code"]
-    )
-    new_finance["ticket"] = ticket if ticket else old_finance["ticket"]
-    new_finance["priority"] = (
-        priority if priority is not None else old_finance["priority"]
-    )
+    # Get the finance object as it currently is in case we have only been
+    # given some optional arguments. If a cached copy turns out to be out
+    # of date, read it again and retry once.
+    for fresh in (False, True):
+        old_finance, etag = read_finance(finance_id, fresh=fresh)
+        new_finance = apply_finance_changes(old_finance, changes)
 
-    if new_finance == old_finance:
-        typer.echo("Finance records identical. Taking no action.")
-        return
+        if new_finance == old_finance:
+            typer.echo("Finance records identical. Taking no action.")
+            return
+
+        resp = get_client().put(
+            path, json=new_finance, headers={"If-Match": etag} if etag else {}
+        )
+        if resp.status_code != 412:
+            break
 
-    resp = requests.put(
-        endpoint + f"/{finance_id}",
-        json=new_finance,
-        auth=BearerAuth(state.get_access_token()),
-    )
     raise_for_status(resp)
     typer.echo(resp.json())
 
 
+async def _update_finance_row(
+    client: AsyncRCTabClient, changes: FinanceUpdateRow, skip_read: bool = False
+) -> Any:
+    """Update one finance record."""
+    if skip_read and changes.complete:
+        return await client.finance_update(
+            changes.finance_id,
+            apply_finance_changes(blank_finance(changes), changes),
+            cached_etag(changes.finance_id),
+        )
+
+    for attempt in range(2):
+        old_finance, etag = await client.finance_read(changes.finance_id)
+        new_finance = apply_finance_changes(old_finance, changes)
+        if new_finance == old_finance:
+            return "Finance records identical. Taking no action."
+        try:
+            return await client.finance_update(changes.finance_id, new_finance, etag)
+        except APIError as error:
+            # Read the record again if it changed since it was read
+            if error.status_code != 412 or attempt:
+                raise
+    return None
+
+
+@finance_app.command("update-batch")
+def finance_update_batch(
+    file: Optional[Path] = typer.Option(
+        None,
+        exists=True,
+        dir_okay=False,
+        help="CSV or JSON Lines file with one finance record per row [default: stdin]",
+    ),
+    workers: int = typer.Option(
+        10, min=1, help="Number of records to update concurrently"
+    ),
+    results_file: Optional[Path] = typer.Option(
+        None,
+        "--results",
+        dir_okay=False,
+        help="Save the outcome of each row as JSON Lines",
+    ),
+    skip_read: bool = typer.Option(
+        False,
+        "--skip-read",
+        help=(
+            "Replace the whole of each record that has every field without "
+            "reading it first, unless it changed since it was cached"
+        ),
+    ),
+) -> None:
+    """Update many finance records.
+
+    Each row needs finance_id and subscription_id fields, and can have
+    date_from, date_to, amount, finance_code, ticket and priority fields.
+    Fields that are not given are left as they are.
+    """
+    _run_batch(
+        file,
+        FinanceUpdateRow,
+        partial(_update_finance_row, skip_read=skip_read),
+        workers,
+        results_file,
+        key_field="finance_id",
+    )
+
+
 @finance_app.command("delete")
 def finance_delete(
     finance_id: int = typer.Option(..., help="Finance ID"),
     subscription_id: UUID = typer.Option(..., help="Subscription ID"),
 ) -> None:
     """Delete a finance record for a subscription."""
-    endpoint = create_url("accounting/finances")
-
-    resp = requests.delete(
-        endpoint + f"/{finance_id}",
+    resp = get_client().delete(
+        endpoints.FINANCE.path(finance_id=finance_id),
         json={"sub_id": str(subscription_id)},
-        auth=BearerAuth(state.get_access_token()),
     )
     raise_for_status(resp)
     typer.echo(resp.json())
@@ -520,60 +1267,357 @@ def finance_delete(
 
 @finance_app.command("list")
 def finance_list(
-    subscription_id: UUID = typer.Option(..., help="Subscription ID"),
+    subscription_id: List[UUID] = typer.Option(
+        None, help="Subscription ID, can be given more than once"
+    ),
+    all_subscriptions: bool = typer.Option(
+        False, "--all", help="List finance records for every subscription"
+    ),
+    output_format: OutputFormat = output_option(),
 ) -> None:
-    """List all finance records for a subscription."""
-    endpoint = create_url("accounting/finance")
-    resp = requests.get(
-        endpoint,
+    """List all finance records for one or more subscriptions."""
+    subscription_ids = _check_subscription_ids(subscription_id, all_subscriptions)
+    if len(subscription_ids) != 1:
+        merged = _fetch_many(
+            subscription_ids,
+            all_subscriptions,
+            lambda client, sub_id: client.finance_list(sub_id),
+            output_format,
+        )
+        write_output(merged, output_format)
+        return
+
+    resp = get_client().get(
+        endpoints.FINANCE_LIST.path(),
         json={
-            "sub_id": str(subscription_id),
+            "sub_id": str(subscription_ids[0]),
         },
-        auth=BearerAuth(state.get_access_token()),
+        cache_ttl=RECORDS_CACHE_TTL,
     )
     raise_for_status(resp)
-    typer.echo(resp.json())
+    write_output(resp.json(), output_format)
 
 
-@subscription_app.command()
+def month_range(month_from: str, month_to: str) -> List[str]:
+    """List the months from one month to another, inclusive.
+
+    Args:
+        month_from: The first month, in YYYY-MM format.
+        month_to: The last month, in YYYY-MM format.
+
+    Raises:
+        ValueError: If either month is not in YYYY-MM format or the last
+            month is before the first.
+
+    Returns:
+        The months, in YYYY-MM format and in order.
+    """
+    start, end = first_day(month_from), first_day(month_to)
+    if end < start:
+        raise ValueError("--to must not be before --from")
+
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def preview_cost_recovery(months: List[str]) -> Dict[str, Any]:
+    """Calculate the recoverable costs for several months concurrently.
+
+    Nothing is saved to the database.
+
+    Args:
+        months: The months, in YYYY-MM format.
+
+    Raises:
+        typer.Exit: With exit code 1 if the costs for any month could not
+            be calculated.
+
+    Returns:
+        The costs the API calculated, by month.
+    """
+
+    async def run() -> List[Any]:
+        async with AsyncRCTabClient(
+            max_concurrency=get_cli_settings().pool_size,
+            retry_policy=get_retry_policy(),
+            circuit_breaker=get_circuit_breaker(),
+        ) as client:
+            return await asyncio.gather(
+                *(
+                    client.cost_recovery(first_day(month).isoformat())
+                    for month in months
+                ),
+                return_exceptions=True,
+            )
+
+    responses = asyncio.run(run())
+
+    failures = [
+        f"Failed for {month} with {error_detail(response)}"
+        for month, response in zip(months, responses)
+        if isinstance(response, Exception)
+    ]
+    if failures:
+        for failure in failures:
+            typer.secho(failure, fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1)
+    return dict(zip(months, responses))
+
+
+def cost_recovery_table(costs: Dict[str, Any]) -> str:
+    """Tabulate recoverable costs by finance code and month, with totals.
+
+    Args:
+        costs: The costs the API calculated, by month, each a list of
+            records with a finance_code and an amount.
+
+    Returns:
+        A table with a row for each finance code and month, a subtotal for
+        each finance code and a grand total.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tabulate import tabulate
+
+    amounts: Dict[Tuple[str, str], float] = {}
+    for month, records in costs.items():
+        for record in records or []:
+            key = (str(record.get("finance_code")), month)
+            amounts[key] = amounts.get(key, 0.0) + float(record.get("amount") or 0)
+
+    rows: List[Tuple[str, str, float]] = []
+    subtotal = 0.0
+    for (finance_code, month), amount in sorted(amounts.items()):
+        if rows and rows[-1][0] != finance_code:
+            rows.append(("", "Total", subtotal))
+            subtotal = 0.0
+        rows.append((finance_code, month, amount))
+        subtotal += amount
+    if rows:
+        rows.append(("", "Total", subtotal))
+    rows.append(("Total", "", sum(amounts.values())))
+
+    return tabulate(rows, headers=("Finance code", "Month", "Amount"), floatfmt=".2f")
+
+
+def save_snapshot(kind: str, costs: Dict[str, Any]) -> None:
+    """Save the costs the API returned, so they can be compared later.
+
+    The oldest snapshots of the kind are removed. A snapshot that can't be
+    saved is only reported, because the costs may already be committed.
+
+    Args:
+        kind: Either "dry-run" or "committed".
+        costs: The costs, by month.
+    """
+    snapshot = Snapshot.from_costs(kind, costs)
+    try:
+        snapshot.save()
+        prune_snapshots(kind)
+    except OSError as error:
+        logging.info("Could not save %s snapshot", kind, exc_info=True)
+        typer.secho(
+            f"Could not save {kind} snapshot: {error}", fg=typer.colors.YELLOW, err=True
+        )
+        return
+    typer.secho(f"Saved {kind} snapshot {snapshot.id}", err=True)
+
+
+@cost_recovery_app.callback(invoke_without_command=True)
 def cost_recovery(
-    month: str = typer.Option(..., help="A month, in YYYY-MM format"),
+    month: Optional[str] = typer.Option(None, help="A month, in YYYY-MM format"),
+    month_from: Optional[str] = typer.Option(
+        None, "--from", help="The first of several months, in YYYY-MM format"
+    ),
+    month_to: Optional[str] = typer.Option(
+        None, "--to", help="The last of several months, in YYYY-MM format"
+    ),
     for_real: bool = typer.Option(
         False, "--for-real/--dry-run", help="Save the results to the database"
     ),
+    output_format: Optional[OutputFormat] = output_option(
+        None,
+        "By default, json for one month and a table by finance code for several",
+    ),
 ) -> None:
-    """Recover costs for a given month."""
+    """Recover costs for a given month, or for several months in order.
+
+    With --from and --to, the costs for every month are calculated and
+    shown as one table first. With --for-real, the months are then saved
+    one at a time, in order, stopping at the first that fails.
+
+    The results are kept as a snapshot, which the diff command compares.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None and ctx.invoked_subcommand:
+        return
+
+    if month_from or month_to:
+        if month or not (month_from and month_to):
+            typer.secho(
+                "Give either --month or both --from and --to",
+                fg=typer.colors.RED,
+            )
+            raise typer.Abort()
+        try:
+            months = month_range(month_from, month_to)
+        except ValueError as error:
+            typer.secho(str(error), fg=typer.colors.RED)
+            raise typer.Abort()
+
+        costs = preview_cost_recovery(months)
+        save_snapshot("dry-run", costs)
+        if output_format is None:
+            typer.echo(cost_recovery_table(costs))
+        else:
+            write_output(
+                [
+                    {"month": each_month, **record}
+                    for each_month, records in costs.items()
+                    for record in records
+                ],
+                output_format,
+            )
+        if for_real:
+            committed: Dict[str, Any] = {}
+            try:
+                for each_month in months:
+                    resp = get_client().post(
+                        endpoints.COST_RECOVERY.path(),
+                        json={"first_day": first_day(each_month).isoformat()},
+                    )
+                    raise_for_status(resp)
+                    committed[each_month] = resp.json()
+                    typer.echo(f"Recovered costs for {each_month}")
+            finally:
+                if committed:
+                    save_snapshot("committed", committed)
+        return
+
+    if not month:
+        typer.secho("Give either --month or both --from and --to", fg=typer.colors.RED)
+        raise typer.Abort()
+
     # The first day of the month
     try:
-        month_date = date.fromisoformat(month + "-01")
-    except ValueError:
-        typer.secho(
-            "Month must be in YYYY-MM format",
-            fg=typer.colors.RED,
-        )
+        month_date = first_day(month)
+    except ValueError as error:
+        typer.secho(str(error), fg=typer.colors.RED)
         raise typer.Abort()
 
-    endpoint = create_url("accounting/cli-cost-recovery")
-
     if for_real:
         # If we POST, the server commits the calculated costs to the db
-        resp = requests.post(
-            endpoint,
+        resp = get_client().post(
+            endpoints.COST_RECOVERY.path(),
             json={
                 "first_day": month_date.isoformat(),
             },
-            auth=BearerAuth(state.get_access_token()),
         )
 
     else:
         # If we GET, the server returns the calculated recoverable costs
-        resp = requests.get(
-            endpoint,
+        resp = get_client().get(
+            endpoints.COST_RECOVERY.path(),
             json={
                 "first_day": month_date.isoformat(),
             },
-            auth=BearerAuth(state.get_access_token()),
         )
 
     raise_for_status(resp)
-    typer.echo(resp.json())
+    save_snapshot("committed" if for_real else "dry-run", {month: resp.json()})
+    write_output(resp.json(), output_format or OutputFormat.JSON)
+
+
+def load_snapshot(snapshot_id: Optional[str], kind: str) -> Snapshot:
+    """Load a snapshot, or the latest snapshot of a kind.
+
+    Args:
+        snapshot_id: The ID of the snapshot, or None for the latest.
+        kind: The kind of snapshot to load if no ID is given.
+
+    Raises:
+        typer.Exit: With exit code 1 if there is no such snapshot.
+
+    Returns:
+        The snapshot.
+    """
+    if snapshot_id is None:
+        snapshot = latest_snapshot(kind)
+        if snapshot is not None:
+            return snapshot
+        typer.secho(f"There is no {kind} snapshot", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    try:
+        return Snapshot.load(snapshot_id)
+    except FileNotFoundError:
+        typer.secho(f"There is no snapshot with ID {snapshot_id}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+
+@cost_recovery_app.command("snapshots")
+def cost_recovery_snapshots() -> None:
+    """List saved cost recovery snapshots."""
+    for snapshot in list_snapshots():
+        created = datetime.fromtimestamp(snapshot.created_at).strftime("%Y-%m-%d %H:%M")
+        months = snapshot.months[0] if snapshot.months else ""
+        if len(snapshot.months) > 1:
+            months += f" to {snapshot.months[-1]}"
+        typer.echo(
+            f"{snapshot.id}  {created}  {snapshot.kind}: {months}, "
+            f"{len(snapshot)} rows"
+        )
+
+
+@cost_recovery_app.command("diff")
+def cost_recovery_diff(
+    old_id: Optional[str] = typer.Argument(
+        None, help="Snapshot ID, by default the latest dry run"
+    ),
+    new_id: Optional[str] = typer.Argument(
+        None, help="Snapshot ID, by default the latest committed snapshot"
+    ),
+) -> None:
+    """Show how the costs in two snapshots differ.
+
+    Only the months that are in both snapshots are compared, so by default
+    this shows how the latest dry run differs from what was committed.
+    """
+    # pylint: disable=import-outside-toplevel
+    from tabulate import tabulate
+
+    old = load_snapshot(old_id, "dry-run")
+    new = load_snapshot(new_id, "committed")
+    changes = diff_snapshots(old, new)
+
+    if not changes:
+        typer.echo(f"No differences between {old.id} and {new.id}")
+        return
+
+    colours = {
+        "added": typer.colors.GREEN,
+        "removed": typer.colors.RED,
+        "changed": typer.colors.YELLOW,
+    }
+    table = tabulate(
+        [
+            (
+                change.finance_code,
+                change.month,
+                change.subscription_id,
+                change.old_amount,
+                change.new_amount,
+                change.status,
+            )
+            for change in changes
+        ],
+        headers=("Finance code", "Month", "Subscription", old.id, new.id, ""),
+        floatfmt=".2f",
+        missingval="-",
+    ).splitlines()
+    typer.echo("\n".join(table[:2]))
+    for change, line in zip(changes, table[2:]):
+        typer.secho(line, fg=colours[change.status])
+    typer.echo(f"{len(changes)} differences between {old.id} and {new.id}")
@@ -0,0 +1,242 @@
+"""Time the phases of a command and save them as a Chrome trace.
+
+With ``rctab --trace FILE``, signing in, validating the API's URL, each
+HTTP request, decoding responses and printing results are recorded as
+spans, which are written to FILE in the Trace Event Format when the command
+finishes. Open the file at https://ui.perfetto.dev or chrome://tracing.
+
+While no trace is being recorded, :func:`span` returns a shared object that
+does nothing, so the spans cost next to nothing.
+
+The tracer is kept in a context variable, so that commands run at the same
+time on different threads, e.g. by ``rctab batch --workers N``, each record
+their own trace.
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class Tracer:
+    """Collect the spans of one command.
+
+    Attributes:
+        events: The trace events recorded so far.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the Tracer class."""
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._threads: Dict[int, str] = {}
+        self._pid = os.getpid()
+
+    def now(self) -> float:
+        """Get the time since tracing started, in microseconds."""
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def next_id(self) -> int:
+        """Get an ID for a span that may overlap others on its thread."""
+        return next(self._ids)
+
+    def add(self, event: Dict[str, Any]) -> None:
+        """Record a trace event from the current thread.
+
+        Args:
+            event: The event, without its process and thread IDs.
+        """
+        thread = threading.current_thread()
+        with self._lock:
+            self._threads.setdefault(thread.ident or 0, thread.name)
+            self.events.append({**event, "pid": self._pid, "tid": thread.ident})
+
+    def to_json(self) -> Dict[str, Any]:
+        """Get the trace in the Trace Event Format.
+
+        Returns:
+            The trace, ready to be encoded as JSON.
+        """
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self._pid,
+                "args": {"name": "rctab"},
+            },
+            *(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": ident,
+                    "args": {"name": name},
+                }
+                for ident, name in self._threads.items()
+            ),
+        ]
+        return {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}
+
+
+class Span:
+    """A phase of a command, recorded when it ends.
+
+    Spans on one thread must nest, except those made with concurrent=True,
+    e.g. for requests that are in flight at the same time.
+
+    Attributes:
+        args: Details of the span, shown with it in the trace viewer.
+    """
+
+    def __init__(
+        self,
+        tracer: Tracer,
+        name: str,
+        category: str,
+        args: Dict[str, Any],
+        concurrent: bool = False,
+    ) -> None:
+        """Initialize the Span class."""
+        self.args = args
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._id = tracer.next_id() if concurrent else None
+        self._start = 0.0
+
+    def set(self, **args: Any) -> None:
+        """Add details to the span."""
+        self.args.update(args)
+
+    def __enter__(self) -> "Span":
+        """Start the span."""
+        self._start = self._tracer.now()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """End the span and record it."""
+        end = self._tracer.now()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        event = {"name": self._name, "cat": self._category}
+        if self._id is None:
+            self._tracer.add(
+                {
+                    **event,
+                    "ph": "X",
+                    "ts": self._start,
+                    "dur": end - self._start,
+                    "args": self.args,
+                }
+            )
+        else:
+            self._tracer.add({**event, "ph": "b", "ts": self._start, "id": self._id})
+            self._tracer.add(
+                {**event, "ph": "e", "ts": end, "id": self._id, "args": self.args}
+            )
+
+
+class _NoSpan:
+    """The span used when not tracing, which records nothing."""
+
+    def set(self, **args: Any) -> None:
+        """Ignore details."""
+
+    def __enter__(self) -> "_NoSpan":
+        """Do nothing."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Do nothing."""
+
+
+_NO_SPAN = _NoSpan()
+
+# The tracer of the current command, if it is being traced
+_tracer: "contextvars.ContextVar[Optional[Tracer]]" = contextvars.ContextVar(
+    "tracer", default=None
+)
+
+
+def span(
+    name: str, category: str = "cli", concurrent: bool = False, **args: Any
+) -> Union[Span, _NoSpan]:
+    """Time a phase of a command, if it is being traced.
+
+    Args:
+        name: The name of the phase.
+        category: The kind of phase, e.g. "http".
+        concurrent: Whether the span may overlap others on the same thread.
+        args: Details of the span.
+
+    Returns:
+        A context manager for the span.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        return _NO_SPAN
+    return Span(tracer, name, category, args, concurrent)
+
+
+def traced(
+    func: Callable[..., T], name: str, category: str = "cli"
+) -> Callable[..., T]:
+    """Wrap a function so that each call is a span.
+
+    Args:
+        func: The function.
+        name: The name of the spans.
+        category: The kind of phase.
+
+    Returns:
+        The wrapped function.
+    """
+
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        with span(name, category):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def start_tracing() -> Tracer:
+    """Start recording spans.
+
+    Returns:
+        The tracer that records them.
+    """
+    tracer = Tracer()
+    _tracer.set(tracer)
+    return tracer
+
+
+def stop_tracing(trace_f: Path) -> None:
+    """Stop recording spans and save them.
+
+    Args:
+        trace_f: The file to write the trace to.
+    """
+    # utils imports this module, through endpoints
+    from rctab_cli.utils import (  # pylint: disable=import-outside-toplevel
+        atomic_write_text,
+    )
+
+    tracer = _tracer.get()
+    _tracer.set(None)
+    if tracer is not None:
+        atomic_write_text(trace_f, json.dumps(tracer.to_json()))
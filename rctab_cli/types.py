@@ -1,6 +1,11 @@
 """Types for the RCTab CLI."""
 
-from pydantic import AnyHttpUrl, BaseModel
+from datetime import date
+from enum import Enum
+from typing import Optional
+from uuid import UUID
+
+from pydantic import AnyHttpUrl, BaseModel, Field
 
 
 class RCTabURL(BaseModel):
@@ -11,3 +16,96 @@ class RCTabURL(BaseModel):
     """
 
     url: AnyHttpUrl
+
+
+class OutputFormat(str, Enum):
+    """How a command prints its results.
+
+    Attributes:
+        JSON: One indented JSON document.
+        JSONL: One compact JSON document per line, printed as results arrive.
+        CSV: Comma-separated values, with a header row.
+        TABLE: A table, for people to read.
+    """
+
+    JSON = "json"
+    JSONL = "jsonl"
+    CSV = "csv"
+    TABLE = "table"
+
+
+class AllocationRow(BaseModel):
+    """An allocation for a subscription, e.g. one row of a batch file.
+
+    Attributes:
+        subscription_id: The ID of the subscription.
+        ticket: The ticket reference of the request made.
+        amount: The amount to allocate.
+    """
+
+    subscription_id: UUID
+    ticket: str
+    amount: float
+
+
+class ApprovalRow(AllocationRow):
+    """An approval for a subscription, e.g. one row of a batch file.
+
+    Attributes:
+        allocate: Whether to allocate the approved amount to the subscription.
+        date_from: The date the approval is valid from.
+        date_to: The date the approval is valid to (exclusive).
+        force: Whether to allow date_from to be more than 30 days ago.
+    """
+
+    allocate: bool = False
+    date_from: date = Field(default_factory=date.today)
+    date_to: date
+    force: bool = False
+
+
+class SubscriptionRow(AllocationRow):
+    """A subscription to add and fund, e.g. one row of a bulk manifest.
+
+    Attributes:
+        allocate: Whether to allocate the approved amount to the subscription.
+        date_from: The date the approval is valid from.
+        date_to: The date the approval is valid to (exclusive).
+        persistent: Whether the subscription should be always on.
+    """
+
+    allocate: bool = False
+    date_from: date = Field(default_factory=date.today)
+    date_to: date
+    persistent: bool = False
+
+
+class FinanceUpdateRow(BaseModel):
+    """Changes to a finance record, e.g. one row of a batch file.
+
+    Fields that are not given are left as they are.
+
+    Attributes:
+        finance_id: The ID of the finance record.
+        subscription_id: The ID of the subscription the record is for.
+        date_from: The first month, in YYYY-MM format.
+        date_to: The last month, in YYYY-MM format.
+        amount: The amount to finance.
+        finance_code: The finance code for cost recovery.
+        ticket: The ticket reference of the request made.
+        priority: The priority of the record, lower is higher.
+    """
+
+    finance_id: int
+    subscription_id: UUID
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    amount: Optional[float] = None
+    finance_code: Optional[str] = None
+    ticket: Optional[str] = None
+    priority: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        """Whether every field is given, so the record need not be read."""
+        return all(value is not None for value in self.dict().values())
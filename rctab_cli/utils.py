@@ -1,28 +1,177 @@
 """Utility functions for the CLI."""
 
+import codecs
+import itertools
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
 import typer
-from pydantic import AnyHttpUrl
-from pydantic.tools import parse_obj_as
 
-from rctab_cli.config import get_cli_settings
+from rctab_cli.endpoints import get_base_url
 from rctab_cli.state import state
-from rctab_cli.types import RCTabURL
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
 
 
 def create_url(path: str) -> str:
-    """Create and validate a URL endpoint.
+    """Create the URL of an endpoint.
+
+    The base URL is only validated the first time, by get_base_url.
 
     Args:
-        path: The path part of the URL.
+        path: The path part of the URL, e.g. from Endpoint.path.
 
     Returns:
         The URL of some resource on an RCTab API.
     """
-    temp = str(
-        RCTabURL(
-            url=parse_obj_as(AnyHttpUrl, get_cli_settings().base_url_full + path)
-        ).url
-    )
+    url = get_base_url() + path
     if state.verbose:
-        typer.echo(temp)
-    return temp
+        typer.echo(url)
+    return url
+
+
+@contextmanager
+def file_lock(lock_f: Path) -> Iterator[None]:
+    """Hold an exclusive lock on a file for the duration of the context.
+
+    The lock is advisory, so it only guards against other processes that
+    also use this function.
+
+    Args:
+        lock_f: The path of the lock file, created if it does not exist.
+
+    Yields:
+        None.
+    """
+    with open(lock_f, "a+b") as handle:
+        if sys.platform == "win32":
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_bytes(target_f: Path, data: bytes) -> None:
+    """Write bytes to a file so that readers never see a partial file.
+
+    The bytes are written to a temporary file in the same directory, which
+    is then renamed over the target.
+
+    Args:
+        target_f: The path of the file to write.
+        data: The contents to write.
+
+    Returns:
+        None.
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=target_f.parent, prefix=f".{target_f.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as tmp_f:
+            tmp_f.write(data)
+        os.replace(tmp_name, target_f)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def atomic_write_text(target_f: Path, text: str) -> None:
+    """Write text to a file so that readers never see a partial file.
+
+    Args:
+        target_f: The path of the file to write.
+        text: The contents to write.
+
+    Returns:
+        None.
+    """
+    atomic_write_bytes(target_f, text.encode("utf-8"))
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Parse a JSON array incrementally, yielding one element at a time.
+
+    Only the element currently being parsed is held in memory, so large
+    responses can be processed as they arrive.
+
+    Args:
+        chunks: The UTF-8 encoded array, in chunks of any size.
+
+    Raises:
+        ValueError: If the data is not a complete JSON array.
+
+    Yields:
+        Each element of the array.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    # What the next token must be: "[", a value or "]", a value, or "," or "]"
+    expect = "start"
+
+    # None marks the end of the data
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buffer += text_decoder.decode(chunk or b"", final=final)
+        pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+
+            if expect == "start":
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                expect = "first"
+                pos += 1
+                continue
+
+            if expect == "separator":
+                if char == "]":
+                    return
+                if char != ",":
+                    raise ValueError("Expected ',' or ']' in JSON array")
+                expect = "value"
+                pos += 1
+                continue
+
+            if expect == "first" and char == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break
+            if end == len(buffer) and not final:
+                # A number could continue in the next chunk
+                break
+            yield item
+            expect = "separator"
+            pos = end
+
+        buffer = buffer[pos:]
+        if final:
+            break
+
+    raise ValueError("Incomplete JSON array")
@@ -1,55 +1,66 @@
-from unittest.mock import patch
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import call, patch
 
 import pytest
 import typer
 from typer.testing import CliRunner
 
 from rctab_cli import cli
+from rctab_cli.snapshots import Snapshot, list_snapshots
 from rctab_cli.sub_apps import sub
 
 runner = CliRunner()
 
 
+@pytest.fixture(autouse=True)
+def snapshots_dir(tmp_path: Path) -> Iterator[Path]:
+    """Keep snapshots in tmp_path."""
+    with patch(
+        "rctab_cli.snapshots.get_snapshots_dir", return_value=tmp_path / "snapshots"
+    ):
+        yield tmp_path / "snapshots"
+
+
 def test_cost_recovery() -> None:
     """Test cost-recovery command with all commandline options."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.post") as mock_post,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_post = mock_get_client.return_value.post
+        mock_post.return_value.json.return_value = []
 
-        sub.cost_recovery(month="2020-01", for_real=True)
+        sub.cost_recovery(
+            month="2020-01",
+            month_from=None,
+            month_to=None,
+            for_real=True,
+            output_format=None,
+        )
 
         mock_post.assert_called_once_with(
-            "fake.url",
+            "accounting/cli-cost-recovery",
             json={
                 "first_day": "2020-01-01",
             },
-            auth=mock_auth.return_value,
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/cli-cost-recovery")
         mock_raise_for_status.assert_called_once_with(mock_post.return_value)
-        mock_echo.assert_called_once_with(mock_post.return_value.json.return_value)
+        mock_echo.assert_called_once_with("[]")
 
 
 def test_cost_recovery_defaults() -> None:
     """Test finance command with minimal commandline options."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.get") as mock_get,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_get = mock_get_client.return_value.get
+        mock_get.return_value.json.return_value = [{"amount": 1.0}]
 
         # We can use the --dry-run option...
         result = runner.invoke(
@@ -74,26 +85,226 @@ def test_cost_recovery_defaults() -> None:
             raise ValueError(result.output)
 
         mock_get.assert_called_with(
-            "fake.url",
+            "accounting/cli-cost-recovery",
             json={
                 "first_day": "2020-01-01",
             },
-            auth=mock_auth.return_value,
         )
-        mock_auth.assert_called_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_with("accounting/cli-cost-recovery")
         mock_raise_for_status.assert_called_with(mock_get.return_value)
-        mock_echo.assert_called_with(mock_get.return_value.json.return_value)
+        mock_echo.assert_called_with('[\n    {\n        "amount": 1.0\n    }\n]')
 
 
 def test_cost_recovery_raises() -> None:
     """Test cost-recovery command raises correct errors."""
 
     # Patch this only so that we can't accidentally contact the real server
-    with patch("rctab_cli.sub_apps.sub.create_url"):
+    with patch("rctab_cli.sub_apps.sub.get_client"):
         with pytest.raises(typer.Abort):
             sub.cost_recovery(
                 # This will error as the date should be in YYYY-MM format
                 # without a day
                 month="2001-01-01",
+                month_from=None,
+                month_to=None,
+                for_real=False,
+                output_format=None,
             )
+
+
+def test_month_range() -> None:
+    """Test listing the months between two months, across a year end."""
+    assert sub.month_range("2021-11", "2022-02") == [
+        "2021-11",
+        "2021-12",
+        "2022-01",
+        "2022-02",
+    ]
+    assert sub.month_range("2022-01", "2022-01") == ["2022-01"]
+
+    with pytest.raises(ValueError):
+        sub.month_range("2022-02", "2022-01")
+
+
+def test_cost_recovery_table() -> None:
+    """Test costs are grouped by finance code and month, with totals."""
+    table = sub.cost_recovery_table(
+        {
+            "2022-01": [
+                {"finance_code": "F-B", "amount": 10.0},
+                {"finance_code": "F-A", "amount": 1.5},
+                {"finance_code": "F-A", "amount": 2.5},
+            ],
+            "2022-02": [{"finance_code": "F-A", "amount": 6.0}],
+        }
+    )
+    rows = [line.split() for line in table.splitlines()[2:]]
+    assert rows == [
+        ["F-A", "2022-01", "4.00"],
+        ["F-A", "2022-02", "6.00"],
+        ["Total", "10.00"],
+        ["F-B", "2022-01", "10.00"],
+        ["Total", "10.00"],
+        ["Total", "20.00"],
+    ]
+
+
+def test_cost_recovery_range() -> None:
+    """Test previewing several months and then saving them in order."""
+    costs = {
+        "2022-01": [{"finance_code": "F-A", "amount": 1.0}],
+        "2022-02": [],
+        "2022-03": [{"finance_code": "F-A", "amount": 3.0}],
+    }
+
+    with (
+        patch(
+            "rctab_cli.sub_apps.sub.preview_cost_recovery", return_value=costs
+        ) as mock_preview,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status"),
+    ):
+        result = runner.invoke(
+            cli.app,
+            ["sub", "cost-recovery", "--from", "2022-01", "--to", "2022-03"],
+        )
+        assert result.exit_code == 0, result.output
+        mock_preview.assert_called_once_with(["2022-01", "2022-02", "2022-03"])
+        assert "4.00" in result.output
+        mock_get_client.return_value.post.assert_not_called()
+
+        result = runner.invoke(
+            cli.app,
+            [
+                "sub",
+                "cost-recovery",
+                "--from",
+                "2022-01",
+                "--to",
+                "2022-03",
+                "--for-real",
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        assert mock_get_client.return_value.post.call_args_list == [
+            call("accounting/cli-cost-recovery", json={"first_day": first_day})
+            for first_day in ("2022-01-01", "2022-02-01", "2022-03-01")
+        ]
+
+
+def test_cost_recovery_range_stops_at_failure() -> None:
+    """Test no month is saved after one that fails."""
+    with (
+        patch("rctab_cli.sub_apps.sub.preview_cost_recovery", return_value={}),
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch(
+            "rctab_cli.sub_apps.sub.raise_for_status",
+            side_effect=[None, typer.Abort()],
+        ),
+    ):
+        result = runner.invoke(
+            cli.app,
+            ["sub", "cost-recovery", "--from", "2022-01", "--to", "2022-03"]
+            + ["--for-real"],
+        )
+        assert result.exit_code != 0
+        assert mock_get_client.return_value.post.call_count == 2
+
+
+def test_cost_recovery_range_raises() -> None:
+    """Test --month can't be combined with --from and --to."""
+    with patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client:
+        for args in (
+            ["--month", "2022-01", "--from", "2022-01", "--to", "2022-02"],
+            ["--from", "2022-01"],
+            ["--from", "2022-03", "--to", "2022-01"],
+        ):
+            result = runner.invoke(cli.app, ["sub", "cost-recovery"] + args)
+            assert result.exit_code != 0
+        mock_get_client.assert_not_called()
+
+
+def test_cost_recovery_saves_snapshots(snapshots_dir: Path) -> None:
+    """Test dry runs and committed results are saved as snapshots."""
+    costs = [{"subscription_id": "s1", "finance_code": "F-A", "amount": 1.0}]
+
+    with (
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status"),
+    ):
+        mock_get_client.return_value.get.return_value.json.return_value = costs
+        mock_get_client.return_value.post.return_value.json.return_value = costs
+
+        for extra in ([], ["--for-real"]):
+            result = runner.invoke(
+                cli.app, ["sub", "cost-recovery", "--month", "2022-01"] + extra
+            )
+            assert result.exit_code == 0, result.output
+
+    dry_run, committed = list_snapshots(snapshots_dir)
+    assert (dry_run.kind, committed.kind) == ("dry-run", "committed")
+    assert committed.months == ["2022-01"]
+    assert committed.totals() == {("F-A", "2022-01", "s1"): 1.0}
+
+
+def test_cost_recovery_succeeds_without_snapshot(snapshots_dir: Path) -> None:
+    """Test committed costs are reported even if the snapshot can't be saved."""
+    costs = [{"subscription_id": "s1", "finance_code": "F-A", "amount": 1.0}]
+    snapshots_dir.parent.mkdir(exist_ok=True)
+    # A file where the directory should be
+    snapshots_dir.write_text("", encoding="utf-8")
+
+    with (
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status"),
+    ):
+        mock_get_client.return_value.post.return_value.json.return_value = costs
+
+        result = runner.invoke(
+            cli.app, ["sub", "cost-recovery", "--month", "2022-01", "--for-real"]
+        )
+
+    assert result.exit_code == 0, result.output
+    assert "Could not save committed snapshot" in result.output
+    assert '"finance_code": "F-A"' in result.output
+
+
+def test_cost_recovery_diff(snapshots_dir: Path) -> None:
+    """Test the latest dry run is compared with the latest committed results."""
+    Snapshot.from_costs(
+        "dry-run",
+        {
+            "2022-01": [
+                {"subscription_id": "s1", "finance_code": "F-A", "amount": 1.0},
+                {"subscription_id": "s2", "finance_code": "F-A", "amount": 2.0},
+            ]
+        },
+    ).save()
+    Snapshot.from_costs(
+        "committed",
+        {
+            "2022-01": [
+                {"subscription_id": "s1", "finance_code": "F-A", "amount": 1.0},
+                {"subscription_id": "s2", "finance_code": "F-A", "amount": 5.0},
+                {"subscription_id": "s3", "finance_code": "F-B", "amount": 3.0},
+            ]
+        },
+    ).save()
+
+    result = runner.invoke(cli.app, ["sub", "cost-recovery", "diff"])
+
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[2].split() == ["F-A", "2022-01", "s2", "2.00", "5.00", "changed"]
+    assert lines[3].split() == ["F-B", "2022-01", "s3", "-", "3.00", "added"]
+    assert lines[4].startswith("2 differences")
+
+
+def test_cost_recovery_diff_needs_snapshots() -> None:
+    """Test diff fails clearly when there is nothing to compare."""
+    result = runner.invoke(cli.app, ["sub", "cost-recovery", "diff"])
+    assert result.exit_code == 1
+    assert "There is no dry-run snapshot" in result.output
+
+    result = runner.invoke(cli.app, ["sub", "cost-recovery", "diff", "nope", "nah"])
+    assert result.exit_code == 1
+    assert "There is no snapshot with ID nope" in result.output
@@ -1,4 +1,7 @@
-from unittest.mock import patch
+import json
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, patch
 from uuid import UUID
 
 import pytest
@@ -6,65 +9,74 @@ import typer
 from typer.testing import CliRunner
 
 from rctab_cli.cli import app
+from rctab_cli.journal import IDEMPOTENCY_HEADER, Journal, idempotency_key
 from rctab_cli.sub_apps import sub
 from tests.utils import ExitCodeException
 
 runner = CliRunner()
 
 
-def test_finance_create() -> None:
+def test_finance_create(tmp_path: Path) -> None:
     """Test finance create command with all commandline options."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.post") as mock_post,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch(
+            "rctab_cli.sub_apps.sub.get_journal",
+            return_value=Journal(tmp_path / "journal.sqlite"),
+        ),
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_post = mock_get_client.return_value.post
 
-        sub.finance_create(
-            subscription_id=UUID(int=1),
-            date_from="2020-01",
-            date_to="2020-01",
-            amount=10,
-            finance_code="max",
-            ticket="TICKET",
-            priority=1,
-        )
+        mock_post.return_value.json.return_value = {"finance_id": 1}
+
+        for _ in range(2):
+            sub.finance_create(
+                subscription_id=UUID(int=1),
+                date_from="2020-01",
+                date_to="2020-01",
+                amount=10,
+                finance_code="max",
+                ticket="TICKET",
+                priority=1,
+                repeat=False,
+            )
+
+        body = {
+            "subscription_id": str(UUID(int=1)),
+            "date_from": "2020-01-01",
+            "date_to": "2020-01-31",
+            "amount": 10,
+            "finance_code": "max",
+            "ticket": "TICKET",
+            "priority": 1,
+        }
+        # The second, identical, record should be skipped using the journal
         mock_post.assert_called_once_with(
-            "fake.url",
-            json={
-                "subscription_id": str(UUID(int=1)),
-                "date_from": "2020-01-01",
-                "date_to": "2020-01-31",
-                "amount": 10,
-                "finance_code": "max",
-                "ticket": "TICKET",
-                "priority": 1,
-            },
-            auth=mock_auth.return_value,
+            "accounting/finances",
+            json=body,
+            headers={IDEMPOTENCY_HEADER: idempotency_key("accounting/finances", body)},
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_called_once_with(mock_post.return_value)
-        mock_echo.assert_called_once_with(mock_post.return_value.json.return_value)
+        assert mock_echo.call_count == 2
+        mock_echo.assert_called_with({"finance_id": 1})
 
 
-def test_finance_create_defaults() -> None:
+def test_finance_create_defaults(tmp_path: Path) -> None:
     """Test finance create command with minimal commandline options."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.post") as mock_post,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch(
+            "rctab_cli.sub_apps.sub.get_journal",
+            return_value=Journal(tmp_path / "journal.sqlite"),
+        ),
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_post = mock_get_client.return_value.post
 
         # More complicated invocation needed to test default params.
         result = runner.invoke(
@@ -93,21 +105,20 @@ def test_finance_create_defaults() -> None:
         if result.exit_code != 0:
             raise ExitCodeException(result)
 
+        body = {
+            "subscription_id": str(UUID(int=1)),
+            "date_from": "2020-01-01",
+            "date_to": "2020-01-31",
+            "amount": 10.0,
+            "finance_code": "max",
+            "ticket": "TICKET",
+            "priority": 1,
+        }
         mock_post.assert_called_once_with(
-            "fake.url",
-            json={
-                "subscription_id": str(UUID(int=1)),
-                "date_from": "2020-01-01",
-                "date_to": "2020-01-31",
-                "amount": 10.0,
-                "finance_code": "max",
-                "ticket": "TICKET",
-                "priority": 1,
-            },
-            auth=mock_auth.return_value,
+            "accounting/finances",
+            json=body,
+            headers={IDEMPOTENCY_HEADER: idempotency_key("accounting/finances", body)},
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_called_once_with(mock_post.return_value)
         mock_echo.assert_called_once_with(mock_post.return_value.json.return_value)
 
@@ -135,14 +146,12 @@ def test_finance_get() -> None:
     """Test finance get command."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.get") as mock_get,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_get = mock_get_client.return_value.get
+        mock_get.return_value.json.return_value = {"id": 1, "amount": 10.0}
 
         # More complicated invocation needed to test default params.
         result = runner.invoke(
@@ -153,34 +162,31 @@ def test_finance_get() -> None:
         if result.exit_code != 0:
             raise ExitCodeException(result)
 
+        # The ID is in the path, so no request body is needed
         mock_get.assert_called_once_with(
-            "fake.url/1",
-            json={"finance_id": 1},
-            auth=mock_auth.return_value,
+            "accounting/finances/1",
+            cache_ttl=sub.RECORDS_CACHE_TTL,
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_called_once_with(mock_get.return_value)
-        mock_echo.assert_called_once_with(mock_get.return_value.json.return_value)
+        # Printed as JSON, not as a Python dict
+        mock_echo.assert_called_once_with('{\n    "amount": 10.0,\n    "id": 1\n}')
 
 
 def test_finance_update() -> None:
     """Test finance update command with all commandline options."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.put") as mock_put,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
-        patch("rctab_cli.sub_apps.sub.get_finance") as mock_get_finance,
+        patch("rctab_cli.sub_apps.sub.read_finance") as mock_read_finance,
     ):
-        mock_get_finance.return_value = {
-            "finance_id": 1,
-            "subscription_id": str(UUID(int=1)),
-        }
-        mock_url.return_value = "fake.url"
+        mock_read_finance.return_value = (
+            {"id": 1, "subscription_id": str(UUID(int=1))},
+            '"v1"',
+        )
+        mock_put = mock_get_client.return_value.put
+        mock_put.return_value.status_code = 200
 
         sub.finance_update(
             finance_id=1,
@@ -191,11 +197,13 @@ def test_finance_update() -> None:
             finance_code="max",
             ticket="TICKET",
             priority=1,
+            skip_read=False,
         )
+        mock_read_finance.assert_called_once_with(1, fresh=False)
         mock_put.assert_called_once_with(
-            "fake.url/1",
+            "accounting/finances/1",
             json={
-                "finance_id": 1,
+                "id": 1,
                 "subscription_id": str(UUID(int=1)),
                 "date_from": "2020-01-01",
                 "date_to": "2020-01-31",
@@ -204,35 +212,176 @@ def test_finance_update() -> None:
                 "ticket": "TICKET",
                 "priority": 1,
             },
-            auth=mock_auth.return_value,
+            headers={"If-Match": '"v1"'},
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_called_once_with(mock_put.return_value)
         mock_echo.assert_called_once_with(mock_put.return_value.json.return_value)
 
 
+def test_finance_update_skip_read() -> None:
+    """Test a finance record can be replaced in one request."""
+
+    with (
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status"),
+        patch("typer.echo"),
+        patch("rctab_cli.sub_apps.sub.read_finance") as mock_read_finance,
+    ):
+        mock_put = mock_get_client.return_value.put
+        mock_put.return_value.status_code = 200
+        mock_cached = mock_get_client.return_value.cached
+        mock_cached.return_value.etag = '"v1"'
+
+        def replace() -> None:
+            sub.finance_update(
+                finance_id=1,
+                subscription_id=UUID(int=1),
+                date_from="2020-01",
+                date_to="2020-03",
+                amount=10,
+                finance_code="max",
+                ticket="TICKET",
+                priority=1,
+                skip_read=True,
+            )
+
+        replace()
+        mock_read_finance.assert_not_called()
+        mock_cached.assert_called_once_with("accounting/finances/1")
+        mock_put.assert_called_once_with(
+            "accounting/finances/1",
+            json={
+                "id": 1,
+                "subscription_id": str(UUID(int=1)),
+                "date_from": "2020-01-01",
+                "date_to": "2020-03-31",
+                "amount": 10,
+                "finance_code": "max",
+                "ticket": "TICKET",
+                "priority": 1,
+            },
+            # Changes made since the record was cached are not overwritten
+            headers={"If-Match": '"v1"'},
+        )
+
+        mock_cached.return_value = None
+        replace()
+        assert mock_put.call_args.kwargs["headers"] == {}
+
+        mock_put.return_value.status_code = 412
+        with pytest.raises(typer.Abort):
+            replace()
+
+        # Without every field, the record must be read first
+        with pytest.raises(typer.Abort):
+            sub.finance_update(
+                finance_id=1,
+                subscription_id=UUID(int=1),
+                date_from=None,
+                date_to=None,
+                amount=10,
+                finance_code=None,
+                ticket=None,
+                priority=None,
+                skip_read=True,
+            )
+
+
+def test_finance_update_rereads_changed_record() -> None:
+    """Test an update is retried with a fresh copy if the record changed."""
+
+    with (
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
+        patch("typer.echo"),
+        patch("rctab_cli.sub_apps.sub.read_finance") as mock_read_finance,
+    ):
+        mock_read_finance.side_effect = [
+            ({"id": 1, "subscription_id": str(UUID(int=1)), "amount": 5}, '"v1"'),
+            ({"id": 1, "subscription_id": str(UUID(int=1)), "amount": 6}, '"v2"'),
+        ]
+        mock_put = mock_get_client.return_value.put
+        mock_put.return_value.status_code = 412
+
+        sub.finance_update(
+            finance_id=1,
+            subscription_id=UUID(int=1),
+            date_from=None,
+            date_to=None,
+            amount=7,
+            finance_code=None,
+            ticket=None,
+            priority=None,
+            skip_read=False,
+        )
+
+        assert [c.kwargs["fresh"] for c in mock_read_finance.call_args_list] == [
+            False,
+            True,
+        ]
+        assert mock_put.call_args.kwargs["headers"] == {"If-Match": '"v2"'}
+        mock_raise_for_status.assert_called_once_with(mock_put.return_value)
+
+
+def test_read_finance_uses_cached_copy() -> None:
+    """Test a cached copy with an ETag is used without asking the server."""
+
+    with (
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status"),
+    ):
+        mock_client = mock_get_client.return_value
+        mock_client.cached.return_value.content = '{"id": 1}'
+        mock_client.cached.return_value.etag = '"v1"'
+
+        assert sub.read_finance(1) == ({"id": 1}, '"v1"')
+        mock_client.get.assert_not_called()
+
+        mock_client.get.return_value.headers = {"ETag": '"v2"'}
+        mock_client.get.return_value.json.return_value = {"id": 1}
+        assert sub.read_finance(1, fresh=True) == ({"id": 1}, '"v2"')
+        mock_client.get.assert_called_once_with("accounting/finances/1", cache_ttl=0)
+
+
+def test_read_finance_revalidates_without_etag() -> None:
+    """Test a cached copy without an ETag is always checked with the server."""
+
+    with (
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.raise_for_status"),
+    ):
+        mock_client = mock_get_client.return_value
+        mock_client.cached.return_value.etag = None
+        mock_client.get.return_value.headers = {}
+        mock_client.get.return_value.json.return_value = {"id": 1}
+
+        assert sub.read_finance(1) == ({"id": 1}, None)
+        mock_client.get.assert_called_once_with("accounting/finances/1", cache_ttl=0)
+
+
 def test_finance_does_not_update() -> None:
     """Test finance update command only updates when necessary."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("requests.put") as mock_put,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
-        patch("rctab_cli.sub_apps.sub.get_finance") as mock_get_finance,
+        patch("rctab_cli.sub_apps.sub.read_finance") as mock_read_finance,
     ):
-        mock_get_finance.return_value = {
-            "finance_id": 1,
-            "subscription_id": str(UUID(int=2)),
-            "date_from": "2020-01-01",
-            "date_to": "2020-01-31",
-            "amount": 10,
-            "finance_code": "max",
-            "ticket": "TICKET",
-            "priority": 1,
-        }
-        mock_url.return_value = "fake.url"
+        mock_read_finance.return_value = (
+            {
+                "id": 1,
+                "subscription_id": str(UUID(int=2)),
+                "date_from": "2020-01-01",
+                "date_to": "2020-01-31",
+                "amount": 10,
+                "finance_code": "max",
+                "ticket": "TICKET",
+                "priority": 1,
+            },
+            None,
+        )
+        mock_put = mock_get_client.return_value.put
 
         sub.finance_update(
             finance_id=1,
@@ -243,9 +392,9 @@ def test_finance_does_not_update() -> None:
             finance_code="max",
             ticket="TICKET",
             priority=1,
+            skip_read=False,
         )
         mock_put.assert_not_called()
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_not_called()
         mock_echo.assert_called_once_with(
             "Finance records identical. Taking no action."
@@ -256,23 +405,25 @@ def test_finance_update_defaults() -> None:
     """Test finance update command with minimal commandline options."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("requests.put") as mock_put,
-        patch("rctab_cli.sub_apps.sub.get_finance") as mock_get_finance,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
+        patch("rctab_cli.sub_apps.sub.read_finance") as mock_read_finance,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
-        mock_get_finance.return_value = {
-            "finance_id": 1,
-            "subscription_id": str(UUID(int=2)),
-            "date_from": "2001-01-01",
-            "date_to": "2001-01-31",
-            "amount": 5.0,
-            "finance_code": "test-code",
-            "ticket": "test-ticket",
-            "priority": 101,
-        }
+        mock_put = mock_get_client.return_value.put
+        mock_read_finance.return_value = (
+            {
+                "id": 1,
+                "subscription_id": str(UUID(int=2)),
+                "date_from": "2001-01-01",
+                "date_to": "2001-01-31",
+                "amount": 5.0,
+                "finance_code": "test-code",
+                "ticket": "test-ticket",
+                "priority": 101,
+            },
+            None,
+        )
 
         # More complicated invocation needed to test default params.
         result = runner.invoke(
@@ -292,7 +443,6 @@ def test_finance_update_defaults() -> None:
             raise ExitCodeException(result)
 
         mock_put.assert_not_called()
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_not_called()
         mock_echo.assert_called_once_with(
             "Finance records identical. Taking no action."
@@ -303,29 +453,49 @@ def test_finance_update_raises() -> None:
     """Test finance_update raises if the subscription IDs don't match."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.get_finance") as mock_get_finance,
+        patch("rctab_cli.sub_apps.sub.get_client"),
+        patch("rctab_cli.sub_apps.sub.read_finance") as mock_read_finance,
     ):
-        mock_url.return_value = "fake.url"
-        mock_get_finance.return_value = {
-            "finance_id": 1,
-            "subscription_id": str(UUID(int=2)),
-            "date_from": "2001-02-01",
-            "date_to": "2001-03-31",
-            "amount": 5.0,
-            "finance_code": "test-code",
-            "ticket": "test-ticket",
-            "priority": 101,
-        }
+        mock_read_finance.return_value = (
+            {
+                "id": 1,
+                "subscription_id": str(UUID(int=2)),
+                "date_from": "2001-02-01",
+                "date_to": "2001-03-31",
+                "amount": 5.0,
+                "finance_code": "test-code",
+                "ticket": "test-ticket",
+                "priority": 101,
+            },
+            None,
+        )
 
         # Function should double-check that the finance is for the right subscription
         with pytest.raises(sub.SubscriptionIdMismatch):
-            sub.finance_update(finance_id=1, subscription_id=UUID(int=3))
+            sub.finance_update(
+                finance_id=1,
+                subscription_id=UUID(int=3),
+                date_from=None,
+                date_to=None,
+                amount=None,
+                finance_code=None,
+                ticket=None,
+                priority=None,
+                skip_read=False,
+            )
 
         # Function should raise an Abort if date_from is badly formatted
         with pytest.raises(typer.Abort):
             sub.finance_update(
-                finance_id=1, subscription_id=UUID(int=2), date_from="2020-01-02"
+                finance_id=1,
+                subscription_id=UUID(int=2),
+                date_from="2020-01-02",
+                date_to=None,
+                amount=None,
+                finance_code=None,
+                ticket=None,
+                priority=None,
+                skip_read=False,
             )
 
         # Function should raise an Abort if date_to is badly formatted
@@ -335,21 +505,112 @@ def test_finance_update_raises() -> None:
                 subscription_id=UUID(int=2),
                 date_from="2020-01",
                 date_to="2020-01-02",
+                amount=None,
+                finance_code=None,
+                ticket=None,
+                priority=None,
+                skip_read=False,
             )
 
 
+def test_finance_update_batch(tmp_path: Path) -> None:
+    """Test update-batch reads and writes many finance records concurrently."""
+    batch_file = tmp_path / "finances.csv"
+    batch_file.write_text(
+        "finance_id,subscription_id,finance_code\n"
+        f"1,{UUID(int=1)},new-code\n"
+        f"2,{UUID(int=1)},new-code\n",
+        encoding="utf-8",
+    )
+
+    async def finance_read(finance_id: int) -> Any:
+        record = {"id": finance_id, "subscription_id": str(UUID(int=1))}
+        if finance_id == 2:
+            record["finance_code"] = "new-code"
+        return record, f'"v{finance_id}"'
+
+    with (
+        patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class,
+        patch("rctab_cli.sub_apps.sub.get_retry_policy"),
+        patch("rctab_cli.sub_apps.sub.get_circuit_breaker"),
+        patch("rctab_cli.sub_apps.sub.get_journal"),
+    ):
+        mock_client = AsyncMock()
+        mock_client.finance_read.side_effect = finance_read
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            app, ["sub", "finance", "update-batch", "--file", str(batch_file)]
+        )
+
+    assert result.exit_code == 0, result.output
+    assert "Row 1 (1): OK" in result.output
+    # The second record already has the new code, so is not written
+    mock_client.finance_update.assert_called_once_with(
+        1,
+        {"id": 1, "subscription_id": str(UUID(int=1)), "finance_code": "new-code"},
+        '"v1"',
+    )
+
+
+def test_finance_update_batch_skip_read(tmp_path: Path) -> None:
+    """Test update-batch replaces complete rows if they match the cached ETag."""
+    batch_file = tmp_path / "finances.jsonl"
+    batch_file.write_text(
+        json.dumps(
+            {
+                "finance_id": 1,
+                "subscription_id": str(UUID(int=1)),
+                "date_from": "2020-01",
+                "date_to": "2020-03",
+                "amount": 10,
+                "finance_code": "max",
+                "ticket": "TICKET",
+                "priority": 1,
+            }
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+
+    with (
+        patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class,
+        patch("rctab_cli.sub_apps.sub.get_retry_policy"),
+        patch("rctab_cli.sub_apps.sub.get_circuit_breaker"),
+        patch("rctab_cli.sub_apps.sub.get_journal"),
+        patch("rctab_cli.sub_apps.sub.cached_etag", return_value='"v1"'),
+    ):
+        mock_client = AsyncMock()
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            app,
+            [
+                "sub",
+                "finance",
+                "update-batch",
+                "--file",
+                str(batch_file),
+                "--skip-read",
+            ],
+        )
+
+    assert result.exit_code == 0, result.output
+    mock_client.finance_read.assert_not_called()
+    finance_id, finance, etag = mock_client.finance_update.call_args.args
+    assert (finance_id, finance["finance_code"], etag) == (1, "max", '"v1"')
+
+
 def test_finance_list() -> None:
     """Test finance list command."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.get") as mock_get,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_get = mock_get_client.return_value.get
+        mock_get.return_value.json.return_value = [{"id": 1}]
 
         # More complicated invocation needed to test default params.
         result = runner.invoke(
@@ -367,28 +628,23 @@ def test_finance_list() -> None:
             raise ExitCodeException(result)
 
         mock_get.assert_called_once_with(
-            "fake.url",
+            "accounting/finance",
             json={"sub_id": "00000000-0000-0000-0000-00000000035a"},
-            auth=mock_auth.return_value,
+            cache_ttl=sub.RECORDS_CACHE_TTL,
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/finance")
         mock_raise_for_status.assert_called_once_with(mock_get.return_value)
-        mock_echo.assert_called_once_with(mock_get.return_value.json.return_value)
+        mock_echo.assert_called_once_with('[\n    {\n        "id": 1\n    }\n]')
 
 
 def test_finance_delete() -> None:
     """Test finance delete command."""
 
     with (
-        patch("rctab_cli.sub_apps.sub.create_url") as mock_url,
-        patch("rctab_cli.sub_apps.sub.BearerAuth") as mock_auth,
-        patch("rctab_cli.sub_apps.sub.state") as mock_state,
-        patch("requests.delete") as mock_delete,
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("rctab_cli.sub_apps.sub.raise_for_status") as mock_raise_for_status,
         patch("typer.echo") as mock_echo,
     ):
-        mock_url.return_value = "fake.url"
+        mock_delete = mock_get_client.return_value.delete
 
         # More complicated invocation needed to test default params.
         result = runner.invoke(
@@ -408,11 +664,8 @@ def test_finance_delete() -> None:
             raise ExitCodeException(result)
 
         mock_delete.assert_called_once_with(
-            "fake.url/1",
+            "accounting/finances/1",
             json={"sub_id": "00000000-0000-0000-0000-00000000035a"},
-            auth=mock_auth.return_value,
         )
-        mock_auth.assert_called_once_with(mock_state.get_access_token.return_value)
-        mock_url.assert_called_once_with("accounting/finances")
         mock_raise_for_status.assert_called_once_with(mock_delete.return_value)
         mock_echo.assert_called_once_with(mock_delete.return_value.json.return_value)
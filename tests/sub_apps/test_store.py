@@ -0,0 +1,70 @@
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+import pytest
+from typer.testing import CliRunner
+
+from rctab_cli.cli import app
+from rctab_cli.store import Store
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def store_f(tmp_path: Path) -> Iterator[Path]:
+    """Keep the local database in tmp_path and avoid reading the settings."""
+    store_f = tmp_path / "app" / "store.sqlite"
+    with (
+        patch("rctab_cli.sub_apps.store.get_store_path", return_value=store_f),
+        patch("rctab_cli.sub_apps.store.get_cli_settings"),
+        patch("rctab_cli.sub_apps.store.get_retry_policy"),
+        patch("rctab_cli.sub_apps.store.get_circuit_breaker"),
+    ):
+        yield store_f
+
+
+def test_sync_then_query(store_f: Path) -> None:
+    """Test sync fills the local database that query reads."""
+    summary = {"subscription_id": str(UUID(int=1)), "name": "sub-1"}
+
+    with patch("rctab_cli.sub_apps.store.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client.summary.return_value = [summary]
+        mock_client.approvals.return_value = [{"ticket": "T", "amount": 5.0}]
+        mock_client.allocations.return_value = []
+        mock_client.finance_list.return_value = []
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(app, ["sync"])
+        assert result.exit_code == 0, result.output
+        assert "1 subscriptions synced, 0 unchanged, 0 removed" in result.output
+
+        result = runner.invoke(app, ["sync"])
+        assert "0 subscriptions synced, 1 unchanged, 0 removed" in result.output
+
+    result = runner.invoke(
+        app,
+        [
+            "query",
+            "SELECT ticket, amount FROM approvals WHERE subscription_id = ?",
+            "--param",
+            str(UUID(int=1)),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines()[2].split() == ["T", "5"]
+
+
+def test_query_errors(store_f: Path) -> None:
+    """Test query explains a missing database and invalid SQL."""
+    result = runner.invoke(app, ["query", "SELECT 1"])
+    assert result.exit_code == 1
+    assert "Run rctab sync first" in result.output
+
+    store_f.parent.mkdir()
+    Store(store_f).close()
+    result = runner.invoke(app, ["query", "SELECT nope FROM summaries"])
+    assert result.exit_code == 1
+    assert "Query failed: no such column: nope" in result.output
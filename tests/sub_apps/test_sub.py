@@ -1,25 +1,45 @@
-from datetime import date
-from unittest.mock import MagicMock, patch
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import AsyncMock, MagicMock, call, patch
 from uuid import UUID
 
+import pytest
 import requests
 from typer.testing import CliRunner
 
 from rctab_cli import cli
+from rctab_cli.client import APIError
+from rctab_cli.journal import Journal, JournalEntry
 from rctab_cli.sub_apps import sub
+from rctab_cli.types import OutputFormat
 from tests.utils import ExitCodeException
 
 runner = CliRunner()
 
 
+@pytest.fixture(autouse=True)
+def mock_settings(tmp_path: Path) -> Iterator[Journal]:
+    """Avoid reading the CLI settings and keep the journal and jobs in tmp_path."""
+    journal = Journal(tmp_path / "journal.sqlite")
+    with (
+        patch("rctab_cli.sub_apps.sub.get_retry_policy"),
+        patch("rctab_cli.sub_apps.sub.get_circuit_breaker"),
+        patch("rctab_cli.sub_apps.sub.get_journal", return_value=journal),
+        patch("rctab_cli.jobs.get_jobs_dir", return_value=tmp_path / "jobs"),
+    ):
+        yield journal
+    journal.close()
+
+
 def test_add() -> None:
     """Test add command with all commandline options."""
 
-    with (
-        patch("rctab_cli.sub_apps.sub.add_subscription") as mock_sub,
-        patch("rctab_cli.sub_apps.sub.set_the_persistence") as mock_persist,
-        patch("rctab_cli.sub_apps.sub.create_approval") as mock_approve,
-    ):
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
         sub.add(
             subscription_id=UUID(int=1),
             persistent=True,
@@ -31,28 +51,31 @@ def test_add() -> None:
             skip_check=True,
         )
 
-        mock_sub.assert_called_once_with(UUID(int=1))
+        mock_client.add_subscription.assert_called_once_with(
+            subscription_id=UUID(int=1)
+        )
 
-        mock_persist.assert_called_once_with(UUID(int=1), always_on=True)
+        mock_client.set_persistence.assert_called_once_with(
+            subscription_id=UUID(int=1), always_on=True
+        )
 
-        mock_approve.assert_called_once_with(
-            UUID(int=1),
-            "TICKET",
-            10,
-            True,
-            "2020-01-01",
-            "2020-02-01",
+        mock_client.approve.assert_called_once_with(
+            subscription_id=UUID(int=1),
+            ticket="TICKET",
+            amount=10.0,
+            allocate=True,
+            date_from="2020-01-01",
+            date_to="2020-02-01",
         )
 
 
 def test_add_defaults() -> None:
     """Test add command with minimal commandline options."""
 
-    with (
-        patch("rctab_cli.sub_apps.sub.add_subscription") as mock_sub,
-        patch("rctab_cli.sub_apps.sub.set_the_persistence") as mock_persist,
-        patch("rctab_cli.sub_apps.sub.create_approval") as mock_approve,
-    ):
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
         # More complicated invocation needed to test default params.
         result = runner.invoke(
             cli.app,
@@ -75,20 +98,54 @@ def test_add_defaults() -> None:
         if result.exit_code != 0:
             raise ExitCodeException(result)
 
-        mock_sub.assert_called_once_with(UUID(int=1))
+        mock_client.add_subscription.assert_called_once_with(
+            subscription_id=UUID(int=1)
+        )
 
-        mock_persist.assert_called_once_with(UUID(int=1), always_on=False)
+        mock_client.set_persistence.assert_called_once_with(
+            subscription_id=UUID(int=1), always_on=False
+        )
 
-        mock_approve.assert_called_once_with(
-            UUID(int=1),
-            "TICKET",
-            10.0,
-            True,
-            date.today().isoformat(),
-            "2020-02-01",
+        mock_client.approve.assert_called_once_with(
+            subscription_id=UUID(int=1),
+            ticket="TICKET",
+            amount=10.0,
+            allocate=True,
+            date_from=date.today().isoformat(),
+            date_to="2020-02-01",
         )
 
 
+def test_add_can_be_resumed(tmp_path: Path) -> None:
+    """Test a failed add stops at the failed step and can be resumed."""
+
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client.set_persistence.side_effect = APIError(503, "Unavailable")
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        args = ["--subscription-id", str(UUID(int=1)), "--ticket", "T"]
+        args += ["--amount", "10", "--no-allocate", "--date-to", "2020-02-01", "-y"]
+        result = runner.invoke(cli.app, ["sub", "add", *args])
+
+        assert result.exit_code == 1, result.output
+        assert "Failed to set persistence: status code 503: Unavailable" in (
+            result.output
+        )
+        mock_client.approve.assert_not_called()
+
+        (job_id,) = [job_f.stem for job_f in (tmp_path / "jobs").glob("*.json")]
+        mock_client.set_persistence.side_effect = None
+        result = runner.invoke(cli.app, ["jobs", "resume", job_id])
+
+    assert result.exit_code == 0, result.output
+    assert "1 succeeded, 0 failed" in result.output
+    mock_client.add_subscription.assert_called_once()
+    mock_client.approve.assert_called_once()
+    # Jobs are only kept while they can be resumed
+    assert not list((tmp_path / "jobs").iterdir())
+
+
 def test_approve() -> None:
     """Test approve command with all commandline options."""
 
@@ -101,10 +158,11 @@ def test_approve() -> None:
             date_from="2020-01-01",
             date_to="2020-02-01",
             force=True,
+            repeat=False,
         )
 
         mock_approve.assert_called_once_with(
-            UUID(int=1), "TICKET", 10, True, "2020-01-01", "2020-02-01", True
+            UUID(int=1), "TICKET", 10, True, "2020-01-01", "2020-02-01", True, False
         )
 
 
@@ -140,25 +198,27 @@ def test_approve_defaults() -> None:
             date.today().isoformat(),
             "2020-02-01",
             False,
+            False,
         )
 
 
 def test_summary() -> None:
     """Test summary command with all commandline options."""
     with (
-        patch("requests.get", autospec=True) as mock_get,
-        patch("rctab_cli.sub_apps.sub.create_url", autospec=True),
-        patch("rctab_cli.sub_apps.sub.state", autospec=True),
-        patch("rctab_cli.sub_apps.sub.BearerAuth", autospec=True),
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("typer.echo", autospec=True) as mock_echo,
         patch("json.dumps", autospec=True) as mock_dumps,
     ):
         mock_response = MagicMock(spec=requests.Response)
         mock_response.status_code = 200
         mock_response.json.return_value = [{"role_assignments": []}]
-        mock_get.return_value = mock_response
+        mock_get_client.return_value.get.return_value = mock_response
 
-        sub.summary(subscription_id=UUID(int=1), show_rbac=True)
+        sub.summary(
+            subscription_id=UUID(int=1),
+            show_rbac=True,
+            output_format=OutputFormat.JSON,
+        )
 
         # Expect role assignments to be included.
         mock_dumps.assert_called_once_with(
@@ -170,17 +230,14 @@ def test_summary() -> None:
 def test_summary_defaults() -> None:
     """Test summary command with minimal commandline options."""
     with (
-        patch("requests.get", autospec=True) as mock_get,
-        patch("rctab_cli.sub_apps.sub.create_url", autospec=True),
-        patch("rctab_cli.sub_apps.sub.state", autospec=True),
-        patch("rctab_cli.sub_apps.sub.BearerAuth", autospec=True),
+        patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client,
         patch("typer.echo", autospec=True) as mock_echo,
         patch("json.dumps", autospec=True) as mock_dumps,
     ):
         mock_response = MagicMock(spec=requests.Response)
         mock_response.status_code = 200
         mock_response.json.return_value = [{"role_assignments": []}]
-        mock_get.return_value = mock_response
+        mock_get_client.return_value.get.return_value = mock_response
 
         # More complicated invocation needed to test default params.
         result = runner.invoke(
@@ -198,3 +255,340 @@ def test_summary_defaults() -> None:
         # Expect role assignments to have been removed.
         mock_dumps.assert_called_once_with([{}], indent=4, sort_keys=True)
         mock_echo.assert_called_once_with(mock_dumps.return_value)
+
+
+def test_add_bulk(tmp_path: Path) -> None:
+    """Test add-bulk runs each row's steps in order and reports failures."""
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "subscription_id,ticket,amount,allocate,date_from,date_to,persistent\n"
+        f"{UUID(int=1)},T1,10,true,2020-01-01,2020-02-01,\n"
+        f"{UUID(int=2)},T2,20,,,2020-02-01,true\n"
+        "not-a-uuid,T3,30,,,2020-02-01,\n",
+        encoding="utf-8",
+    )
+
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            cli.app, ["sub", "add-bulk", "--file", str(manifest), "-y"]
+        )
+
+    # One row is invalid, so the command should report a failure...
+    assert result.exit_code == 1, result.output
+    assert "2 succeeded, 1 failed" in result.output
+    assert "Row 3 (not-a-uuid): FAILED subscription_id" in result.output
+
+    # ...but still process the valid rows
+    mock_client.add_subscription.assert_has_calls(
+        [call(subscription_id=UUID(int=1)), call(subscription_id=UUID(int=2))],
+        any_order=True,
+    )
+    mock_client.set_persistence.assert_has_calls(
+        [
+            call(subscription_id=UUID(int=1), always_on=False),
+            call(subscription_id=UUID(int=2), always_on=True),
+        ],
+        any_order=True,
+    )
+    mock_client.approve.assert_has_calls(
+        [
+            call(
+                subscription_id=UUID(int=1),
+                ticket="T1",
+                amount=10.0,
+                allocate=True,
+                date_from="2020-01-01",
+                date_to="2020-02-01",
+            ),
+            call(
+                subscription_id=UUID(int=2),
+                ticket="T2",
+                amount=20.0,
+                allocate=False,
+                date_from=date.today().isoformat(),
+                date_to="2020-02-01",
+            ),
+        ],
+        any_order=True,
+    )
+
+
+def test_add_bulk_stops_failed_subscription(tmp_path: Path) -> None:
+    """Test later steps for a subscription are skipped if an earlier one fails."""
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        json.dumps(
+            {
+                "subscription_id": str(UUID(int=1)),
+                "ticket": "T1",
+                "amount": 10,
+                "date_to": "2020-02-01",
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client.set_persistence.side_effect = APIError(500, "Internal error")
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            cli.app, ["sub", "add-bulk", "--file", str(manifest), "-y"]
+        )
+
+    assert result.exit_code == 1, result.output
+    assert "FAILED status code 500: Internal error" in result.output
+    assert "Resume the job with: rctab jobs resume" in result.output
+    mock_client.approve.assert_not_called()
+
+
+def test_approve_batch(tmp_path: Path) -> None:
+    """Test approve-batch reads stdin and saves a result for every row."""
+    results_file = tmp_path / "results.jsonl"
+    rows = [
+        {"subscription_id": str(UUID(int=1)), "ticket": "T1", "amount": 10},
+        {
+            "subscription_id": str(UUID(int=2)),
+            "ticket": "T2",
+            "amount": 20,
+            "date_to": "2020-02-01",
+        },
+        {
+            "subscription_id": str(UUID(int=3)),
+            "ticket": "T3",
+            "amount": 30,
+            "date_to": "2020-02-01",
+            "force": True,
+        },
+    ]
+
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client.approve.side_effect = [{"status": "success"}, APIError(422, "No")]
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            cli.app,
+            ["sub", "approve-batch", "--results", str(results_file)],
+            input="\n".join(json.dumps(row) for row in rows),
+        )
+
+    assert result.exit_code == 1, result.output
+    assert "1 succeeded, 2 failed" in result.output
+
+    results = [
+        json.loads(line)
+        for line in results_file.read_text(encoding="utf-8").splitlines()
+    ]
+    assert [(r["row"], r["ok"]) for r in results] == [
+        (1, False),
+        (2, True),
+        (3, False),
+    ]
+    assert results[0]["detail"] == "date_to: field required"
+    assert results[2]["detail"] == "status code 422: No"
+    mock_client.approve.assert_has_calls(
+        [
+            call(
+                UUID(int=2),
+                "T2",
+                20.0,
+                False,
+                date.today().isoformat(),
+                "2020-02-01",
+                False,
+            ),
+            call(
+                UUID(int=3),
+                "T3",
+                30.0,
+                False,
+                date.today().isoformat(),
+                "2020-02-01",
+                True,
+            ),
+        ]
+    )
+
+
+def test_allocate_batch(tmp_path: Path) -> None:
+    """Test allocate-batch reads a CSV file."""
+    batch_file = tmp_path / "allocations.csv"
+    batch_file.write_text(
+        f"subscription_id,ticket,amount\n{UUID(int=1)},T1,10\n", encoding="utf-8"
+    )
+
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            cli.app, ["sub", "allocate-batch", "--file", str(batch_file)]
+        )
+
+    assert result.exit_code == 0, result.output
+    mock_client.topup.assert_called_once_with(UUID(int=1), "T1", 10.0)
+
+
+def test_allocate_batch_skips_done_rows(tmp_path: Path, mock_settings: Journal) -> None:
+    """Test rows that the journal shows were already processed are skipped."""
+    batch_file = tmp_path / "allocations.csv"
+    batch_file.write_text(
+        f"subscription_id,ticket,amount\n{UUID(int=1)},T1,10\n{UUID(int=2)},T2,20\n",
+        encoding="utf-8",
+    )
+
+    with patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class:
+        mock_client = AsyncMock()
+        mock_client.topup.side_effect = lambda sub_id, *_: (
+            JournalEntry("key", "accounting/topup", {}, 0) if sub_id.int == 1 else {}
+        )
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            cli.app, ["sub", "allocate-batch", "--file", str(batch_file)]
+        )
+        assert mock_client_class.call_args.kwargs["journal"] is mock_settings
+
+        runner.invoke(
+            cli.app, ["sub", "allocate-batch", "--file", str(batch_file), "--repeat"]
+        )
+        assert mock_client_class.call_args.kwargs["journal"] is None
+
+    assert result.exit_code == 0, result.output
+    assert f"Row 1 ({UUID(int=1)}): SKIPPED, already done" in result.output
+    assert "1 succeeded, 1 skipped, 0 failed" in result.output
+
+
+def test_approvals_many() -> None:
+    """Test approvals for several subscriptions are fetched and merged."""
+    with (
+        patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class,
+        patch("rctab_cli.sub_apps.sub.get_cli_settings"),
+    ):
+        mock_client = AsyncMock()
+        mock_client.approvals.side_effect = lambda sub_id: [{"amount": sub_id.int}]
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(
+            cli.app,
+            [
+                "sub",
+                "approvals",
+                "--subscription-id",
+                str(UUID(int=1)),
+                "--subscription-id",
+                str(UUID(int=2)),
+            ],
+        )
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output) == [
+        {"amount": 1, "subscription_id": str(UUID(int=1))},
+        {"amount": 2, "subscription_id": str(UUID(int=2))},
+    ]
+
+
+def test_allocations_all() -> None:
+    """Test --all fetches allocations for every subscription in the summary."""
+    with (
+        patch("rctab_cli.sub_apps.sub.AsyncRCTabClient") as mock_client_class,
+        patch("rctab_cli.sub_apps.sub.get_cli_settings"),
+    ):
+        mock_client = AsyncMock()
+        mock_client.summary.return_value = [
+            {"subscription_id": str(UUID(int=1))},
+            {"subscription_id": str(UUID(int=2))},
+        ]
+        mock_client.allocations.side_effect = [[], APIError(404, "Not found")]
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        result = runner.invoke(cli.app, ["sub", "allocations", "--all"])
+
+    assert result.exit_code == 1
+    assert f"Failed for {UUID(int=2)} with status code 404" in result.output
+    mock_client.allocations.assert_has_calls([call(UUID(int=1)), call(UUID(int=2))])
+
+
+def test_approvals_needs_subscription() -> None:
+    """Test approvals needs either subscription IDs or --all."""
+    result = runner.invoke(cli.app, ["sub", "approvals"])
+    assert result.exit_code != 0
+    assert "Give either one or more --subscription-id options or --all" in (
+        result.output
+    )
+
+
+def test_summary_jsonl() -> None:
+    """Test summary streams one compact line per subscription."""
+    with patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client:
+        mock_response = MagicMock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [
+            b'[{"subscription_id": "1", "role_assignments": []},',
+            b' {"subscription_id": "2", "role_assignments": []}]',
+        ]
+        mock_get_client.return_value.get.return_value = mock_response
+
+        result = runner.invoke(cli.app, ["sub", "summary", "--format", "jsonl"])
+
+    if result.exit_code != 0:
+        raise ExitCodeException(result)
+
+    assert result.output == '{"subscription_id":"1"}\n{"subscription_id":"2"}\n'
+    mock_get_client.return_value.get.assert_called_once_with(
+        "accounting/subscription", params={}, stream=True
+    )
+
+
+def test_forecast() -> None:
+    """Test forecast ranks subscriptions by how soon they run out."""
+    latest_usage = date.today() - timedelta(days=3)
+    with patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client:
+        mock_response = MagicMock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.json.return_value = [
+            {"subscription_id": "1", "name": "idle", "allocated": 10.0},
+            {
+                "subscription_id": "2",
+                "name": "busy",
+                "allocated": 100.0,
+                "total_cost": 50.0,
+                "first_usage": str(latest_usage - timedelta(days=9)),
+                "latest_usage": str(latest_usage),
+            },
+        ]
+        mock_get_client.return_value.get.return_value = mock_response
+
+        result = runner.invoke(cli.app, ["sub", "forecast", "--top", "1"])
+
+    if result.exit_code != 0:
+        raise ExitCodeException(result)
+
+    rows = [line.split() for line in result.output.splitlines()[2:]]
+    # Ten days of credit are left after the latest usage, three days ago
+    runs_out = str(latest_usage + timedelta(days=10))
+    assert rows == [["busy", "2", "100.00", "50.00", "5.00", "7", runs_out, "-"]]
+
+
+def test_summary_csv() -> None:
+    """Test summary streams CSV with one row per subscription."""
+    with patch("rctab_cli.sub_apps.sub.get_client") as mock_get_client:
+        mock_response = MagicMock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [
+            b'[{"subscription_id": "1", "name": "a", "role_assignments": []},',
+            b' {"subscription_id": "2", "name": "b", "role_assignments": []}]',
+        ]
+        mock_get_client.return_value.get.return_value = mock_response
+
+        result = runner.invoke(cli.app, ["sub", "summary", "--output", "csv"])
+
+    if result.exit_code != 0:
+        raise ExitCodeException(result)
+
+    assert result.output.splitlines() == ["subscription_id,name", "1,a", "2,b"]
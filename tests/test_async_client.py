@@ -0,0 +1,238 @@
+import asyncio
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Optional
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from rctab_cli.async_client import AsyncRCTabClient
+from rctab_cli.client import APIError
+from rctab_cli.journal import Journal, JournalEntry
+from rctab_cli.retry import RetryPolicy
+
+
+def run_with_server(
+    app: web.Application,
+    func: Callable[[AsyncRCTabClient], Coroutine[Any, Any, Any]],
+    max_concurrency: int = 10,
+    retry_policy: Optional[RetryPolicy] = None,
+    journal: Optional[Journal] = None,
+    cached_reads: Optional[MagicMock] = None,
+) -> Any:
+    """Run func against a client pointed at a local aiohttp server."""
+
+    async def main() -> Any:
+        async with TestServer(app) as server:
+            with (
+                patch(
+                    "rctab_cli.async_client.create_url",
+                    side_effect=lambda path: str(server.make_url("/" + path)),
+                ),
+                patch("rctab_cli.async_client.state") as mock_state,
+                patch(
+                    "rctab_cli.async_client.update_cached_reads",
+                    cached_reads or MagicMock(),
+                ),
+            ):
+                mock_state.get_access_token.return_value = "token"
+                async with AsyncRCTabClient(
+                    max_concurrency, retry_policy=retry_policy, journal=journal
+                ) as client:
+                    return await func(client)
+
+    return asyncio.run(main())
+
+
+def test_requests_are_authenticated() -> None:
+    """Test requests carry the bearer token and JSON body."""
+
+    async def approvals(request: web.Request) -> web.Response:
+        assert request.headers["Authorization"] == "Bearer token"
+        return web.json_response([await request.json()])
+
+    app = web.Application()
+    app.router.add_get("/accounting/approvals", approvals)
+
+    result = run_with_server(app, lambda client: client.approvals(UUID(int=1)))
+    assert result == [{"sub_id": str(UUID(int=1))}]
+
+
+def test_concurrency_is_bounded() -> None:
+    """Test no more than max_concurrency requests are in flight."""
+    in_flight = 0
+    peak = 0
+
+    async def allocations(_: web.Request) -> web.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return web.json_response([])
+
+    app = web.Application()
+    app.router.add_get("/accounting/allocations", allocations)
+
+    async def fetch_many(client: AsyncRCTabClient) -> Any:
+        return await asyncio.gather(
+            *(client.allocations(UUID(int=i)) for i in range(20))
+        )
+
+    assert run_with_server(app, fetch_many, max_concurrency=3) == [[]] * 20
+    assert peak == 3
+
+
+def test_errors_raise() -> None:
+    """Test non-2xx responses raise, except for an existing subscription."""
+
+    async def subscription(_: web.Request) -> web.Response:
+        return web.json_response({"detail": "exists"}, status=409)
+
+    async def persistent(_: web.Request) -> web.Response:
+        return web.json_response({"detail": "bad"}, status=422)
+
+    def make_app() -> web.Application:
+        app = web.Application()
+        app.router.add_post("/accounting/subscription", subscription)
+        app.router.add_post("/accounting/persistent", persistent)
+        return app
+
+    result = run_with_server(
+        make_app(), lambda client: client.add_subscription(UUID(int=1))
+    )
+    assert result == {"detail": "exists"}
+
+    with pytest.raises(APIError) as exc_info:
+        run_with_server(
+            make_app(),
+            lambda client: client.set_persistence(UUID(int=1), always_on=True),
+        )
+    assert exc_info.value.status_code == 422
+    assert exc_info.value.detail == {"detail": "bad"}
+
+
+def test_transient_errors_are_retried() -> None:
+    """Test reads are retried after a 503 but writes are not."""
+    calls = {"GET": 0, "POST": 0}
+
+    async def unavailable_once(request: web.Request) -> web.Response:
+        calls[request.method] += 1
+        if calls[request.method] == 1:
+            return web.json_response({"detail": "busy"}, status=503)
+        return web.json_response([])
+
+    def make_app() -> web.Application:
+        app = web.Application()
+        app.router.add_get("/accounting/allocations", unavailable_once)
+        app.router.add_post("/accounting/topup", unavailable_once)
+        return app
+
+    policy = RetryPolicy(backoff_base=0)
+    result = run_with_server(
+        make_app(), lambda client: client.allocations(UUID(int=1)), retry_policy=policy
+    )
+    assert result == []
+    assert calls["GET"] == 2
+
+    with pytest.raises(APIError) as exc_info:
+        run_with_server(
+            make_app(),
+            lambda client: client.topup(UUID(int=1), "T1", 10),
+            retry_policy=policy,
+        )
+    assert exc_info.value.status_code == 503
+    assert calls["POST"] == 1
+
+
+def test_changes_are_journaled(tmp_path: Path) -> None:
+    """Test an approval is sent with an idempotency key and only once."""
+    keys = []
+
+    async def approve(request: web.Request) -> web.Response:
+        keys.append(request.headers["Idempotency-Key"])
+        return web.json_response({"status": "success"})
+
+    app = web.Application()
+    app.router.add_post("/accounting/approve", approve)
+    journal = Journal(tmp_path / "journal.sqlite")
+
+    async def approve_twice(client: AsyncRCTabClient) -> Any:
+        args = (UUID(int=1), "T1", 10, False, "2020-01-01", "2020-02-01")
+        return [await client.approve(*args), await client.approve(*args)]
+
+    first, second = run_with_server(app, approve_twice, journal=journal)
+
+    assert first == {"status": "success"}
+    assert isinstance(second, JournalEntry)
+    assert second.response == first
+    assert len(keys) == 1 and second.key == keys[0]
+
+
+def test_finance_update_is_conditional() -> None:
+    """Test a finance record's ETag is sent back with If-Match."""
+
+    async def finance(request: web.Request) -> web.Response:
+        if request.method == "GET":
+            return web.json_response({"id": 1}, headers={"ETag": '"v1"'})
+        if request.headers.get("If-Match") != '"v1"':
+            return web.json_response({"detail": "changed"}, status=412)
+        return web.json_response(await request.json())
+
+    def make_app() -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/accounting/finances/1", finance)
+        return app
+
+    async def read_then_update(client: AsyncRCTabClient) -> Any:
+        record, etag = await client.finance_read(1)
+        return await client.finance_update(1, {**record, "amount": 2}, etag)
+
+    assert run_with_server(make_app(), read_then_update) == {"id": 1, "amount": 2}
+
+    with pytest.raises(APIError) as exc_info:
+        run_with_server(
+            make_app(), lambda client: client.finance_update(1, {"id": 1}, '"v0"')
+        )
+    assert exc_info.value.status_code == 412
+
+
+def test_changes_update_the_response_cache() -> None:
+    """Test successful writes, but not reads or failures, update the cache."""
+
+    async def approvals(request: web.Request) -> web.Response:
+        return web.json_response([])
+
+    async def approve(request: web.Request) -> web.Response:
+        if (await request.json())["amount"] < 0:
+            return web.json_response({"detail": "negative"}, status=400)
+        return web.json_response({"status": "success"})
+
+    def make_app() -> web.Application:
+        app = web.Application()
+        app.router.add_get("/accounting/approvals", approvals)
+        app.router.add_post("/accounting/approve", approve)
+        return app
+
+    def approve_amount(amount: float) -> Callable[[AsyncRCTabClient], Any]:
+        return lambda client: client.approve(
+            UUID(int=1), "T-1", amount, False, "2024-01-01", "2025-01-01"
+        )
+
+    cached_reads = MagicMock()
+    run_with_server(
+        make_app(),
+        lambda client: client.approvals(UUID(int=1)),
+        cached_reads=cached_reads,
+    )
+    with pytest.raises(APIError):
+        run_with_server(make_app(), approve_amount(-1), cached_reads=cached_reads)
+    cached_reads.assert_not_called()
+
+    run_with_server(make_app(), approve_amount(1), cached_reads=cached_reads)
+    cached_reads.assert_called_once()
+    path, body, content, _ = cached_reads.call_args.args
+    assert (path, body["sub_id"]) == ("accounting/approve", str(UUID(int=1)))
+    assert content == '{"status": "success"}'
@@ -0,0 +1,149 @@
+import threading
+from pathlib import Path
+from typing import Iterator, Tuple
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+import pytest
+
+from rctab_cli.auth import SignInRequired, TokenProvider, load_cache, write_cache
+
+
+@pytest.fixture
+def mock_msal() -> Iterator[Tuple[MagicMock, MagicMock]]:
+    """Patch MSAL so that no real authentication takes place."""
+    mock_msal_app = MagicMock()
+    mock_msal_app.get_accounts.return_value = [{"username": "me"}]
+    mock_msal_app.acquire_token_silent.return_value = {
+        "access_token": "token",
+        "expires_in": 3600,
+    }
+    mock_settings = MagicMock()
+    mock_settings.client_id = UUID(int=1)
+
+    with (
+        patch("msal.PublicClientApplication", return_value=mock_msal_app) as mock_pca,
+        patch("rctab_cli.auth.load_cache"),
+        patch("rctab_cli.auth.get_auth_settings", return_value=mock_settings),
+        patch("rctab_cli.auth.Path"),
+    ):
+        yield mock_pca, mock_msal_app
+
+
+def test_token_provider_memoizes(mock_msal: Tuple[MagicMock, MagicMock]) -> None:
+    """Test the MSAL app is built and queried only once per process."""
+    mock_pca, mock_msal_app = mock_msal
+
+    provider = TokenProvider()
+    assert provider.acquire()["access_token"] == "token"
+    assert provider.acquire()["access_token"] == "token"
+
+    mock_pca.assert_called_once()
+    mock_msal_app.acquire_token_silent.assert_called_once()
+    mock_msal_app.acquire_token_interactive.assert_not_called()
+
+
+def test_token_provider_refreshes_near_expiry(
+    mock_msal: Tuple[MagicMock, MagicMock]
+) -> None:
+    """Test a token inside the refresh margin is renewed."""
+    mock_pca, mock_msal_app = mock_msal
+    mock_msal_app.acquire_token_silent.return_value = {
+        "access_token": "token",
+        "expires_in": 60,
+    }
+
+    provider = TokenProvider(refresh_margin=300)
+    provider.acquire()
+    provider.acquire()
+
+    mock_pca.assert_called_once()
+    assert mock_msal_app.acquire_token_silent.call_count == 2
+
+
+def test_token_provider_does_not_memoize_errors(
+    mock_msal: Tuple[MagicMock, MagicMock]
+) -> None:
+    """Test a failed token request is retried on the next lookup."""
+    _, mock_msal_app = mock_msal
+    mock_msal_app.get_accounts.return_value = []
+    mock_msal_app.acquire_token_interactive.return_value = {"error": "denied"}
+
+    provider = TokenProvider()
+    assert "access_token" not in provider.acquire()
+    provider.acquire()
+
+    assert mock_msal_app.acquire_token_interactive.call_count == 2
+
+
+def test_token_provider_without_interaction(
+    mock_msal: Tuple[MagicMock, MagicMock]
+) -> None:
+    """Test a provider that may not ask the user to sign in raises instead."""
+    _, mock_msal_app = mock_msal
+    mock_msal_app.acquire_token_silent.return_value = None
+
+    provider = TokenProvider(interactive=False)
+    with patch("rctab_cli.auth.reload_cache") as mock_reload_cache:
+        with pytest.raises(SignInRequired):
+            provider.acquire()
+        # Another process may have signed in since the cache was read
+        mock_reload_cache.assert_called_once()
+
+        with pytest.raises(SignInRequired):
+            TokenProvider().acquire(interactive=False)
+    mock_msal_app.acquire_token_interactive.assert_not_called()
+
+    mock_msal_app.acquire_token_silent.return_value = {"access_token": "token"}
+    assert provider.acquire()["access_token"] == "token"
+
+
+def test_token_provider_thread_safe(mock_msal: Tuple[MagicMock, MagicMock]) -> None:
+    """Test concurrent lookups share a single token acquisition."""
+    mock_pca, mock_msal_app = mock_msal
+
+    provider = TokenProvider()
+    threads = [threading.Thread(target=provider.acquire) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    mock_pca.assert_called_once()
+    mock_msal_app.acquire_token_silent.assert_called_once()
+
+
+def test_write_cache_only_when_changed(tmp_path: Path) -> None:
+    """Test the cache file is only written when the cache has changed."""
+    token_cache_f = tmp_path / "cache.bin"
+    cache = MagicMock()
+    cache.has_state_changed = False
+
+    write_cache(token_cache_f, cache)
+    assert not token_cache_f.exists()
+
+    cache.has_state_changed = True
+    cache.serialize.return_value = "serialized"
+    write_cache(token_cache_f, cache)
+
+    assert token_cache_f.read_text(encoding="utf-8") == "serialized"
+    assert cache.has_state_changed is False
+    # Only the cache and its lock file should remain, no temporary files
+    assert sorted(f.name for f in tmp_path.iterdir()) == [
+        "cache.bin",
+        "cache.bin.lock",
+    ]
+
+
+def test_load_cache_registers_one_writer(tmp_path: Path) -> None:
+    """Test repeated loads share one cache and one exit handler."""
+    load_cache.cache_clear()
+    try:
+        with (
+            patch("rctab_cli.auth.typer.get_app_dir", return_value=str(tmp_path)),
+            patch("rctab_cli.auth.atexit.register") as mock_register,
+        ):
+            assert load_cache() is load_cache()
+            mock_register.assert_called_once()
+    finally:
+        load_cache.cache_clear()
@@ -0,0 +1,105 @@
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+import pytest
+
+from rctab_cli import trace
+from rctab_cli.batch import parse_line, run_batch
+
+
+def test_parse_line() -> None:
+    """Test commands can be given as command lines or JSON."""
+    assert parse_line("  \n", 1) is None
+    assert parse_line("# sub summary\n", 1) is None
+    assert parse_line("sub finance get --subscription-id 'a b'\n", 3) == (
+        3,
+        ["sub", "finance", "get", "--subscription-id", "a b"],
+    )
+    assert parse_line('["rctab", "sub", "summary"]', 4) == (4, ["sub", "summary"])
+    assert parse_line('{"id": "abc", "argv": ["sub", "summary"]}', 5) == (
+        "abc",
+        ["sub", "summary"],
+    )
+
+    for line in ("{nonsense", '{"id": 1}', '["sub", 1]', "rctab", "batch"):
+        with pytest.raises(ValueError):
+            parse_line(line, 1)
+
+
+def fake_invoke(argv: List[str]) -> int:
+    """Print the arguments, to stdout and stderr, after a pause."""
+    time.sleep(float(argv[-1]))
+    print(argv[-1])
+    print(argv[-1], file=sys.stderr)
+    return 0 if argv[-2] == "sub" else 3
+
+
+def test_run_batch(capsys: pytest.CaptureFixture) -> None:
+    """Test each command's output is captured and printed in order."""
+    lines = ["sub 0.02", "", '{"id": "x", "argv": ["jobs", "0"]}', "{bad"]
+    with patch("rctab_cli.batch.invoke_command", side_effect=fake_invoke) as invoke:
+        assert run_batch(lines, global_args=["--no-cache"]) == 1
+
+    invoke.assert_any_call(["--no-cache", "sub", "0.02"])
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert results[:2] == [
+        {"id": 1, "exit_code": 0, "stdout": "0.02\n", "stderr": "0.02\n"},
+        {"id": "x", "exit_code": 3, "stdout": "0\n", "stderr": "0\n"},
+    ]
+    assert results[2]["id"] == 4
+    assert results[2]["exit_code"] == 2
+
+
+def test_run_batch_concurrently(capsys: pytest.CaptureFixture) -> None:
+    """Test results are printed as they finish and aren't mixed up."""
+    lines = ["sub 0.2", "sub 0.1", "sub 0"]
+    with patch("rctab_cli.batch.invoke_command", side_effect=fake_invoke):
+        assert run_batch(lines, workers=3) == 0
+
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [result["id"] for result in results] == [3, 2, 1]
+    for result in results:
+        assert result["stdout"] == lines[result["id"] - 1].split()[1] + "\n"
+
+
+def test_run_batch_traces_each_command(tmp_path: Path) -> None:
+    """Test commands traced at the same time each save only their own spans."""
+
+    def traced_invoke(argv: List[str]) -> int:
+        trace_f = tmp_path / f"{argv[-1]}.json"
+        trace.start_tracing()
+        with trace.span(argv[-1]):
+            time.sleep(0.1)
+        trace.stop_tracing(trace_f)
+        return 0
+
+    with patch("rctab_cli.batch.invoke_command", side_effect=traced_invoke):
+        trace.start_tracing()
+        try:
+            assert run_batch(["sub a", "sub b"], workers=2) == 0
+            # The batch's own trace is not stopped by the commands
+            assert trace.span("batch") is not trace.span("again")
+        finally:
+            trace.stop_tracing(tmp_path / "batch.json")
+
+    for name in ("a", "b"):
+        events = json.loads((tmp_path / f"{name}.json").read_text())["traceEvents"]
+        assert [event["name"] for event in events if event["ph"] == "X"] == [name]
+
+
+def test_run_batch_commands(capsys: pytest.CaptureFixture) -> None:
+    """Test real commands run, and fail if they would ask a question."""
+    with patch("rctab_cli.auth.save_cache"):
+        assert run_batch(["sub --help", "sub add"]) == 1
+
+    help_result, add_result = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert help_result["exit_code"] == 0
+    assert "Manage subscription finance" in help_result["stdout"]
+    assert add_result["exit_code"] == 1
+    assert "needs standard input" in add_result["stderr"]
@@ -0,0 +1,41 @@
+import json
+from urllib.request import Request, urlopen
+
+from benchmarks.run import compare
+from benchmarks.stub_api import StubConfig, StubServer
+
+
+def test_stub_api() -> None:
+    """Test the stub answers the endpoints the CLI uses."""
+    with StubServer(StubConfig(subscriptions=3, rows=2)) as server:
+        base = f"http://127.0.0.1:{server.port}/"
+        with urlopen(base + "accounting/subscription") as response:
+            assert len(json.load(response)) == 3
+        with urlopen(base + "accounting/finances/7") as response:
+            assert response.headers["ETag"] == '"7"'
+            assert json.load(response)["id"] == 7
+        request = Request(base + "accounting/approve", data=b"{}", method="POST")
+        with urlopen(request) as response:
+            assert json.load(response) == {"status": "success"}
+        assert server.requests == 3
+
+
+def test_compare() -> None:
+    """Test slower times and lower throughput count as regressions."""
+    old = {
+        "metrics": {
+            "cold_start": {"median": {"value": 1.0, "unit": "s"}},
+            "batch": {"throughput": {"value": 100.0, "unit": "commands/s"}},
+            "summary": {"peak_rss": {"value": 50.0, "unit": "MB"}},
+        }
+    }
+    new = {
+        "metrics": {
+            "cold_start": {"median": {"value": 1.5, "unit": "s"}},
+            "batch": {"throughput": {"value": 50.0, "unit": "commands/s"}},
+            "summary": {"peak_rss": {"value": 25.0, "unit": "MB"}},
+        }
+    }
+    rows, regressions = compare(old, new, threshold=0.1)
+    assert regressions == ["cold_start.median", "batch.throughput"]
+    assert rows[2][-1] == "improvement"
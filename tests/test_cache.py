@@ -0,0 +1,128 @@
+import os
+from pathlib import Path
+from typing import List
+from unittest.mock import MagicMock, patch
+
+from rctab_cli.cache import CachedResponse, ResponseCache
+from rctab_cli.client import RCTabClient, cache_key, update_cached_reads
+
+
+def make_entry(content: str = "[]", stored_at: float = 0) -> CachedResponse:
+    return CachedResponse(
+        url="https://rctab.test/accounting/approvals",
+        stored_at=stored_at,
+        content=content,
+        etag='"v1"',
+    )
+
+
+def test_cache_round_trip(tmp_path: Path) -> None:
+    """Test entries can be stored, read back and rebuilt as responses."""
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+    key = cache.key("https://rctab.test/accounting/approvals", json={"sub_id": "1"})
+
+    assert cache.get(key) is None
+    cache.put(key, make_entry('[{"amount": 1}]'))
+
+    entry = cache.get(key)
+    assert entry is not None
+    assert entry.to_response().json() == [{"amount": 1}]
+    assert entry.validators() == {"If-None-Match": '"v1"'}
+    assert key != cache.key(
+        "https://rctab.test/accounting/approvals", json={"sub_id": "2"}
+    )
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Test the oldest entries are removed when the cache is too big."""
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+    cache.put("a", make_entry("x" * 100))
+    # Room for three entries but not four
+    cache.max_bytes = int((tmp_path / "a.json").stat().st_size * 3.5)
+
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, make_entry("x" * 100))
+        # Make the access times distinct and increasing
+        os.utime(tmp_path / f"{key}.json", (i, i))
+
+    # Reading "a" makes "b" the least recently used
+    cache.get("a")
+    cache.put("d", make_entry("x" * 100))
+
+    assert sorted(f.stem for f in tmp_path.glob("*.json")) == ["a", "c", "d"]
+
+
+def test_client_serves_fresh_and_revalidates_stale(tmp_path: Path) -> None:
+    """Test the client uses fresh entries and revalidates stale ones."""
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+
+    with (
+        patch("rctab_cli.client.get_response_cache", return_value=cache),
+        patch("rctab_cli.client.get_cli_settings") as mock_settings,
+        patch("rctab_cli.client.create_url"),
+        patch("rctab_cli.client.state") as mock_state,
+        patch("requests.Session.request") as mock_request,
+    ):
+        mock_settings.return_value.base_url_full = "https://rctab.test:443/"
+        mock_state.no_cache = False
+        mock_request.return_value = MagicMock(
+            status_code=200,
+            url="https://rctab.test:443/accounting/approvals",
+            text="[1]",
+            headers={"ETag": '"v1"'},
+        )
+
+        client = RCTabClient()
+        assert client.get("accounting/approvals", cache_ttl=60).status_code == 200
+        # The second call should come from the cache
+        assert client.get("accounting/approvals", cache_ttl=60).json() == [1]
+        assert mock_request.call_count == 1
+
+        # With a TTL of 0 the entry is stale, so it should be revalidated
+        mock_request.return_value = MagicMock(status_code=304)
+        assert client.get("accounting/approvals", cache_ttl=0).json() == [1]
+        assert mock_request.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_writes_update_only_the_reads_they_affect(tmp_path: Path) -> None:
+    """Test a write removes the reads it makes stale and keeps the others."""
+    cache = ResponseCache(tmp_path, max_bytes=2**20)
+
+    with (
+        patch("rctab_cli.client.get_response_cache", return_value=cache),
+        patch("rctab_cli.client.get_cli_settings") as mock_settings,
+        patch("rctab_cli.client.create_url", side_effect=lambda p: "https://t/" + p),
+    ):
+        mock_settings.return_value.base_url_full = "https://t/"
+        reads = {
+            "approvals 1": cache_key("accounting/approvals", json={"sub_id": "1"}),
+            "approvals 2": cache_key("accounting/approvals", json={"sub_id": "2"}),
+            "allocations 1": cache_key("accounting/allocations", json={"sub_id": "1"}),
+            "summaries": cache_key("accounting/subscription"),
+            "finances 1": cache_key("accounting/finance", json={"sub_id": "1"}),
+            "finance 7": cache_key("accounting/finances/7"),
+        }
+        for key in reads.values():
+            cache.put(key, make_entry())
+
+        def cached() -> List[str]:
+            return [name for name, key in reads.items() if cache.get(key)]
+
+        update_cached_reads("accounting/topup", {"sub_id": "1"}, "{}")
+        assert cached() == ["approvals 1", "approvals 2", "finances 1", "finance 7"]
+
+        # A replaced finance record is kept, with its new ETag
+        update_cached_reads(
+            "accounting/finances/7",
+            {"id": 7, "subscription_id": "1"},
+            '{"id": 7}',
+            '"v2"',
+        )
+        assert cached() == ["approvals 1", "approvals 2", "finance 7"]
+        entry = cache.get(reads["finance 7"])
+        assert entry is not None
+        assert (entry.content, entry.etag) == ('{"id": 7}', '"v2"')
+
+        # Without an ETag, the record is read again next time
+        update_cached_reads("accounting/finances/7", {"sub_id": "1"}, "{}")
+        assert cached() == ["approvals 1", "approvals 2"]
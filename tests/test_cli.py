@@ -0,0 +1,99 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from rctab_cli import cli
+from rctab_cli.auth import SignInRequired
+
+runner = CliRunner()
+
+
+def test_version_uses_cached_tags(tmp_path: Path) -> None:
+    """Test --version only looks up release tags when the cache is stale."""
+    (tmp_path / "latest_tags.json").write_text(
+        json.dumps(
+            {
+                "cli": {"tag": "9.9.9", "checked_at": time.time()},
+                "api": {"tag": "old", "checked_at": 0},
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    with (
+        patch("rctab_cli.cli.typer.get_app_dir", return_value=str(tmp_path)),
+        patch("rctab_cli.cli.metadata.version", return_value="1.0.0"),
+        patch("rctab_cli.cli.get_api_version", return_value="2.0.0"),
+        patch("rctab_cli.cli.get_latest_cli_tag") as mock_cli_tag,
+        patch("rctab_cli.cli.get_latest_api_tag", return_value="2.0.0"),
+    ):
+        result = runner.invoke(cli.app, ["--version"])
+
+    assert result.exit_code == 0, result.output
+    assert "RCTab CLI version 1.0.0, API version 2.0.0" in result.output
+    assert "The latest version is 9.9.9" in result.output
+    mock_cli_tag.assert_not_called()
+
+    cached = json.loads((tmp_path / "latest_tags.json").read_text(encoding="utf-8"))
+    assert cached["api"]["tag"] == "2.0.0"
+    assert cached["cli"]["tag"] == "9.9.9"
+
+
+def test_api_version_needs_sign_in() -> None:
+    """Test the API version is only looked up by users who are signed in."""
+    with (
+        patch("rctab_cli.cli.get_token_provider") as mock_get_provider,
+        patch("rctab_cli.cli.get_client") as mock_get_client,
+        patch("rctab_cli.cli.state"),
+    ):
+        mock_acquire = mock_get_provider.return_value.acquire
+        mock_acquire.side_effect = SignInRequired
+        assert cli.get_api_version() is None
+        mock_acquire.assert_called_once_with(interactive=False)
+        mock_get_client.assert_not_called()
+
+        mock_acquire.side_effect = None
+        mock_get_client.return_value.get.return_value.status_code = 200
+        mock_get_client.return_value.get.return_value.json.return_value = {
+            "detail": "2.0.0"
+        }
+        assert cli.get_api_version() == "2.0.0"
+
+
+def test_run_with_deadline() -> None:
+    """Test slow or failing lookups are skipped rather than waited for."""
+
+    def slow() -> str:
+        time.sleep(0.5)
+        return "slow"
+
+    def broken() -> str:
+        raise ConnectionError("offline")
+
+    start = time.perf_counter()
+    results = cli.run_with_deadline(
+        {"fast": lambda: "fast", "slow": slow, "broken": broken}, timeout=0.1
+    )
+
+    assert time.perf_counter() - start < 0.4
+    assert results == {"fast": "fast", "slow": None, "broken": None}
+
+
+def test_run_with_deadline_does_not_delay_exit() -> None:
+    """Test the process can exit while a lookup is still running."""
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import time; from rctab_cli import cli; "
+            "cli.run_with_deadline({'slow': lambda: time.sleep(10)}, 0.1)",
+        ],
+        check=True,
+    )
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,186 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Tuple
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from rctab_cli.client import RCTabClient
+from rctab_cli.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def test_client_reuses_session() -> None:
+    """Test all requests share one session with a sized connection pool."""
+    with (
+        patch("rctab_cli.client.create_url") as mock_url,
+        patch("rctab_cli.client.state") as mock_state,
+        patch("requests.Session.request") as mock_request,
+        patch("rctab_cli.client.update_cached_reads") as mock_update_cached_reads,
+    ):
+        mock_request.return_value.status_code = 200
+        mock_url.side_effect = lambda path: "https://rctab.test:443/" + path
+        mock_state.get_access_token.return_value = "token"
+
+        client = RCTabClient(pool_size=4)
+        client.get("accounting/approvals", json={"sub_id": "1"})
+        client.post("accounting/topup", json={"sub_id": "1"})
+
+        adapter = client.session.get_adapter("https://rctab.test")
+        assert isinstance(adapter, HTTPAdapter)
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == 4
+        assert client.session.headers["Accept"] == "application/json"
+
+        first, second = mock_request.call_args_list
+        assert first.args == ("GET", "https://rctab.test:443/accounting/approvals")
+        assert second.args == ("POST", "https://rctab.test:443/accounting/topup")
+        assert first.kwargs["auth"].token == "token"
+        assert first.kwargs["timeout"] == (5.0, 30.0)
+
+        # Only the POST should update cached responses
+        mock_update_cached_reads.assert_called_once()
+        assert mock_update_cached_reads.call_args.args[:2] == (
+            "accounting/topup",
+            {"sub_id": "1"},
+        )
+
+
+class StubAPI:
+    """A local HTTP server that replies with a script of responses.
+
+    Attributes:
+        replies: For each path, the (status, headers) to reply with, in order.
+            The last reply is repeated once the others have been used.
+        requests: The method and path of each request received.
+        sleep: Replaces time.sleep in the client, to record retry delays.
+    """
+
+    def __init__(self) -> None:
+        """Start the server in a background thread."""
+        self.replies: Dict[str, List[Tuple[int, Dict[str, str]]]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.sleep = MagicMock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Reply to every method from the script."""
+
+            def reply(self) -> None:
+                path = self.path.lstrip("/")
+                stub.requests.append((self.command, path))
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                replies = stub.replies.get(path, [(404, {})])
+                status, headers = replies.pop(0) if len(replies) > 1 else replies[0]
+                body = b'{"detail": "stub"}'
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_DELETE = reply
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        ).start()
+
+    def close(self) -> None:
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_api() -> Iterator[StubAPI]:
+    """Point the client at a local stub of the RCTab API."""
+    stub = StubAPI()
+    with (
+        patch("rctab_cli.client.create_url", side_effect=lambda p: stub.url + p),
+        patch("rctab_cli.client.state") as mock_state,
+        patch("rctab_cli.client.update_cached_reads"),
+        patch("rctab_cli.client.time.sleep", stub.sleep),
+    ):
+        mock_state.get_access_token.return_value = "token"
+        yield stub
+    stub.close()
+
+
+def test_transient_errors_are_retried(stub_api: StubAPI) -> None:
+    """Test a GET is retried through 503s and a 429, honouring Retry-After."""
+    stub_api.replies["accounting/approvals"] = [
+        (503, {}),
+        (429, {"Retry-After": "2"}),
+        (200, {}),
+    ]
+    client = RCTabClient(retry_policy=RetryPolicy(backoff_base=0.1))
+
+    resp = client.get("accounting/approvals")
+
+    assert resp.status_code == 200
+    assert len(stub_api.requests) == 3
+    first_delay, second_delay = [c.args[0] for c in stub_api.sleep.call_args_list]
+    assert 0 <= first_delay <= 0.1
+    assert second_delay == 2
+
+
+def test_retries_give_up(stub_api: StubAPI) -> None:
+    """Test the last response is returned once the retries are used up."""
+    stub_api.replies["version"] = [(502, {})]
+    client = RCTabClient(retry_policy=RetryPolicy(max_retries=2))
+
+    assert client.get("version").status_code == 502
+    assert len(stub_api.requests) == 3
+
+    assert client.get("version", retry=False).status_code == 502
+    assert len(stub_api.requests) == 4
+
+
+def test_writes_are_not_retried(stub_api: StubAPI) -> None:
+    """Test a POST is sent once but a finance PUT is retried."""
+    stub_api.replies["accounting/approve"] = [(503, {})]
+    stub_api.replies["accounting/finances/1"] = [(503, {}), (200, {})]
+    client = RCTabClient()
+
+    assert client.post("accounting/approve").status_code == 503
+    assert client.put("accounting/finances/1").status_code == 200
+    assert stub_api.requests == [
+        ("POST", "accounting/approve"),
+        ("PUT", "accounting/finances/1"),
+        ("PUT", "accounting/finances/1"),
+    ]
+
+
+def test_connection_errors_are_retried(stub_api: StubAPI) -> None:
+    """Test a GET is retried when the API cannot be reached."""
+    stub_api.close()
+    client = RCTabClient(retry_policy=RetryPolicy(max_retries=2))
+
+    with pytest.raises(requests.ConnectionError):
+        client.get("version")
+    assert stub_api.sleep.call_count == 2
+
+    with pytest.raises(requests.ConnectionError):
+        client.post("accounting/topup")
+    assert stub_api.sleep.call_count == 2
+
+
+def test_circuit_breaker_fails_fast(stub_api: StubAPI) -> None:
+    """Test no requests are sent once the API has failed repeatedly."""
+    stub_api.replies["version"] = [(503, {})]
+    client = RCTabClient(
+        retry_policy=RetryPolicy(max_retries=0),
+        circuit_breaker=CircuitBreaker(failure_threshold=3),
+    )
+
+    for _ in range(3):
+        assert client.get("version").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        client.get("version")
+    assert len(stub_api.requests) == 3
@@ -0,0 +1,171 @@
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from unittest.mock import patch
+
+import pytest
+import typer
+
+from rctab_cli import forward
+from rctab_cli.auth import SignInRequired
+from rctab_cli.config import APP_NAME, AuthSettings, CLIConfig
+from rctab_cli.daemon import run_command, serve
+from rctab_cli.forward import (
+    connect,
+    get_app_dir,
+    get_settings_fingerprint,
+    receive,
+    send,
+)
+
+
+@pytest.fixture(name="socket_path")
+def fixture_socket_path(tmp_path: Path) -> Iterator[Path]:
+    """Run a daemon, without warming it up, on a socket in tmp_path."""
+    socket_path = tmp_path / "daemon.sock"
+    with (
+        patch("rctab_cli.forward.get_socket_path", return_value=socket_path),
+        patch("rctab_cli.daemon.warm_up"),
+        patch("rctab_cli.daemon.token_available", return_value=True),
+        patch("rctab_cli.auth.save_cache"),
+        patch("rctab_cli.forward._stdin_is_forwardable", return_value=True),
+    ):
+        thread = threading.Thread(target=serve, args=(socket_path, 30))
+        thread.start()
+        while not socket_path.exists():
+            thread.join(0.01)
+        yield socket_path
+        send(connect(), {"command": "stop"})
+        thread.join()
+
+
+def test_app_dir_matches_typer(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the entry point finds the app dir without importing click."""
+    assert get_app_dir() == Path(typer.get_app_dir(APP_NAME))
+    monkeypatch.setenv("XDG_CONFIG_HOME", "/somewhere/else")
+    assert get_app_dir() == Path(typer.get_app_dir(APP_NAME))
+
+
+def test_settings_env_vars_match_config() -> None:
+    """Test the fingerprint covers every setting without importing pydantic."""
+    assert set(forward.SETTINGS_ENV_VARS) == {
+        *CLIConfig.__fields__,
+        *AuthSettings.__fields__,
+    }
+
+
+def test_settings_fingerprint(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the fingerprint changes with the settings' variables and files."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("BASE_URL", raising=False)
+    fingerprint = forward.get_settings_fingerprint()
+
+    monkeypatch.setenv("UNRELATED", "1")
+    assert forward.get_settings_fingerprint() == fingerprint
+
+    monkeypatch.setenv("BASE_URL", "https://other.example.com")
+    with_env = forward.get_settings_fingerprint()
+    assert with_env != fingerprint
+
+    (tmp_path / ".env").write_text("PORT=443\n", encoding="utf-8")
+    assert forward.get_settings_fingerprint() != with_env
+
+
+def test_run_command_captures_output() -> None:
+    """Test commands print to the response and report their exit code."""
+    with patch("rctab_cli.auth.save_cache"):
+        response = run_command(["sub", "--help"])
+        assert response["exit_code"] == 0
+        assert "Manage subscription finance" in response["stdout"]
+
+        response = run_command(["sub", "approve", "--nonsense"])
+        assert response["exit_code"] == 2
+        assert "No such option" in response["stderr"]
+
+
+def test_run_command_asks_for_local_run() -> None:
+    """Test commands that read standard input are sent back to the client."""
+    with patch("rctab_cli.auth.save_cache"):
+        # add prompts for the options it is not given
+        assert run_command(["sub", "add"]) == {"local": True}
+
+
+def test_run_command_sends_long_output_in_chunks() -> None:
+    """Test output is sent while the command runs once there is enough."""
+    with patch("rctab_cli.auth.save_cache"):
+        whole = run_command(["sub", "--help"])["stdout"]
+
+        messages: List[Dict[str, Any]] = []
+        with patch("rctab_cli.daemon.CHUNK_SIZE", 100):
+            response = run_command(["sub", "--help"], send=messages.append)
+        assert len(messages) > 1
+        assert "".join(m["stdout"] for m in messages) + response["stdout"] == whole
+
+        # Once output has been sent, the command can't be run locally instead
+        messages.clear()
+        with patch("rctab_cli.daemon.CHUNK_SIZE", 1):
+            response = run_command(["sub", "add"], send=messages.append)
+        assert response["exit_code"] == 1
+        stderr = "".join(m.get("stderr", "") for m in [*messages, response])
+        assert "run it with RCTAB_NO_DAEMON=1" in stderr
+
+
+def test_forward_runs_commands_in_the_daemon(
+    socket_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    """Test sub commands are run by the daemon and others are not."""
+    status = send(connect(), {"command": "status"})
+    assert status["pid"] == os.getpid()
+
+    assert forward.forward(["sub", "--help"]) == 0
+    whole = capsys.readouterr().out
+    assert "Manage subscription finance" in whole
+
+    # The daemon runs in this process, so read its chunks rather than print them
+    request = {"argv": ["sub", "--help"], "settings": get_settings_fingerprint()}
+    with patch("rctab_cli.daemon.CHUNK_SIZE", 100):
+        messages = list(receive(connect(), request))
+    assert len(messages) > 1 and messages[-1]["exit_code"] == 0
+    assert "".join(m["stdout"] for m in messages) == whole
+
+    assert forward.forward(["sub", "add"]) is None
+    assert forward.forward(["jobs", "list"]) is None
+    with patch.dict(os.environ, {"RCTAB_NO_DAEMON": "1"}):
+        assert forward.forward(["sub", "--help"]) is None
+
+
+def test_forward_without_token(socket_path: Path) -> None:
+    """Test commands run locally, where the user can sign in, without a token."""
+    with patch("rctab_cli.daemon.token_available", return_value=False):
+        assert forward.forward(["sub", "--help"]) is None
+
+    with (
+        patch("rctab_cli.auth.save_cache"),
+        patch("rctab_cli.daemon.invoke_command", side_effect=SignInRequired),
+    ):
+        assert run_command(["sub", "approvals"]) == {"local": True}
+
+
+def test_forward_with_other_settings(
+    socket_path: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test commands with settings the daemon didn't start with run locally."""
+    monkeypatch.setenv("BASE_URL", "https://other.example.com")
+    assert forward.forward(["sub", "--help"]) is None
+
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".env").write_text("BASE_URL=https://other.example.com\n")
+    assert forward.forward(["sub", "--help"]) is None
+
+
+def test_forward_without_daemon(tmp_path: Path) -> None:
+    """Test commands are run locally when the daemon isn't running."""
+    with (
+        patch(
+            "rctab_cli.forward.get_socket_path", return_value=tmp_path / "daemon.sock"
+        ),
+        patch("rctab_cli.forward._stdin_is_forwardable", return_value=True),
+    ):
+        assert forward.forward(["sub", "--help"]) is None
@@ -0,0 +1,48 @@
+from typing import Iterator
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic import AnyHttpUrl, ValidationError
+from pydantic.tools import parse_obj_as
+
+from rctab_cli import endpoints
+from rctab_cli.utils import create_url
+
+
+@pytest.fixture(name="base_url")
+def fixture_base_url() -> Iterator[MagicMock]:
+    """Use a test base URL, validated afresh."""
+    endpoints.get_base_url.cache_clear()
+    with patch("rctab_cli.endpoints.get_cli_settings") as mock_settings:
+        mock_settings.return_value.base_url_full = "https://rctab.test:443/"
+        yield mock_settings
+    endpoints.get_base_url.cache_clear()
+
+
+def test_paths() -> None:
+    """Test paths are made from templates, with parameters percent-encoded."""
+    assert endpoints.APPROVE.path() == "accounting/approve"
+    assert endpoints.FINANCE.path(finance_id=7) == "accounting/finances/7"
+    assert endpoints.FINANCE.path(finance_id="a/b") == "accounting/finances/a%2Fb"
+
+    assert endpoints.FINANCE.matches("accounting/finances/7")
+    assert not endpoints.FINANCE.matches("accounting/finances")
+    assert not endpoints.FINANCE.matches("accounting/finances/7/x")
+    assert endpoints.FINANCES.matches("accounting/finances")
+
+
+def test_urls_are_valid(base_url: MagicMock) -> None:
+    """Test every endpoint makes a valid URL, which is validated once."""
+    for endpoint in endpoints.ENDPOINTS:
+        url = create_url(endpoint.path(finance_id=1))
+        assert url.startswith("https://rctab.test:443/")
+        parse_obj_as(AnyHttpUrl, url)
+    assert endpoints.get_base_url.cache_info().misses == 1
+
+
+def test_invalid_base_url(base_url: MagicMock) -> None:
+    """Test a base URL that isn't http or https is refused."""
+    with patch("rctab_cli.endpoints.get_cli_settings") as mock_settings:
+        mock_settings.return_value.base_url_full = "ftp://rctab.test:21/"
+        with pytest.raises(ValidationError):
+            endpoints.get_base_url()
@@ -0,0 +1,91 @@
+from datetime import date
+
+from rctab_cli.forecast import forecast_all, forecast_subscription
+
+TODAY = date(2022, 3, 1)
+
+
+def test_forecast_subscription() -> None:
+    """Test burn rate, days left and overspend for a spending subscription."""
+    summary = {
+        "subscription_id": "s1",
+        "name": "one",
+        "allocated": 100.0,
+        "total_cost": 40.0,
+        "first_usage": "2022-01-01",
+        "latest_usage": "2022-01-10T12:00:00",
+        "approved_to": "2022-02-09",
+    }
+    forecast = forecast_subscription(summary, date(2022, 1, 20))
+
+    assert forecast.burn_rate == 4.0
+    # 15 days after the latest usage, which was 10 days ago
+    assert forecast.days_left == 5.0
+    assert forecast.runs_out == date(2022, 1, 25)
+    # 30 more days at 4 a day ends 60 over the allocation
+    assert forecast.overspend == 60.0
+
+    # Once the day it runs out has passed, it has no days left
+    later = forecast_subscription(summary, TODAY)
+    assert (later.days_left, later.runs_out) == (0.0, date(2022, 1, 25))
+
+
+def test_forecast_subscription_edge_cases() -> None:
+    """Test subscriptions that are unused, idle or already over budget."""
+    unused = forecast_subscription({"allocated": 10.0}, TODAY)
+    assert (unused.burn_rate, unused.days_left, unused.runs_out) == (0.0, None, None)
+    assert unused.overspend is None
+
+    over = forecast_subscription(
+        {
+            "allocated": 10.0,
+            "total_cost": 12.0,
+            "first_usage": "2022-01-01",
+            "latest_usage": "2022-01-01",
+        },
+        TODAY,
+    )
+    assert (over.days_left, over.runs_out) == (0.0, date(2022, 1, 1))
+
+
+def test_forecast_all_ranks_most_urgent_first() -> None:
+    """Test subscriptions are ranked by days left, idle ones last."""
+    summaries = [
+        {"name": "idle", "allocated": 10.0},
+        {
+            "name": "slow",
+            "allocated": 100.0,
+            "total_cost": 10.0,
+            "first_usage": "2022-01-01",
+            "latest_usage": "2022-01-10",
+        },
+        {
+            "name": "fast",
+            "allocated": 100.0,
+            "total_cost": 90.0,
+            "first_usage": "2022-01-01",
+            "latest_usage": "2022-01-10",
+        },
+    ]
+
+    ranked = [item.name for item in forecast_all(summaries, TODAY)]
+
+    assert ranked == ["fast", "slow", "idle"]
+
+
+def test_forecast_unfunded_unused_subscription() -> None:
+    """Test subscriptions with no allocation or cost aren't ranked as urgent."""
+    unfunded = forecast_subscription({"allocated": 0, "total_cost": 0}, TODAY)
+    assert (unfunded.days_left, unfunded.runs_out) == (None, None)
+
+    running_out = {
+        "name": "running out",
+        "allocated": 100.0,
+        "total_cost": 90.0,
+        "first_usage": "2022-01-01",
+        "latest_usage": "2022-01-10",
+    }
+    ranked = forecast_all(
+        [{"name": "unfunded", "allocated": 0, "total_cost": 0}, running_out]
+    )
+    assert [forecast.name for forecast in ranked] == ["running out", "unfunded"]
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+# Dependencies that should only be imported by the commands that need them
+HEAVY_MODULES = ("msal", "requests", "aiohttp", "tabulate", "dateutil")
+
+# The rctab entry point, which only needs the standard library until it runs
+# a command locally
+ENTRY_POINT_FORBIDDEN_MODULES = ("click", "typer", "pydantic")
+
+# Generous, to allow for slow CI machines. Importing rctab_cli.cli took about
+# 0.45s before heavy dependencies were made lazy and about 0.2s after.
+MAX_IMPORT_TIME_US = 750_000
+
+
+def test_heavy_modules_not_imported() -> None:
+    """Test importing the CLI doesn't import heavy dependencies."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, rctab_cli.cli; "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert result.stdout.split() == []
+
+
+def test_entry_point_imports_little() -> None:
+    """Test the entry point can forward commands without importing the CLI."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, rctab_cli.forward; print(' '.join(m for m in "
+            f"{ENTRY_POINT_FORBIDDEN_MODULES!r} if m in sys.modules))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert result.stdout.split() == []
+
+
+def test_import_time() -> None:
+    """Test the cold-start import time of the CLI stays below a cap."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import rctab_cli.cli"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative = {
+        fields[2].strip(): int(fields[1])
+        for fields in (
+            line.removeprefix("import time:").split("|")
+            for line in result.stderr.splitlines()
+        )
+        if fields[1].strip().isdigit()
+    }
+    assert cumulative["rctab_cli.cli"] < MAX_IMPORT_TIME_US
@@ -0,0 +1,107 @@
+import asyncio
+from functools import partial
+from pathlib import Path
+from typing import Any, List
+from unittest.mock import AsyncMock
+from uuid import UUID
+
+import pytest
+
+from rctab_cli.client import APIError
+from rctab_cli.jobs import Job, Step, job_results, list_jobs, run_job
+
+
+def make_steps(rows: int) -> List[Step]:
+    """Make an add then approve chain of steps for each row."""
+    steps = []
+    for row in range(1, rows + 1):
+        sub_id = str(UUID(int=row))
+        steps.append(
+            Step(f"{row}:add", "add_subscription", {"subscription_id": sub_id}, row=row)
+        )
+        steps.append(
+            Step(
+                f"{row}:approve",
+                "approve",
+                {"subscription_id": sub_id, "ticket": "T", "amount": row},
+                after=[f"{row}:add"],
+                row=row,
+            )
+        )
+    return steps
+
+
+def test_steps_must_form_a_dag(tmp_path: Path) -> None:
+    """Test unknown actions, unknown dependencies and cycles are rejected."""
+    with pytest.raises(ValueError, match="Unknown action"):
+        Job("job", [Step("a", "delete_everything", {})], jobs_dir=tmp_path)
+
+    with pytest.raises(ValueError, match="unknown"):
+        Job("job", [Step("a", "topup", {}, after=["b"])], jobs_dir=tmp_path)
+
+    with pytest.raises(ValueError, match="cycle"):
+        Job(
+            "job",
+            [Step("a", "topup", {}, after=["b"]), Step("b", "topup", {}, after=["a"])],
+            jobs_dir=tmp_path,
+        )
+
+
+def test_independent_steps_run_in_parallel(tmp_path: Path) -> None:
+    """Test chains run concurrently but steps in a chain run in order."""
+    events: List[Any] = []
+    in_flight = peak = 0
+
+    async def record(name: str, subscription_id: UUID, **_: Any) -> str:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        events.append((name, subscription_id.int))
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return name
+
+    client = AsyncMock()
+    client.add_subscription.side_effect = partial(record, "add")
+    client.approve.side_effect = partial(record, "approve")
+
+    job = Job("job", make_steps(6), jobs_dir=tmp_path)
+    asyncio.run(run_job(job, client, workers=3))
+
+    assert peak == 3
+    for row in range(1, 7):
+        assert events.index(("add", row)) < events.index(("approve", row))
+    assert all(result.ok for result in job_results(job))
+
+
+def test_job_resumes_from_checkpoint(tmp_path: Path) -> None:
+    """Test a reloaded job only runs the steps that had not completed."""
+    client = AsyncMock()
+    client.add_subscription.side_effect = [{}, APIError(503, "Unavailable")]
+
+    job = Job("job", make_steps(2), jobs_dir=tmp_path)
+    job.save()
+    asyncio.run(run_job(job, client, workers=1))
+
+    assert job.counts() == {"done": 2, "failed": 1, "pending": 1}
+    assert [result.ok for result in job_results(job)] == [True, False]
+
+    # The process may stop part way through writing a checkpoint
+    with open(job.log_f, "a", encoding="utf-8") as handle:
+        handle.write('{"step": "2:appr')
+
+    (reloaded,) = list_jobs(tmp_path)
+    assert reloaded.id == job.id
+    assert reloaded.counts() == job.counts()
+
+    client.reset_mock()
+    client.add_subscription.side_effect = None
+    asyncio.run(run_job(reloaded, client, workers=1))
+
+    client.add_subscription.assert_called_once_with(subscription_id=UUID(int=2))
+    client.approve.assert_called_once()
+    assert Job.load(job.id, tmp_path).counts() == {"done": 4}
+
+    assert not job.complete and reloaded.complete
+    reloaded.delete()
+    assert list_jobs(tmp_path) == []
@@ -0,0 +1,32 @@
+from pathlib import Path
+
+from rctab_cli.journal import Journal, idempotency_key
+
+
+def test_idempotency_key_is_deterministic() -> None:
+    """Test the key depends on the path and body but not the key order."""
+    body = {"sub_id": "1", "ticket": "T1", "amount": 10}
+
+    assert idempotency_key("accounting/topup", body) == idempotency_key(
+        "accounting/topup", dict(reversed(list(body.items())))
+    )
+    assert idempotency_key("accounting/topup", body) != idempotency_key(
+        "accounting/topup", {**body, "amount": 20}
+    )
+    assert idempotency_key("accounting/topup", body) != idempotency_key(
+        "accounting/approve", body
+    )
+
+
+def test_journal_persists(tmp_path: Path) -> None:
+    """Test recorded changes are found again after the journal is reopened."""
+    journal = Journal(tmp_path / "journal.sqlite")
+    assert journal.find("key") is None
+    journal.record("key", "accounting/topup", {"status": "success"})
+    journal.close()
+
+    entry = Journal(tmp_path / "journal.sqlite").find("key")
+
+    assert entry is not None
+    assert entry.path == "accounting/topup"
+    assert entry.response == {"status": "success"}
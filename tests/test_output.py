@@ -0,0 +1,79 @@
+import json
+from typing import Any, Iterator
+from unittest.mock import patch
+from uuid import UUID
+
+import pytest
+
+from rctab_cli import output
+from rctab_cli.output import dumps, write_output
+from rctab_cli.types import OutputFormat
+
+RECORDS = [
+    {"id": 1, "ticket": "T1", "tags": ["a", "b"]},
+    {"id": 2, "ticket": "T,2", "extra": True},
+]
+
+
+def test_json_is_indented_and_sorted(capsys: pytest.CaptureFixture) -> None:
+    """Test json is for people to read."""
+    write_output({"b": 1, "a": 2}, OutputFormat.JSON)
+    assert capsys.readouterr().out == '{\n    "a": 2,\n    "b": 1\n}\n'
+
+
+def test_jsonl_is_written_in_batches() -> None:
+    """Test jsonl is compact and consumes the records as it prints them."""
+    consumed = []
+
+    def records() -> Iterator[Any]:
+        for number in range(5):
+            consumed.append(number)
+            yield {"id": number}
+
+    with (
+        patch.object(output, "_BATCH_SIZE", 2),
+        patch("typer.echo", side_effect=lambda text: consumed.append(text)),
+    ):
+        write_output(records(), OutputFormat.JSONL)
+
+    assert consumed == [
+        0,
+        1,
+        '{"id":0}\n{"id":1}',
+        2,
+        3,
+        '{"id":2}\n{"id":3}',
+        4,
+        '{"id":4}',
+    ]
+
+
+def test_csv(capsys: pytest.CaptureFixture) -> None:
+    """Test csv has the fields of the first record, with lists as JSON."""
+    write_output(RECORDS, OutputFormat.CSV)
+    assert capsys.readouterr().out.splitlines() == [
+        "id,ticket,tags",
+        '1,T1,"[""a"",""b""]"',
+        '2,"T,2",',
+    ]
+
+
+def test_table(capsys: pytest.CaptureFixture) -> None:
+    """Test a single record is printed as a one row table."""
+    write_output({"id": 1, "ticket": "T1"}, OutputFormat.TABLE)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["id", "ticket"]
+    assert lines[2].split() == ["1", "T1"]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps(use_orjson: bool) -> None:
+    """Test dumps is compact, with or without orjson."""
+    value = {"id": UUID(int=1), "big": 2**70, "name": "é"}
+    with patch.object(output, "orjson", output.orjson if use_orjson else None):
+        assert json.loads(dumps(value)) == {
+            "id": str(UUID(int=1)),
+            "big": 2**70,
+            "name": "é",
+        }
+        assert " " not in dumps([1, {"a": 2}])
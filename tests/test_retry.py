@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch
+
+import pytest
+
+from rctab_cli.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+
+def test_only_idempotent_requests_retry() -> None:
+    """Test reads and finance updates are retried, other writes are not."""
+    policy = RetryPolicy()
+
+    assert policy.next_delay("GET", "accounting/approvals", 0, 503) is not None
+    assert policy.next_delay("PUT", "accounting/finances/7", 0, 503) is not None
+    assert policy.next_delay("PUT", "accounting/finances/7/x", 0, 503) is None
+    assert policy.next_delay("POST", "accounting/approve", 0, 503) is None
+    assert policy.next_delay("DELETE", "accounting/finances/7", 0) is None
+
+
+def test_retry_statuses_and_limit() -> None:
+    """Test only transient errors are retried, and only max_retries times."""
+    policy = RetryPolicy(max_retries=2)
+
+    assert policy.next_delay("GET", "version", 0, 404) is None
+    assert policy.next_delay("GET", "version", 0, 500) is None
+    assert policy.next_delay("GET", "version", 0) is not None
+    assert policy.next_delay("GET", "version", 1, 429) is not None
+    assert policy.next_delay("GET", "version", 2, 429) is None
+
+
+def test_backoff_has_jitter_and_cap() -> None:
+    """Test the delay is drawn from an exponentially growing, capped range."""
+    policy = RetryPolicy(max_retries=10, backoff_base=1, backoff_max=5)
+
+    with patch("rctab_cli.retry.random.uniform", side_effect=max) as mock_uniform:
+        assert policy.next_delay("GET", "version", 0, 503) == 1
+        assert policy.next_delay("GET", "version", 2, 503) == 4
+        assert policy.next_delay("GET", "version", 6, 503) == 5
+
+    assert mock_uniform.call_args_list[0].args == (0, 1)
+
+
+def test_retry_after_is_honoured() -> None:
+    """Test a Retry-After header replaces the backoff, up to backoff_max."""
+    policy = RetryPolicy(backoff_max=10)
+
+    assert policy.next_delay("GET", "version", 0, 429, "3") == 3
+    assert policy.next_delay("GET", "version", 0, 429, "120") == 10
+
+    in_a_minute = datetime.now(timezone.utc) + timedelta(seconds=60)
+    delay = parse_retry_after(format_datetime(in_a_minute, usegmt=True))
+    assert delay is not None and 55 < delay <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_circuit_breaker() -> None:
+    """Test the circuit opens after repeated failures and closes on success."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_status(404)
+    breaker.record_status(503)
+    breaker.before_request()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    # After the reset timeout one trial request is let through
+    with patch("rctab_cli.retry.time.monotonic", return_value=1e9):
+        breaker.before_request()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+
+    breaker.record_success()
+    breaker.before_request()
@@ -0,0 +1,109 @@
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from rctab_cli.snapshots import (
+    Snapshot,
+    diff_snapshots,
+    latest_snapshot,
+    list_snapshots,
+    prune_snapshots,
+)
+
+
+def make_costs(subscriptions: int, amount: float) -> dict:
+    """Make costs for many subscriptions over two months."""
+    return {
+        month: [
+            {
+                "subscription_id": f"sub-{i}",
+                "finance_code": f"F-{i % 7}",
+                "amount": amount + i,
+            }
+            for i in range(subscriptions)
+        ]
+        for month in ("2022-01", "2022-02")
+    }
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    """Test snapshots are saved compactly and load unchanged."""
+    snapshot = Snapshot.from_costs("dry-run", make_costs(1000, 1.0))
+    snapshot_f = snapshot.save(tmp_path)
+
+    assert snapshot_f.stat().st_size < 20_000
+    assert Snapshot.load(snapshot.id, tmp_path) == snapshot
+    assert list_snapshots(tmp_path, kind="committed") == []
+    assert list_snapshots(tmp_path) == [snapshot]
+
+
+def test_latest_and_pruned_snapshots(tmp_path: Path) -> None:
+    """Test the latest snapshots are found by name, and only they are kept."""
+    snapshots = [
+        Snapshot.from_costs(kind, make_costs(1, i))
+        for i, kind in enumerate(["dry-run", "committed"] * 3)
+    ]
+    for snapshot in snapshots:
+        snapshot.save(tmp_path)
+
+    with patch("rctab_cli.snapshots.Snapshot.from_file") as mock_from_file:
+        latest_snapshot("dry-run", tmp_path)
+    # Only the latest snapshot is read
+    mock_from_file.assert_called_once_with(
+        tmp_path / f"{snapshots[4].id}.dry-run.json.gz"
+    )
+    assert latest_snapshot("committed", tmp_path) == snapshots[5]
+
+    assert prune_snapshots("dry-run", keep=1, snapshots_dir=tmp_path) == 2
+    assert list_snapshots(tmp_path) == [
+        snapshots[1],
+        snapshots[3],
+        snapshots[4],
+        snapshots[5],
+    ]
+
+
+def test_diff_snapshots() -> None:
+    """Test added, removed and changed costs are found, ignoring rounding."""
+    old = Snapshot.from_costs(
+        "dry-run",
+        {
+            "2022-01": [
+                {"subscription_id": "a", "finance_code": "F", "amount": 1.0},
+                {"subscription_id": "b", "finance_code": "F", "amount": 2.0},
+                {"subscription_id": "c", "finance_code": "F", "amount": 3.0},
+            ],
+            "2022-02": [{"subscription_id": "a", "finance_code": "F", "amount": 9}],
+        },
+    )
+    new = Snapshot.from_costs(
+        "committed",
+        {
+            "2022-01": [
+                {"subscription_id": "a", "finance_code": "F", "amount": 1.001},
+                {"subscription_id": "b", "finance_code": "F", "amount": 2.5},
+                {"subscription_id": "d", "finance_code": "F", "amount": 4.0},
+            ]
+        },
+    )
+
+    changes = diff_snapshots(old, new)
+
+    # 2022-02 is only in the old snapshot, so is not compared
+    assert [(c.subscription_id, c.status) for c in changes] == [
+        ("b", "changed"),
+        ("c", "removed"),
+        ("d", "added"),
+    ]
+
+
+def test_diff_snapshots_is_fast() -> None:
+    """Test tens of thousands of rows are compared in under a second, even on slow CI machines."""
+    old = Snapshot.from_costs("dry-run", make_costs(20_000, 1.0))
+    new = Snapshot.from_costs("committed", make_costs(20_000, 1.5))
+
+    start = time.perf_counter()
+    changes = diff_snapshots(old, new)
+
+    assert time.perf_counter() - start < 1.0
+    assert len(changes) == 40_000
@@ -0,0 +1,122 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock
+from uuid import UUID
+
+import pytest
+
+from rctab_cli.client import APIError
+from rctab_cli.store import Store, query_store, sync_store
+
+
+def make_summary(number: int, **fields: Any) -> Dict[str, Any]:
+    """Make a subscription summary."""
+    return {
+        "subscription_id": str(UUID(int=number)),
+        "name": f"sub-{number}",
+        "status": "Enabled",
+        "always_on": False,
+        "allocated": 100.0,
+        "total_cost": 10.0 * number,
+        "role_assignments": [],
+        **fields,
+    }
+
+
+def make_client(summaries: List[Dict[str, Any]]) -> AsyncMock:
+    """Make a client that returns one record of each kind per subscription."""
+    client = AsyncMock()
+    client.summary.return_value = summaries
+    client.approvals.side_effect = lambda sub_id: [{"ticket": "T", "amount": 100}]
+    client.allocations.side_effect = lambda sub_id: [{"ticket": "T", "amount": 100}]
+    client.finance_list.side_effect = lambda sub_id: [
+        {"id": sub_id.int, "finance_code": "F-A", "amount": 50}
+    ]
+    return client
+
+
+def test_sync_is_incremental(tmp_path: Path) -> None:
+    """Test only new or changed subscriptions are fetched again."""
+    store = Store(tmp_path / "store.sqlite")
+    summaries = [make_summary(1), make_summary(2), make_summary(3)]
+
+    result = asyncio.run(sync_store(make_client(summaries), store))
+    assert (result.changed, result.unchanged, result.removed) == (3, 0, 0)
+
+    # Subscription 2 has new costs, 3 has gone and 4 is new
+    client = make_client([make_summary(1), make_summary(2, total_cost=95.0)])
+    client.summary.return_value.append(make_summary(4))
+    result = asyncio.run(sync_store(client, store))
+
+    assert (result.changed, result.unchanged, result.removed) == (2, 1, 1)
+    assert {call.args[0].int for call in client.approvals.call_args_list} == {2, 4}
+    assert query_store(
+        tmp_path / "store.sqlite",
+        "SELECT name FROM summaries WHERE total_cost > 0.9 * allocated",
+    ) == (["name"], [("sub-2",)])
+
+    result = asyncio.run(sync_store(client, store, full=True))
+    assert (result.changed, result.unchanged) == (3, 0)
+    store.close()
+
+
+def test_sync_keeps_failed_subscriptions_stale(tmp_path: Path) -> None:
+    """Test a subscription that fails is fetched again by the next sync."""
+    store = Store(tmp_path / "store.sqlite")
+    client = make_client([make_summary(1), make_summary(2)])
+    client.finance_list.side_effect = [
+        APIError(500, "oops"),
+        [],
+    ]
+
+    result = asyncio.run(sync_store(client, store))
+    assert result.changed == 1
+    assert len(result.failures) == 1
+
+    client.finance_list.side_effect = lambda sub_id: []
+    result = asyncio.run(sync_store(client, store))
+    assert (result.changed, result.unchanged, result.failures) == (1, 1, [])
+    store.close()
+
+
+def test_records_are_stored_by_subscription(tmp_path: Path) -> None:
+    """Test records can be joined and aggregated by subscription."""
+    store = Store(tmp_path / "store.sqlite")
+    for number in range(1, 4):
+        store.replace_subscription(
+            make_summary(number, always_on=number == 2),
+            [{"ticket": "T1", "amount": 10.0}, {"ticket": "T2", "amount": 5.0}],
+            [],
+            [{"id": number, "finance_code": "F-A", "amount": 1.0}],
+        )
+    # Replacing a subscription replaces its records rather than adding to them
+    store.replace_subscription(make_summary(3), [], [], [])
+    store.close()
+
+    columns, rows = query_store(
+        tmp_path / "store.sqlite",
+        "SELECT s.name, SUM(a.amount) AS approved FROM summaries s "
+        "JOIN approvals a USING (subscription_id) WHERE s.always_on = ? "
+        "GROUP BY s.name",
+        [True],
+    )
+    assert columns == ["name", "approved"]
+    assert rows == [("sub-2", 15.0)]
+
+    _, rows = query_store(
+        tmp_path / "store.sqlite",
+        "SELECT json_extract(data, '$.role_assignments') FROM summaries LIMIT 1",
+    )
+    assert rows == [("[]",)]
+
+
+def test_query_is_read_only(tmp_path: Path) -> None:
+    """Test queries can't change the database, or create it."""
+    with pytest.raises(FileNotFoundError):
+        query_store(tmp_path / "store.sqlite", "SELECT 1")
+
+    Store(tmp_path / "store.sqlite").close()
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        query_store(tmp_path / "store.sqlite", "DELETE FROM summaries")
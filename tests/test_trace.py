@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from rctab_cli import cli, trace
+from rctab_cli.auth import TokenProvider
+
+runner = CliRunner()
+
+
+def test_span_does_nothing_when_not_tracing() -> None:
+    """Test spans are free, and record nothing, until tracing starts."""
+    assert trace.span("one") is trace.span("two", "http", status=200)
+    with trace.span("one") as span:
+        span.set(status=200)
+
+
+def test_trace_events(tmp_path: Path) -> None:
+    """Test spans are saved in the Trace Event Format."""
+    trace.start_tracing()
+    with trace.span("outer", status=1):
+        with trace.span("inner", "http") as span:
+            span.set(status=2)
+        with pytest.raises(ValueError):
+            with trace.span("failed"):
+                raise ValueError()
+        with trace.span("first", concurrent=True):
+            with trace.span("second", concurrent=True):
+                pass
+    assert trace.traced(len, "length")([1, 2]) == 2
+    trace.stop_tracing(tmp_path / "trace.json")
+
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert trace.span("after") is trace.span("again")
+
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert spans["outer"]["args"] == {"status": 1}
+    assert spans["inner"]["cat"] == "http"
+    assert spans["inner"]["args"] == {"status": 2}
+    assert spans["failed"]["args"] == {"error": "ValueError"}
+    assert "length" in spans
+    assert spans["outer"]["ts"] <= spans["inner"]["ts"]
+    assert spans["outer"]["dur"] >= spans["inner"]["dur"]
+
+    # Concurrent spans are begin and end events, matched by ID
+    concurrent = [event for event in events if event["ph"] in "be"]
+    assert [(event["name"], event["ph"]) for event in concurrent] == [
+        ("second", "b"),
+        ("second", "e"),
+        ("first", "b"),
+        ("first", "e"),
+    ]
+    assert concurrent[0]["id"] == concurrent[1]["id"] != concurrent[2]["id"]
+
+
+def test_trace_option(tmp_path: Path) -> None:
+    """Test --trace saves the spans of a command."""
+    trace_f = tmp_path / "trace.json"
+    token = {"access_token": "abc", "expires_in": 3600}
+    with (
+        patch("rctab_cli.cli.get_token_provider", return_value=TokenProvider()),
+        patch.object(TokenProvider, "_acquire", return_value=token),
+    ):
+        result = runner.invoke(cli.app, ["--trace", str(trace_f), "token"])
+    assert result.exit_code == 0
+    assert result.stdout == "abc"
+
+    events = json.loads(trace_f.read_text())["traceEvents"]
+    names = [event["name"] for event in events if event["ph"] == "X"]
+    assert names == ["acquire_access_token", "rctab token"]
+    assert trace.span("after") is trace.span("again")
@@ -0,0 +1,35 @@
+import json
+from typing import List
+
+import pytest
+
+from rctab_cli.utils import iter_json_array
+
+
+def chunked(data: bytes, size: int) -> List[bytes]:
+    """Split data into chunks of the given size."""
+    chunks = []
+    for start in range(0, len(data), size):
+        end = start + size
+        chunks.append(data[start:end])
+    return chunks
+
+
+def test_iter_json_array() -> None:
+    """Test arrays are parsed the same however they are split into chunks."""
+    items = [{"name": "café", "cost": 1.5}, [1, 2], 12345, "x,]", None, {}]
+    data = json.dumps(items, indent=4).encode("utf-8")
+
+    for size in (1, 2, 3, 7, len(data)):
+        assert list(iter_json_array(chunked(data, size))) == items
+
+    assert not list(iter_json_array([b"[", b" ]"]))
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"{}", b"[1, 2", b'[{"a": ', b"[1 2]", b"[1,]", b"[,1]"]
+)
+def test_iter_json_array_raises(data: bytes) -> None:
+    """Test malformed or truncated arrays raise."""
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(data, 1)))